@@ -0,0 +1,31 @@
+"""keyset_pagination_indexes
+
+Revision ID: a3c6f0e2b815
+Revises: f27d8e5a9c13
+Create Date: 2026-10-16 16:21:44.902356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6f0e2b815'
+down_revision: Union[str, None] = 'f27d8e5a9c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_calls_user_started', 'calls', ['user_id', 'started_at'], unique=False)
+    op.create_index('ix_bulk_campaigns_user_created', 'bulk_campaigns', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_campaign_recipients_campaign_id', 'campaign_recipients', ['campaign_id', 'id'], unique=False)
+    op.create_index('ix_campaign_recipients_campaign_status', 'campaign_recipients', ['campaign_id', 'status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_campaign_recipients_campaign_status', table_name='campaign_recipients')
+    op.drop_index('ix_campaign_recipients_campaign_id', table_name='campaign_recipients')
+    op.drop_index('ix_bulk_campaigns_user_created', table_name='bulk_campaigns')
+    op.drop_index('ix_calls_user_started', table_name='calls')
@@ -0,0 +1,49 @@
+"""recipient_upload_staging
+
+Revision ID: a6c1e0b49d37
+Revises: f3a9d2c6b184
+Create Date: 2026-10-16 23:41:05.117362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c1e0b49d37'
+down_revision: Union[str, None] = 'f3a9d2c6b184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('recipient_uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('campaign_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['campaign_id'], ['bulk_campaigns.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_recipient_uploads_id'), 'recipient_uploads', ['id'], unique=False)
+    op.create_table('recipient_upload_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('upload_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['upload_id'], ['recipient_uploads.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_recipient_upload_chunks_upload_seq', 'recipient_upload_chunks', ['upload_id', 'seq'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_recipient_upload_chunks_upload_seq', table_name='recipient_upload_chunks')
+    op.drop_table('recipient_upload_chunks')
+    op.drop_index(op.f('ix_recipient_uploads_id'), table_name='recipient_uploads')
+    op.drop_table('recipient_uploads')
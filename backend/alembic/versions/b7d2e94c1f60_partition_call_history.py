@@ -0,0 +1,148 @@
+"""partition_call_history
+
+Revision ID: b7d2e94c1f60
+Revises: a3c6f0e2b815
+Create Date: 2026-10-16 18:02:13.664170
+
+PostgreSQL: turn calls (started_at) and rootcall_call_logs (timestamp) into
+monthly range-partitioned tables. Partitioned tables need the partition key
+in every primary key / unique index, so the primary keys become
+(id, <key>), call_control_id / telnyx_call_id are unique per key, and the
+foreign keys pointing at calls.id (recordings, ivr_call_logs,
+campaign_recipients) are dropped; the ORM relationships don't need them.
+Other databases only get the timestamp index the archiver deletes by.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e94c1f60'
+down_revision: Union[str, None] = 'a3c6f0e2b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+# table -> (partition key, default for the key, indexes as (name, columns, unique))
+PARTITIONED = {
+    'calls': ('started_at', "(now() at time zone 'utc')", [
+        ('ix_calls_id', ['id'], False),
+        ('ix_calls_call_control_id', ['call_control_id', 'started_at'], True),
+        ('ix_calls_telnyx_call_id', ['telnyx_call_id', 'started_at'], True),
+        ('ix_calls_started_at', ['started_at'], False),
+        ('ix_calls_user_started', ['user_id', 'started_at'], False),
+    ]),
+    'rootcall_call_logs': ('timestamp', None, [
+        ('ix_rootcall_call_logs_id', ['id'], False),
+        ('ix_rootcall_call_logs_timestamp', ['timestamp'], False),
+        ('ix_rootcall_call_logs_phone_timestamp', ['phone_number_id', 'timestamp'], False),
+    ]),
+}
+
+# Restored by downgrade()
+CALL_FOREIGN_KEYS = ('recordings', 'ivr_call_logs', 'campaign_recipients')
+
+
+def _add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _swap_table(bind, table, create_sql, key, key_default=None):
+    """Rename table away, create its replacement, copy rows, hand over the id sequence"""
+    old = f'{table}_old'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': old}).scalar()
+    op.execute(create_sql.format(table=table, old=old))
+    columns = [c['name'] for c in sa.inspect(bind).get_columns(old)]
+    select = ', '.join(
+        f'COALESCE("{c}", {key_default})' if c == key and key_default else f'"{c}"'
+        for c in columns
+    )
+    quoted = ', '.join(f'"{c}"' for c in columns)
+    return old, sequence, f'INSERT INTO {table} ({quoted}) SELECT {select} FROM {old}'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if bind.dialect.name != 'postgresql':
+        if inspector.has_table('rootcall_call_logs'):
+            existing = {ix['name'] for ix in inspector.get_indexes('rootcall_call_logs')}
+            if 'ix_rootcall_call_logs_timestamp' not in existing:
+                op.create_index('ix_rootcall_call_logs_timestamp', 'rootcall_call_logs', ['timestamp'], unique=False)
+        return
+
+    this_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for table, (key, key_default, indexes) in PARTITIONED.items():
+        if not inspector.has_table(table):
+            continue
+        old, sequence, copy_sql = _swap_table(
+            bind, table,
+            '''CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ("%s")''' % key,
+            key, key_default or 'now()',
+        )
+        if key_default:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN "{key}" SET DEFAULT {key_default}')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN "{key}" SET NOT NULL')
+        op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "{key}")')
+
+        first = bind.execute(sa.text(f'SELECT min("{key}") FROM {old}')).scalar()
+        month = (first or this_month).replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        while month <= _add_months(this_month, MONTHS_AHEAD):
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+            month = _add_months(month, 1)
+        op.execute(f'CREATE TABLE {table}_pdefault PARTITION OF {table} DEFAULT')
+
+        op.execute(copy_sql)
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        # CASCADE: also drops the foreign keys that referenced calls.id
+        op.execute(f'DROP TABLE {old} CASCADE')
+        for name, columns, unique in indexes:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if bind.dialect.name != 'postgresql':
+        if inspector.has_table('rootcall_call_logs'):
+            op.drop_index('ix_rootcall_call_logs_timestamp', table_name='rootcall_call_logs')
+        return
+
+    for table, (key, _, indexes) in PARTITIONED.items():
+        if not inspector.has_table(table):
+            continue
+        old, sequence, copy_sql = _swap_table(
+            bind, table, 'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)', key,
+        )
+        op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+        op.execute(copy_sql)
+        if sequence:
+            op.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        op.execute(f'DROP TABLE {old} CASCADE')
+
+        if table == 'calls':
+            op.create_index('ix_calls_id', 'calls', ['id'], unique=False)
+            op.create_index('ix_calls_call_control_id', 'calls', ['call_control_id'], unique=True)
+            op.create_unique_constraint('calls_telnyx_call_id_key', 'calls', ['telnyx_call_id'])
+            op.create_index('ix_calls_started_at', 'calls', ['started_at'], unique=False)
+            op.create_index('ix_calls_user_started', 'calls', ['user_id', 'started_at'], unique=False)
+            for referencing in CALL_FOREIGN_KEYS:
+                if inspector.has_table(referencing):
+                    op.create_foreign_key(f'{referencing}_call_id_fkey', referencing, 'calls', ['call_id'], ['id'])
+        else:
+            op.create_index('ix_rootcall_call_logs_id', table, ['id'], unique=False)
+            op.create_index('ix_rootcall_call_logs_timestamp', table, ['timestamp'], unique=False)
+            op.create_index('ix_rootcall_call_logs_phone_timestamp', table, ['phone_number_id', 'timestamp'], unique=False)
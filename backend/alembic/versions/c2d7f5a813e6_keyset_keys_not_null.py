@@ -0,0 +1,47 @@
+"""keyset_keys_not_null
+
+Revision ID: c2d7f5a813e6
+Revises: a6c1e0b49d37
+Create Date: 2026-10-17 00:06:51.390218
+
+calls.started_at and bulk_campaigns.created_at are keyset pagination keys;
+a NULL there compares as neither before nor after any cursor, so the row
+would never be paged to. Fill them in and make them NOT NULL (calls is
+already NOT NULL on PostgreSQL, where started_at is the partition key).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d7f5a813e6'
+down_revision: Union[str, None] = 'a6c1e0b49d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        'UPDATE calls SET started_at = COALESCE(answered_at, ended_at, CURRENT_TIMESTAMP) '
+        'WHERE started_at IS NULL'
+    )
+    op.execute(
+        'UPDATE bulk_campaigns SET created_at = COALESCE(started_at, completed_at, CURRENT_TIMESTAMP) '
+        'WHERE created_at IS NULL'
+    )
+    # Batch mode: SQLite cannot ALTER COLUMN in place
+    with op.batch_alter_table('calls') as batch_op:
+        batch_op.alter_column('started_at', existing_type=sa.DateTime(), nullable=False)
+    with op.batch_alter_table('bulk_campaigns') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('bulk_campaigns') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+    if op.get_bind().dialect.name != 'postgresql':
+        # On PostgreSQL the partition key stays NOT NULL
+        with op.batch_alter_table('calls') as batch_op:
+            batch_op.alter_column('started_at', existing_type=sa.DateTime(), nullable=True)
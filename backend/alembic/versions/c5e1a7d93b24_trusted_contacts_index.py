@@ -0,0 +1,81 @@
+"""trusted_contacts_index
+
+Revision ID: c5e1a7d93b24
+Revises: 40508a9fb685
+Create Date: 2026-10-16 09:12:31.402118
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1a7d93b24'
+down_revision: Union[str, None] = '40508a9fb685'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _normalize(raw):
+    text = str(raw or '').strip()
+    digits = re.sub(r'\D', '', text)
+    if text.startswith('+'):
+        pass
+    elif text.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == 10:
+        digits = '1' + digits
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return '+' + digits
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    configs = sa.table('rootcall_configs', sa.column('id', sa.Integer), sa.column('trusted_contacts', sa.JSON))
+    contacts = sa.table(
+        'trusted_contacts',
+        sa.column('id', sa.Integer),
+        sa.column('rootcall_config_id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('phone_number', sa.String),
+        sa.column('is_active', sa.Boolean),
+        sa.column('total_calls', sa.Integer),
+    )
+
+    # Normalize existing rows, dropping ones that collide after normalization
+    seen = set()
+    for row in bind.execute(sa.select(contacts.c.id, contacts.c.rootcall_config_id, contacts.c.phone_number).order_by(contacts.c.id)):
+        normalized = _normalize(row.phone_number) or row.phone_number
+        key = (row.rootcall_config_id, normalized)
+        if key in seen:
+            bind.execute(contacts.delete().where(contacts.c.id == row.id))
+            continue
+        seen.add(key)
+        if normalized != row.phone_number:
+            bind.execute(contacts.update().where(contacts.c.id == row.id).values(phone_number=normalized))
+
+    # Backfill rows from the JSON column and rewrite it normalized
+    for row in bind.execute(sa.select(configs.c.id, configs.c.trusted_contacts)).fetchall():
+        numbers = []
+        for raw in row.trusted_contacts or []:
+            normalized = _normalize(raw)
+            if normalized and normalized not in numbers:
+                numbers.append(normalized)
+        new_rows = [
+            {'rootcall_config_id': row.id, 'name': n, 'phone_number': n, 'is_active': True, 'total_calls': 0}
+            for n in numbers if (row.id, n) not in seen
+        ]
+        if new_rows:
+            bind.execute(contacts.insert(), new_rows)
+        seen.update((row.id, n) for n in numbers)
+        bind.execute(configs.update().where(configs.c.id == row.id).values(trusted_contacts=numbers))
+
+    op.create_index('ix_trusted_contacts_config_phone', 'trusted_contacts', ['rootcall_config_id', 'phone_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trusted_contacts_config_phone', table_name='trusted_contacts')
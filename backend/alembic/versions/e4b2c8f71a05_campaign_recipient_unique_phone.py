@@ -0,0 +1,55 @@
+"""campaign_recipient_unique_phone
+
+Revision ID: e4b2c8f71a05
+Revises: d1f8a3c57e92
+Create Date: 2026-10-16 21:48:12.530774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b2c8f71a05'
+down_revision: Union[str, None] = 'd1f8a3c57e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    recipients = sa.table(
+        'campaign_recipients',
+        sa.column('id', sa.Integer),
+        sa.column('campaign_id', sa.Integer),
+        sa.column('phone_number', sa.String),
+    )
+    campaigns = sa.table(
+        'bulk_campaigns',
+        sa.column('id', sa.Integer),
+        sa.column('total_recipients', sa.Integer),
+    )
+
+    # Keep the first row per (campaign, number); later duplicates were never meant to be dialed twice
+    first = (
+        sa.select(sa.func.min(recipients.c.id))
+        .group_by(recipients.c.campaign_id, recipients.c.phone_number)
+        .scalar_subquery()
+    )
+    bind.execute(recipients.delete().where(recipients.c.id.notin_(first)))
+
+    # total_recipients was overwritten with the size of the last batch added; recount
+    count = (
+        sa.select(sa.func.count(recipients.c.id))
+        .where(recipients.c.campaign_id == campaigns.c.id)
+        .scalar_subquery()
+    )
+    bind.execute(campaigns.update().values(total_recipients=count))
+
+    op.create_index('ux_campaign_recipients_campaign_phone', 'campaign_recipients', ['campaign_id', 'phone_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_campaign_recipients_campaign_phone', table_name='campaign_recipients')
@@ -0,0 +1,40 @@
+"""rootcall_action_counts
+
+Revision ID: e81b3c04d6a2
+Revises: c5e1a7d93b24
+Create Date: 2026-10-16 11:40:07.518263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81b3c04d6a2'
+down_revision: Union[str, None] = 'c5e1a7d93b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rootcall_action_counts',
+    sa.Column('phone_number_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('phone_number_id', 'action')
+    )
+
+    # Backfill from existing logs (0 = rows without a phone)
+    if sa.inspect(op.get_bind()).has_table('rootcall_call_logs'):
+        op.execute(
+            "INSERT INTO rootcall_action_counts (phone_number_id, action, count, updated_at) "
+            "SELECT COALESCE(phone_number_id, 0), action, COUNT(*), CURRENT_TIMESTAMP "
+            "FROM rootcall_call_logs GROUP BY COALESCE(phone_number_id, 0), action"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('rootcall_action_counts')
@@ -0,0 +1,61 @@
+"""call_hourly_rollups
+
+Revision ID: f27d8e5a9c13
+Revises: e81b3c04d6a2
+Create Date: 2026-10-16 14:05:52.330917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f27d8e5a9c13'
+down_revision: Union[str, None] = 'e81b3c04d6a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+HOUR_SQL = {
+    'postgresql': "date_trunc('hour', started_at)",
+    'sqlite': "strftime('%Y-%m-%d %H:00:00.000000', started_at)",
+}
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_calls_started_at'), 'calls', ['started_at'], unique=False)
+
+    op.create_table('call_hourly_rollups',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('phone_number_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('answered', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('seconds', sa.BigInteger(), nullable=False),
+    sa.Column('cost', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('user_id', 'phone_number_id', 'hour')
+    )
+    op.create_index('ix_call_hourly_rollups_user_hour', 'call_hourly_rollups', ['user_id', 'hour'], unique=False)
+
+    # Backfill from existing calls (python -m app.services.call_rollups rebuild does the same)
+    hour = HOUR_SQL.get(op.get_bind().dialect.name, "date_format(started_at, '%Y-%m-%d %H:00:00')")
+    op.execute(
+        "INSERT INTO call_hourly_rollups "
+        "(user_id, phone_number_id, hour, calls, answered, completed, seconds, cost, updated_at) "
+        f"SELECT user_id, phone_number_id, {hour}, COUNT(id), "
+        "SUM(CASE WHEN answered_at IS NOT NULL THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END), "
+        "COALESCE(SUM(duration), 0), COALESCE(SUM(cost), 0), CURRENT_TIMESTAMP "
+        "FROM calls WHERE started_at IS NOT NULL "
+        f"GROUP BY user_id, phone_number_id, {hour}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_call_hourly_rollups_user_hour', table_name='call_hourly_rollups')
+    op.drop_table('call_hourly_rollups')
+    op.drop_index(op.f('ix_calls_started_at'), table_name='calls')
@@ -0,0 +1,68 @@
+"""job_owner_dedupe_unique
+
+Revision ID: f3a9d2c6b184
+Revises: e4b2c8f71a05
+Create Date: 2026-10-16 23:12:37.804416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d2c6b184'
+down_revision: Union[str, None] = 'e4b2c8f71a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = "status IN ('queued', 'running')"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    jobs = sa.table(
+        'jobs',
+        sa.column('id', sa.Integer),
+        sa.column('status', sa.String),
+        sa.column('dedupe_key', sa.String),
+        sa.column('last_error', sa.Text),
+        sa.column('finished_at', sa.DateTime),
+    )
+
+    # Batch mode: SQLite cannot ALTER constraints in place
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_jobs_user_id_users', 'users', ['user_id'], ['id'])
+    op.create_index(op.f('ix_jobs_user_id'), 'jobs', ['user_id'], unique=False)
+
+    # Racing enqueues could leave two active jobs per key; keep the oldest
+    active = jobs.c.status.in_(('queued', 'running'))
+    first = (
+        sa.select(sa.func.min(jobs.c.id))
+        .where(active, jobs.c.dedupe_key.isnot(None))
+        .group_by(jobs.c.dedupe_key)
+        .scalar_subquery()
+    )
+    bind.execute(
+        jobs.update()
+        .where(active, jobs.c.dedupe_key.isnot(None), jobs.c.id.notin_(first))
+        .values(status='dead', last_error='duplicate of an active job with the same dedupe_key',
+                finished_at=sa.func.now())
+    )
+
+    op.drop_index('ix_jobs_dedupe_key', table_name='jobs')
+    op.create_index(
+        'ux_jobs_dedupe_key_active', 'jobs', ['dedupe_key'], unique=True,
+        postgresql_where=sa.text(ACTIVE), sqlite_where=sa.text(ACTIVE),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_jobs_dedupe_key_active', table_name='jobs')
+    op.create_index('ix_jobs_dedupe_key', 'jobs', ['dedupe_key'], unique=False)
+    op.drop_index(op.f('ix_jobs_user_id'), table_name='jobs')
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_constraint('fk_jobs_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.deps import get_db
 from app import models
 from app.services.email_service import EmailService
+from app.services.jobs import schedule_reminder
 from app.config import settings
 import telnyx
 
@@ -105,11 +106,11 @@ def create_appointment(
         if body.customer_email:
             bg.add_task(_send_email, body.customer_email, "Appointment Confirmation", f"<p>{msg}</p>")
 
-    # Reminder notification
+    # Reminder notification (a delayed job, sent by the worker at the reminder time)
     if body.remind_minutes_before and body.customer_phone:
-        delay = (body.starts_at - timedelta(minutes=body.remind_minutes_before) - datetime.utcnow()).total_seconds()
-        if delay > 0:
-            bg.add_task(_send_sms, body.customer_phone, f"Reminder: appointment at {body.starts_at.strftime('%Y-%m-%d %H:%M %Z')}")
+        text = f"Reminder: appointment at {body.starts_at.strftime('%Y-%m-%d %H:%M %Z')}"
+        if schedule_reminder(db, appt, body.remind_minutes_before, text) is not None:
+            db.commit()
 
     return appt
 
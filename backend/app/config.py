@@ -18,6 +18,133 @@ class Settings:
     # Telnyx
     TELNYX_API_KEY: str = os.getenv("TELNYX_API_KEY", "")
     TELNYX_PUBLIC_KEY: str = os.getenv("TELNYX_PUBLIC_KEY", "")
+    TELNYX_BASE_URL: str = os.getenv("TELNYX_BASE", "https://api.telnyx.com/v2")
+    TELNYX_HTTP_MAX_CONNECTIONS: int = int(os.getenv("TELNYX_HTTP_MAX_CONNECTIONS", "100"))
+    TELNYX_HTTP_MAX_KEEPALIVE: int = int(os.getenv("TELNYX_HTTP_MAX_KEEPALIVE", "20"))
+
+    # Webhook dispatch (ack fast, process per-call in background)
+    WEBHOOK_DISPATCH_SHARDS: int = int(os.getenv("WEBHOOK_DISPATCH_SHARDS", "64"))
+    WEBHOOK_QUEUE_MAXSIZE: int = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", "1000"))
+
+    # Redis (optional - see infrastructure/docker-compose.yml)
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Webhook de-duplication: "memory" (per worker) or "redis" (shared)
+    WEBHOOK_DEDUP_BACKEND: str = os.getenv("WEBHOOK_DEDUP_BACKEND", "memory").lower()
+    WEBHOOK_DEDUP_TTL_SECONDS: int = int(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "86400"))
+    WEBHOOK_DEDUP_MAX_ENTRIES: int = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "100000"))
+
+    # RootCall routing config cache: invalidation "local" or "redis" (pub/sub)
+    CONFIG_CACHE_TTL_SECONDS: int = int(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300"))
+    CONFIG_INVALIDATION_BACKEND: str = os.getenv("CONFIG_INVALIDATION_BACKEND", "local").lower()
+    CONFIG_INVALIDATION_CHANNEL: str = os.getenv("CONFIG_INVALIDATION_CHANNEL", "rootcall:config:invalidate")
+
+    # Phone number normalization (E.164)
+    PHONE_DEFAULT_COUNTRY_CODE: str = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "1")
+    PHONE_NORMALIZE_CACHE_SIZE: int = int(os.getenv("PHONE_NORMALIZE_CACHE_SIZE", "65536"))
+
+    # Spam scoring: calls scoring >= threshold (0-100) are blocked when auto_block_spam is on
+    SPAM_BLOCK_THRESHOLD: int = int(os.getenv("SPAM_BLOCK_THRESHOLD", "70"))
+    SPAM_REPUTATION_MAX_ENTRIES: int = int(os.getenv("SPAM_REPUTATION_MAX_ENTRIES", "200000"))
+
+    # Global (cross-tenant) reputation index, memory-mapped by every worker
+    REPUTATION_INDEX_PATH: str = os.getenv("REPUTATION_INDEX_PATH", "./data/reputation.idx")
+    REPUTATION_BLOCKLIST_DIR: str = os.getenv("REPUTATION_BLOCKLIST_DIR", "./data/blocklists")
+    REPUTATION_REBUILD_INTERVAL_SECONDS: int = int(os.getenv("REPUTATION_REBUILD_INTERVAL_SECONDS", "300"))
+    REPUTATION_BLOOM_BITS_PER_KEY: int = int(os.getenv("REPUTATION_BLOOM_BITS_PER_KEY", "12"))
+    # Call log ids this far below the newest are re-checked for rows that committed late
+    REPUTATION_RESCAN_WINDOW: int = int(os.getenv("REPUTATION_RESCAN_WINDOW", "2000"))
+
+    # Caller velocity: flag a number calling too many times / DIDs within the window
+    VELOCITY_WINDOW_SECONDS: int = int(os.getenv("VELOCITY_WINDOW_SECONDS", "300"))
+    VELOCITY_BUCKETS: int = int(os.getenv("VELOCITY_BUCKETS", "10"))
+    VELOCITY_MAX_CALLS: int = int(os.getenv("VELOCITY_MAX_CALLS", "20"))
+    VELOCITY_MAX_DIDS: int = int(os.getenv("VELOCITY_MAX_DIDS", "5"))
+    VELOCITY_MAX_CALLERS: int = int(os.getenv("VELOCITY_MAX_CALLERS", "100000"))
+
+    # Write-behind RootCall call log: flush every N records or M milliseconds
+    CALL_LOG_BATCH_SIZE: int = int(os.getenv("CALL_LOG_BATCH_SIZE", "500"))
+    CALL_LOG_FLUSH_MS: int = int(os.getenv("CALL_LOG_FLUSH_MS", "250"))
+    CALL_LOG_QUEUE_MAXSIZE: int = int(os.getenv("CALL_LOG_QUEUE_MAXSIZE", "50000"))
+
+    # Serve call stats from rootcall_action_counts (false = always GROUP BY the logs)
+    CALL_STATS_USE_COUNTERS: bool = os.getenv("CALL_STATS_USE_COUNTERS", "True").lower() == "true"
+
+    # Hourly call rollups: recompute touched hours every N seconds, re-sweep the last H hours every M seconds
+    ROLLUP_FLUSH_SECONDS: float = float(os.getenv("ROLLUP_FLUSH_SECONDS", "5"))
+    ROLLUP_SWEEP_SECONDS: int = int(os.getenv("ROLLUP_SWEEP_SECONDS", "300"))
+    ROLLUP_SWEEP_HOURS: int = int(os.getenv("ROLLUP_SWEEP_HOURS", "3"))
+
+    # Streaming exports: rows fetched and encoded per batch
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Call history: monthly partitions (PostgreSQL) and archiving of old months
+    # (ARCHIVE_RETENTION_MONTHS=0 keeps everything hot). ARCHIVE_URL: directory or s3://bucket/prefix
+    ARCHIVE_RETENTION_MONTHS: int = int(os.getenv("ARCHIVE_RETENTION_MONTHS", "0"))
+    ARCHIVE_URL: str = os.getenv("ARCHIVE_URL", "./data/archive")
+    ARCHIVE_LOCK_PATH: str = os.getenv("ARCHIVE_LOCK_PATH", "./data/archive.lock")
+    ARCHIVE_INTERVAL_SECONDS: int = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "86400"))
+    PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+    # Dashboard WebSockets: per-connection backlog (slow clients beyond it are dropped),
+    # per-frame send timeout and idle ping interval
+    WS_QUEUE_SIZE: int = int(os.getenv("WS_QUEUE_SIZE", "256"))
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+    WS_PING_SECONDS: float = float(os.getenv("WS_PING_SECONDS", "25"))
+    # Dashboard events across workers: "memory" (this worker only) or "redis" (pub/sub, channel per user)
+    DASHBOARD_PUBSUB_BACKEND: str = os.getenv("DASHBOARD_PUBSUB_BACKEND", "memory").lower()
+    DASHBOARD_PUBSUB_PREFIX: str = os.getenv("DASHBOARD_PUBSUB_PREFIX", "dashboard:user:")
+
+    # Live call registry: "memory" (per worker) or "redis" (shared). Calls quiet for STALE seconds are
+    # checked against Telnyx every REAP seconds; anything older than MAX_AGE is dropped
+    LIVE_CALLS_BACKEND: str = os.getenv("LIVE_CALLS_BACKEND", "memory").lower()
+    LIVE_CALLS_REAP_SECONDS: int = int(os.getenv("LIVE_CALLS_REAP_SECONDS", "60"))
+    LIVE_CALLS_STALE_SECONDS: int = int(os.getenv("LIVE_CALLS_STALE_SECONDS", "300"))
+    LIVE_CALLS_MAX_AGE_SECONDS: int = int(os.getenv("LIVE_CALLS_MAX_AGE_SECONDS", "14400"))
+
+    # Campaign progress SSE: publish changed campaigns every TICK seconds, keepalive comment every HEARTBEAT
+    CAMPAIGN_PROGRESS_TICK_SECONDS: float = float(os.getenv("CAMPAIGN_PROGRESS_TICK_SECONDS", "1"))
+    CAMPAIGN_PROGRESS_HEARTBEAT_SECONDS: float = float(os.getenv("CAMPAIGN_PROGRESS_HEARTBEAT_SECONDS", "15"))
+
+    # Campaign dispatch pacing (token buckets holding at most BURST sends). Campaigns set their own
+    # calls_per_minute/hour and concurrent_calls; these apply across campaigns sharing a from-number
+    # or an account (0 = no limit), counted per job worker process, so the effective ceiling is the
+    # limit times the number of processes. Campaign status is re-read every TICK seconds
+    CAMPAIGN_DISPATCH_BURST: float = float(os.getenv("CAMPAIGN_DISPATCH_BURST", "1"))
+    CAMPAIGN_DISPATCH_TICK_SECONDS: float = float(os.getenv("CAMPAIGN_DISPATCH_TICK_SECONDS", "1"))
+    CAMPAIGN_FROM_NUMBER_PER_MINUTE: int = int(os.getenv("CAMPAIGN_FROM_NUMBER_PER_MINUTE", "60"))
+    CAMPAIGN_FROM_NUMBER_PER_HOUR: int = int(os.getenv("CAMPAIGN_FROM_NUMBER_PER_HOUR", "0"))
+    CAMPAIGN_ACCOUNT_PER_MINUTE: int = int(os.getenv("CAMPAIGN_ACCOUNT_PER_MINUTE", "0"))
+    CAMPAIGN_ACCOUNT_PER_HOUR: int = int(os.getenv("CAMPAIGN_ACCOUNT_PER_HOUR", "0"))
+
+    # Campaign recipient imports: rows per INSERT statement (per COPY on PostgreSQL), one transaction each
+    RECIPIENT_LOAD_BATCH_SIZE: int = int(os.getenv("RECIPIENT_LOAD_BATCH_SIZE", "1000"))
+    # CSV uploads: rejected rows kept for the report (background=true uploads are staged in the database)
+    RECIPIENT_UPLOAD_MAX_REJECTS: int = int(os.getenv("RECIPIENT_UPLOAD_MAX_REJECTS", "1000"))
+
+    # Campaign recipient status: write-behind, flushed every N milliseconds or once M recipients are waiting
+    RECIPIENT_STATE_FLUSH_MS: int = int(os.getenv("RECIPIENT_STATE_FLUSH_MS", "250"))
+    RECIPIENT_STATE_BATCH_SIZE: int = int(os.getenv("RECIPIENT_STATE_BATCH_SIZE", "500"))
+
+    # Background jobs (python -m app.worker): PROCESSES worker processes running CONCURRENCY jobs each.
+    # A claimed job is leased for LEASE seconds, renewed every HEARTBEAT; when a lease expires the job is
+    # handed to another worker. Failures retry with exponential backoff, up to MAX_ATTEMPTS runs.
+    # JOB_EMBEDDED_CONCURRENCY > 0 also runs jobs inside the web app (single-process deployments)
+    JOB_WORKER_PROCESSES: int = int(os.getenv("JOB_WORKER_PROCESSES", "2"))
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_EMBEDDED_CONCURRENCY: int = int(os.getenv("JOB_EMBEDDED_CONCURRENCY", "0"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "1"))
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF_SECONDS: int = int(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+    JOB_SHUTDOWN_GRACE_SECONDS: float = float(os.getenv("JOB_SHUTDOWN_GRACE_SECONDS", "30"))
+
+    # Polled portal/dashboard JSON: response cache TTL and size; invalidation "local" or "redis" (pub/sub)
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "5"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+    RESPONSE_CACHE_INVALIDATION_BACKEND: str = os.getenv("RESPONSE_CACHE_INVALIDATION_BACKEND", "local").lower()
+    RESPONSE_CACHE_INVALIDATION_CHANNEL: str = os.getenv("RESPONSE_CACHE_INVALIDATION_CHANNEL", "rootcall:response-cache:invalidate")
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./voip.db")
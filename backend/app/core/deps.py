@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -6,6 +7,7 @@ from app.core.security import decode_access_token
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/v1/auth/login", auto_error=False)
 
 def get_current_user(
     db: Session = Depends(get_db),
@@ -31,6 +33,16 @@ def get_current_user(
 
     return user
 
+def get_optional_user(
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> Optional[User]:
+    """The signed-in user, or None when there is no valid token"""
+    payload = decode_access_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        return None
+    return db.query(User).filter(User.id == int(payload["sub"])).first()
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
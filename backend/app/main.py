@@ -1,4 +1,5 @@
 """VoIP Platform Main Application"""
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -6,7 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import engine, Base
 from app.routers import rootcall_portal
-from app.routers import payments, number_management, auth, admin
+from app.routers import payments, number_management, auth, admin, dashboard, jobs
 
 # Import routers
 from app.routers import (
@@ -24,16 +25,73 @@ from app.routers.retell_inbound import router as retell_inbound_router
 from app.api.v1 import provision_finalize
 from app.routers import agent_templates
 from app.routers.rootcall_screen import router as rootcall_screen_router
+from app.services.telnyx_client import start_telnyx_client, close_telnyx_client
+from app.services.webhook_dispatcher import screen_dispatcher
+from app.services.webhook_dedup import webhook_dedup, DuplicateWebhookEvent, duplicate_webhook_handler
+from app.services.config_cache import start_config_cache, stop_config_cache
+from app.services.response_cache import start_response_cache, stop_response_cache
+from app.services.reputation_index import reputation_index, reputation_rebuilder
+from app.services.call_log import call_log_writer
+from app.services.call_rollups import rollup_updater
+from app.services.call_archive import archive_maintainer
+from app.services.event_bus import event_bus
+from app.services.live_calls import live_calls
+from app.services.campaign_progress import campaign_progress
+from app.services.job_queue import embedded_worker
+from app.services import jobs as _jobs  # noqa: F401  (job handlers, for the embedded worker)
 
 # Create database tables
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared pooled Telnyx client for all call-control actions
+    await start_telnyx_client()
+    await start_config_cache()
+    await start_response_cache()
+    call_log_writer.start()
+    screen_dispatcher.start()
+    reputation_rebuilder.start()
+    rollup_updater.start()
+    archive_maintainer.start()
+    await event_bus.start()
+    live_calls.start()
+    campaign_progress.start()
+    # Only with JOB_EMBEDDED_CONCURRENCY > 0; otherwise jobs run in python -m app.worker
+    embedded_worker.start()
+    try:
+        yield
+    finally:
+        await embedded_worker.stop(grace=settings.JOB_SHUTDOWN_GRACE_SECONDS)
+        await campaign_progress.stop()
+        await event_bus.close()
+        await live_calls.stop()
+        await archive_maintainer.stop()
+        # Drain queued webhook work before the HTTP client goes away
+        await screen_dispatcher.stop()
+        # After the dispatcher, so outcomes of drained events are written too
+        await call_log_writer.stop()
+        await close_telnyx_client()
+        await webhook_dedup.close()
+        await stop_config_cache()
+        await stop_response_cache()
+        await reputation_rebuilder.stop()
+        reputation_index.close()
+        # Last, so calls finished while draining are rolled up too
+        await rollup_updater.stop()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="VoIP Platform API",
     description="Complete VoIP platform with conversational AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Redelivered webhooks are acknowledged without reaching the handler
+app.add_exception_handler(DuplicateWebhookEvent, duplicate_webhook_handler)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -65,6 +123,8 @@ app.include_router(payments.router)
 app.include_router(number_management.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
+app.include_router(dashboard.router)  # Live dashboard + WebSocket
+app.include_router(jobs.router)  # Background job status
 
 @app.get("/")
 async def root():
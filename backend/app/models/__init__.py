@@ -17,3 +17,12 @@ __all__ = [
 from app.models.agent_template import AgentTemplate
 
 __all__.append("AgentTemplate")
+from app.models.call_rollup import CallHourlyRollup
+
+__all__.append("CallHourlyRollup")
+from app.models.job import Job
+
+__all__.append("Job")
+from app.models.recipient_upload import RecipientUpload, RecipientUploadChunk
+
+__all__ += ["RecipientUpload", "RecipientUploadChunk"]
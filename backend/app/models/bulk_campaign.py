@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON, Float, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON, Float, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum
@@ -30,6 +30,9 @@ class RecipientStatus(str, Enum):
 
 class BulkCampaign(Base):
     __tablename__ = "bulk_campaigns"
+    __table_args__ = (
+        Index("ix_bulk_campaigns_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -93,7 +96,7 @@ class BulkCampaign(Base):
     quiet_hours_end = Column(String, default="08:00")
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -107,6 +110,13 @@ class BulkCampaign(Base):
 
 class CampaignRecipient(Base):
     __tablename__ = "campaign_recipients"
+    __table_args__ = (
+        # Keyset pagination by id within a campaign, optionally per status
+        Index("ix_campaign_recipients_campaign_id", "campaign_id", "id"),
+        Index("ix_campaign_recipients_campaign_status", "campaign_id", "status", "id"),
+        # One row per number per campaign; bulk loads skip numbers already present
+        Index("ux_campaign_recipients_campaign_phone", "campaign_id", "phone_number", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     campaign_id = Column(Integer, ForeignKey("bulk_campaigns.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -6,6 +6,10 @@ from app.database import Base
 
 class Call(Base):
     __tablename__ = "calls"
+    __table_args__ = (
+        # Keyset pagination of a user's calls by (started_at, id)
+        Index("ix_calls_user_started", "user_id", "started_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -32,7 +36,7 @@ class Call(Base):
     sentiment = Column(String, nullable=True)
     
     # Timestamps
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     answered_at = Column(DateTime, nullable=True)
     ended_at = Column(DateTime, nullable=True)
     
@@ -0,0 +1,25 @@
+"""Hourly call rollups for dashboard statistics"""
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Float, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class CallHourlyRollup(Base):
+    """Aggregates of calls started in one hour on one phone number (see services/call_rollups)"""
+    __tablename__ = "call_hourly_rollups"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    phone_number_id = Column(Integer, primary_key=True, autoincrement=False)
+    hour = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+
+    calls = Column(Integer, nullable=False, default=0)
+    answered = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    seconds = Column(BigInteger, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_call_hourly_rollups_user_hour", "user_id", "hour"),
+    )
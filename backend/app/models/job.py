@@ -0,0 +1,50 @@
+"""Durable background jobs (see services/job_queue)"""
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index, ForeignKey, text
+from app.database import Base
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    DEAD = "dead"  # out of attempts
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default=JobStatus.QUEUED.value)
+
+    # Not claimable before run_at; while running, invisible to other workers until lease_expires_at
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)  # handler's return value
+    # At most one queued/running job per key (e.g. "campaign:12"); enforced by ux_jobs_dedupe_key_active
+    dedupe_key = Column(String(200), nullable=True)
+    # Who submitted it; only they can read it through the API (None = system job, e.g. webhooks)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index(
+            "ux_jobs_dedupe_key_active", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
@@ -0,0 +1,39 @@
+"""CSV uploads staged for a background import (see services/recipient_upload)"""
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, Integer, String, DateTime, JSON, LargeBinary, ForeignKey, Index
+from app.database import Base
+
+
+class UploadStatus(str, Enum):
+    STAGED = "staged"
+    IMPORTED = "imported"
+    REJECTED = "rejected"  # bad header; retrying would fail the same way
+
+
+class RecipientUpload(Base):
+    __tablename__ = "recipient_uploads"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("bulk_campaigns.id"), nullable=False)
+    status = Column(String(20), nullable=False, default=UploadStatus.STAGED.value)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    # The import's report once it finished; a retried job returns it instead of importing again
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class RecipientUploadChunk(Base):
+    """The file itself, in order; deleted once the import finishes"""
+    __tablename__ = "recipient_upload_chunks"
+
+    id = Column(Integer, primary_key=True)
+    upload_id = Column(Integer, ForeignKey("recipient_uploads.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ux_recipient_upload_chunks_upload_seq", "upload_id", "seq", unique=True),
+    )
@@ -1,7 +1,7 @@
 """
 RootCall Call Logs Model
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -15,4 +15,15 @@ class RootCallCallLog(Base):
     action = Column(String(50), nullable=False)
     status = Column(String(50), nullable=False)
     call_control_id = Column(String(255))
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class RootCallActionCount(Base):
+    """Running count of rootcall_call_logs rows per (phone, action); kept by the call log writer"""
+    __tablename__ = "rootcall_action_counts"
+
+    # 0 = log rows without a phone_number_id
+    phone_number_id = Column(Integer, primary_key=True, autoincrement=False)
+    action = Column(String(50), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
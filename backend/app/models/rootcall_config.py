@@ -5,7 +5,7 @@ Save as: app/models/rootcall_config.py
 Stores RootCall screening configuration per phone number
 Replaces hardcoded CLIENT_LINES dictionary
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -54,15 +54,19 @@ class RootCallConfig(Base):
 
 
 class TrustedContact(Base):
-    """Individual trusted contact (alternative to JSON array)"""
+    """Individual trusted contact - source of the in-memory trusted set used by screening"""
     __tablename__ = "trusted_contacts"
+    __table_args__ = (
+        # One row per normalized E.164 number per config; also the screening lookup key
+        Index("ix_trusted_contacts_config_phone", "rootcall_config_id", "phone_number", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     rootcall_config_id = Column(Integer, ForeignKey("rootcall_configs.id"), nullable=False)
     
     # Contact details
     name = Column(String, nullable=False)
-    phone_number = Column(String, nullable=False)
+    phone_number = Column(String, nullable=False)  # E.164, normalized on write
     relationship_type = Column(String)  # family, friend, doctor, etc.
     notes = Column(String, nullable=True)
     
@@ -2,10 +2,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from typing import Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.phone_number import PhoneNumber
-from app.models.rootcall_call_log import RootCallCallLog
+from app.services.call_stats import action_counts, call_total
+from app.services.pagination import paginate, estimated_row_count
 
 router = APIRouter(tags=["Admin"])
 
@@ -20,8 +22,9 @@ async def admin_dashboard(admin_id: int, db: Session = Depends(get_db)):
     
     total_users = db.query(User).count()
     total_numbers = db.query(PhoneNumber).filter(PhoneNumber.is_active == True).count()
-    total_calls = db.query(RootCallCallLog).count()
-    spam_blocked = db.query(RootCallCallLog).filter(RootCallCallLog.action == "spam_blocked").count()
+    call_counts = action_counts(db)
+    total_calls = call_total(call_counts)
+    spam_blocked = call_counts.get("spam_blocked", 0)
     
     recent_users = db.query(User).order_by(User.created_at.desc()).limit(10).all()
     
@@ -39,11 +42,18 @@ async def admin_dashboard(admin_id: int, db: Session = Depends(get_db)):
     }
 
 @router.get("/api/admin/users/{admin_id}")
-async def get_all_users(admin_id: int, skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+async def get_all_users(
+    admin_id: int,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: Session = Depends(get_db)
+):
     if not is_admin(admin_id, db):
         raise HTTPException(status_code=403)
     
-    users = db.query(User).offset(skip).limit(limit).all()
+    users, next_cursor = paginate(db.query(User), [(User.id, False)], limit=limit, cursor=cursor, offset=skip)
     
     return {
         "users": [
@@ -56,5 +66,7 @@ async def get_all_users(admin_id: int, skip: int = 0, limit: int = 50, db: Sessi
             }
             for u in users
         ],
-        "total": db.query(User).count()
+        "next_cursor": next_cursor,
+        # Planner estimate on PostgreSQL
+        "total": estimated_row_count(db, User) if include_total else None
     }
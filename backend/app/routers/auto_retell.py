@@ -10,6 +10,8 @@ from app.database import get_db
 from app.models.call import Call
 from app.models.phone_number import PhoneNumber
 from app.models.ai_agent import AIAgent
+from app.services.telnyx_client import get_telnyx_client
+from app.services.webhook_dedup import dedupe_telnyx_event
 
 router = APIRouter(prefix="/auto-retell", tags=["Auto Retell"])
 log = logging.getLogger(__name__)
@@ -17,7 +19,7 @@ log = logging.getLogger(__name__)
 # Store active call mappings
 active_calls = {}
 
-@router.post("/webhook")
+@router.post("/webhook", dependencies=[Depends(dedupe_telnyx_event)])
 async def telnyx_webhook(request: Request, db: Session = Depends(get_db)):
     """Handle Telnyx webhooks and automatically create Retell calls"""
     
@@ -55,15 +57,8 @@ async def telnyx_webhook(request: Request, db: Session = Depends(get_db)):
         log.info(f"í´ Using agent: {retell_agent_id}")
         
         # Answer the call
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            await client.post(
-                f"https://api.telnyx.com/v2/calls/{call_control_id}/actions/answer",
-                headers={
-                    "Authorization": f"Bearer {settings.TELNYX_API_KEY}",
-                    "Content-Type": "application/json"
-                }
-            )
-            log.info(f"â Answered call")
+        await get_telnyx_client().answer(call_control_id)
+        log.info(f"â Answered call")
         
         # Create Retell phone call
         try:
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import csv
-import io
+import asyncio
 
 from app.database import get_db
 from app.models.bulk_campaign import (
@@ -12,6 +12,11 @@ from app.models.bulk_campaign import (
     CampaignType, CampaignStatus
 )
 from app.services.bulk_service import BulkCampaignService
+from app.services.campaign_progress import campaign_progress, load_snapshot, progress_events
+from app.services.phone_numbers import normalize_batch
+from app.services.export_stream import export_response
+from app.services.recipient_upload import ingest_csv, stage_upload
+from app.services.pagination import paginate
 
 router = APIRouter(prefix="/api/v1/bulk", tags=["Bulk Campaigns"])
 
@@ -131,12 +136,20 @@ def add_recipients(
     """Add recipients to a campaign"""
     try:
         recipients_data = [r.dict() for r in request.recipients]
-        recipients = BulkCampaignService.add_recipients(db, campaign_id, recipients_data)
+        batch = normalize_batch(r["phone_number"] for r in recipients_data)
+        for recipient, phone_number in zip(recipients_data, batch.numbers):
+            recipient["phone_number"] = phone_number
+        recipients_data = [r for r in recipients_data if r["phone_number"]]
+        
+        loaded = BulkCampaignService.add_recipients(db, campaign_id, recipients_data)
         
         return {
             "success": True,
             "campaign_id": campaign_id,
-            "recipients_added": len(recipients)
+            "recipients_added": loaded["inserted"],
+            "duplicates": loaded["duplicates"],
+            "rejected": len(batch.rejects),
+            "rejected_rows": [r.to_dict() for r in batch.rejects[:100]]
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -146,45 +159,39 @@ def add_recipients(
 async def upload_recipients_csv(
     campaign_id: int,
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Upload recipients via CSV file"""
+    """
+    Upload recipients via CSV file, streamed in chunks. background=true
+    queues the import as a job and returns its id (poll /api/v1/jobs/{id}).
+    """
+    campaign = db.query(BulkCampaign.id, BulkCampaign.user_id).filter(BulkCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    if background:
+        job_id = await asyncio.to_thread(stage_upload, db, campaign_id, file.file, campaign.user_id)
+        return {"success": True, "campaign_id": campaign_id, "status": "queued", "job_id": job_id}
+    
     try:
-        content = await file.read()
-        csv_file = io.StringIO(content.decode('utf-8'))
-        csv_reader = csv.DictReader(csv_file)
-        
-        recipients_data = []
-        for row in csv_reader:
-            recipient = {
-                "phone_number": row.get("phone_number", "").strip(),
-                "name": row.get("name", "").strip() or None,
-                "email": row.get("email", "").strip() or None,
-            }
-            
-            custom_data = {}
-            for key, value in row.items():
-                if key not in ["phone_number", "name", "email"] and value:
-                    custom_data[key] = value.strip()
-            
-            if custom_data:
-                recipient["custom_data"] = custom_data
-            
-            if recipient["phone_number"]:
-                recipients_data.append(recipient)
-        
-        if not recipients_data:
-            raise HTTPException(status_code=400, detail="No valid recipients found in CSV")
-        
-        recipients = BulkCampaignService.add_recipients(db, campaign_id, recipients_data)
-        
-        return {
-            "success": True,
-            "campaign_id": campaign_id,
-            "recipients_added": len(recipients)
-        }
+        report = await asyncio.to_thread(ingest_csv, db, campaign_id, file.file)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if not report["inserted"] and not report["duplicates"]:
+        raise HTTPException(status_code=400, detail="No valid recipients found in CSV")
+    
+    return {
+        "success": True,
+        "campaign_id": campaign_id,
+        "recipients_added": report["inserted"],
+        "duplicates": report["duplicates"],
+        "rows": report["rows"],
+        "rejected": report["rejected"],
+        "reject_summary": report["reject_summary"],
+        "rejected_rows": report["rejected_rows"]
+    }
 
 
 @router.post("/campaigns/{campaign_id}/start")
@@ -239,6 +246,24 @@ def get_campaign_stats(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/campaigns/{campaign_id}/progress")
+async def stream_campaign_progress(campaign_id: int):
+    """
+    Live progress as Server-Sent Events: a snapshot, then changed counts
+    at most once per tick, then done. No DB session is held while streaming.
+    """
+    snapshot = campaign_progress.snapshot(campaign_id)
+    if snapshot is None:
+        snapshot = await asyncio.to_thread(load_snapshot, campaign_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return StreamingResponse(
+        progress_events(snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/campaigns/{campaign_id}")
 def get_campaign(
     campaign_id: int,
@@ -281,9 +306,11 @@ def list_campaigns(
     campaign_type: Optional[CampaignType] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: Session = Depends(get_db)
 ):
-    """List all campaigns for a user"""
+    """List all campaigns for a user (pass next_cursor back as cursor for the next page; total is opt-in)"""
     query = db.query(BulkCampaign).filter(BulkCampaign.user_id == user_id)
     
     if status:
@@ -292,7 +319,11 @@ def list_campaigns(
     if campaign_type:
         query = query.filter(BulkCampaign.campaign_type == campaign_type)
     
-    campaigns = query.order_by(BulkCampaign.created_at.desc()).limit(limit).offset(offset).all()
+    campaigns, next_cursor = paginate(
+        query,
+        [(BulkCampaign.created_at, True), (BulkCampaign.id, True)],
+        limit=limit, cursor=cursor, offset=offset
+    )
     
     return {
         "campaigns": [
@@ -309,7 +340,9 @@ def list_campaigns(
             }
             for c in campaigns
         ],
-        "total": query.count()
+        "next_cursor": next_cursor,
+        # Exact count, so only on request; indexed on user_id
+        "total": query.count() if include_total else None
     }
 
 
@@ -319,15 +352,25 @@ def get_campaign_recipients(
     status: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     db: Session = Depends(get_db)
 ):
-    """Get recipients for a campaign"""
+    """Get recipients for a campaign (pass next_cursor back as cursor for the next page)"""
     query = db.query(CampaignRecipient).filter(CampaignRecipient.campaign_id == campaign_id)
     
     if status:
         query = query.filter(CampaignRecipient.status == status)
     
-    recipients = query.limit(limit).offset(offset).all()
+    recipients, next_cursor = paginate(
+        query, [(CampaignRecipient.id, False)],
+        limit=limit, cursor=cursor, offset=offset
+    )
+    
+    # Approximate total from the campaign counter; not kept per status
+    total = None
+    if include_total and not status:
+        total = db.query(BulkCampaign.total_recipients).filter(BulkCampaign.id == campaign_id).scalar()
     
     return {
         "recipients": [
@@ -346,10 +389,52 @@ def get_campaign_recipients(
             }
             for r in recipients
         ],
-        "total": query.count()
+        "next_cursor": next_cursor,
+        "total": total
     }
 
 
+@router.get("/campaigns/{campaign_id}/recipients/export")
+def export_campaign_recipients(
+    campaign_id: int,
+    status: Optional[str] = None,
+    format: str = "csv",
+    db: Session = Depends(get_db)
+):
+    """Stream campaign results as CSV, gzip'd CSV or NDJSON"""
+    campaign = db.query(BulkCampaign.id).filter(BulkCampaign.id == campaign_id).first()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    where = [CampaignRecipient.campaign_id == campaign_id]
+    if status:
+        where.append(CampaignRecipient.status == status)
+    
+    return export_response(
+        [
+            ("id", "ID", CampaignRecipient.id),
+            ("phone_number", "Phone Number", CampaignRecipient.phone_number),
+            ("name", "Name", CampaignRecipient.name),
+            ("email", "Email", CampaignRecipient.email),
+            ("status", "Status", CampaignRecipient.status),
+            ("attempts", "Attempts", CampaignRecipient.attempts),
+            ("call_status", "Call Status", CampaignRecipient.call_status),
+            ("call_duration", "Call Duration", CampaignRecipient.call_duration),
+            ("voicemail_detected", "Voicemail", CampaignRecipient.voicemail_detected),
+            ("dtmf_response", "DTMF", CampaignRecipient.dtmf_response),
+            ("message_status", "Message Status", CampaignRecipient.message_status),
+            ("cost", "Cost", CampaignRecipient.cost),
+            ("error_message", "Error", CampaignRecipient.error_message),
+            ("last_attempt_at", "Last Attempt", CampaignRecipient.last_attempt_at),
+            ("completed_at", "Completed At", CampaignRecipient.completed_at),
+        ],
+        where=where,
+        order_by=[CampaignRecipient.id],
+        fmt=format,
+        filename=f"campaign_{campaign_id}_recipients",
+    )
+
+
 @router.delete("/campaigns/{campaign_id}")
 def delete_campaign(
     campaign_id: int,
@@ -4,8 +4,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
-import csv
-import io
+import asyncio
 import logging
 
 from app.database import get_db
@@ -14,6 +13,7 @@ from app.models.phone_number import PhoneNumber
 from app.models.ai_agent import AIAgent
 from app.models.subscription import Subscription, FeatureType
 from app.services.retell_service import retell_service
+from app.services.recipient_upload import ingest_csv, stage_upload
 from app.config import settings
 
 router = APIRouter(prefix="/api/v1/campaigns", tags=["Campaign Management"])
@@ -105,35 +105,6 @@ def check_feature_enabled(db: Session, user_id: int, feature: str) -> bool:
     return user_feature is not None
 
 
-def parse_csv_recipients(csv_content: str) -> List[dict]:
-    """Parse CSV file and extract recipient data"""
-    recipients = []
-    
-    csv_file = io.StringIO(csv_content)
-    reader = csv.DictReader(csv_file)
-    
-    for row in reader:
-        # Required field: phone_number
-        if 'phone_number' not in row or not row['phone_number']:
-            continue
-        
-        recipient = {
-            'phone_number': row['phone_number'].strip(),
-            'name': row.get('name', '').strip() or None,
-            'email': row.get('email', '').strip() or None,
-            'custom_data': {}
-        }
-        
-        # Add any additional columns as custom_data
-        for key, value in row.items():
-            if key not in ['phone_number', 'name', 'email'] and value:
-                recipient['custom_data'][key] = value
-        
-        recipients.append(recipient)
-    
-    return recipients
-
-
 async def execute_campaign(campaign_id: int, db: Session):
     """Execute campaign in background"""
     campaign = db.query(BulkCampaign).filter(BulkCampaign.id == campaign_id).first()
@@ -268,49 +239,38 @@ async def upload_recipients_csv(
     campaign_id: int,
     user_id: int,
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Upload CSV file with recipients"""
+    """Upload CSV file with recipients (streamed; background=true queues it as a job)"""
     
     # Verify campaign access
     campaign = verify_campaign_access(db, user_id, campaign_id)
     
-    # Read and parse CSV
+    if background:
+        job_id = await asyncio.to_thread(stage_upload, db, campaign_id, file.file, user_id)
+        return {"campaign_id": campaign_id, "job_id": job_id, "status": "queued"}
+    
     try:
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        recipients_data = parse_csv_recipients(csv_content)
-        
-        if not recipients_data:
-            raise HTTPException(status_code=400, detail="No valid recipients found in CSV")
-        
-        # Add recipients to campaign
-        for data in recipients_data:
-            recipient = CampaignRecipient(
-                campaign_id=campaign_id,
-                phone_number=data['phone_number'],
-                name=data.get('name'),
-                email=data.get('email'),
-                custom_data=data.get('custom_data'),
-                status="pending"
-            )
-            db.add(recipient)
-        
-        # Update campaign total
-        campaign.total_recipients = len(recipients_data)
-        db.commit()
-        
-        log.info(f"✅ Uploaded {len(recipients_data)} recipients to campaign {campaign.name}")
-        
-        return {
-            "campaign_id": campaign_id,
-            "recipients_uploaded": len(recipients_data),
-            "status": "success"
-        }
-        
+        report = await asyncio.to_thread(ingest_csv, db, campaign_id, file.file)
     except Exception as e:
         log.error(f"Failed to upload CSV: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
+    
+    if not report["inserted"] and not report["duplicates"]:
+        raise HTTPException(status_code=400, detail="No valid recipients found in CSV")
+    
+    log.info(f"Uploaded {report['inserted']} recipients to campaign {campaign.name}")
+    
+    return {
+        "campaign_id": campaign_id,
+        "recipients_uploaded": report["inserted"],
+        "duplicates": report["duplicates"],
+        "rejected": report["rejected"],
+        "reject_summary": report["reject_summary"],
+        "rejected_rows": report["rejected_rows"],
+        "status": "success"
+    }
 
 
 @router.post("/{campaign_id}/start")
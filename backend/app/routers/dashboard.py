@@ -1,9 +1,9 @@
 """Real-time Dashboard API for Call Monitoring"""
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional
 from datetime import datetime, timedelta
 import json
 import logging
@@ -14,47 +14,20 @@ from app.models.phone_number import PhoneNumber
 from app.models.bulk_campaign import BulkCampaign, CampaignRecipient
 from app.models.user import User
 from app.models.subscription import Subscription, UsageLog
+from app.services.call_rollups import call_totals
+from app.services.event_bus import event_bus
+from app.services.export_stream import export_response
+from app.services.live_calls import live_calls
+from app.services.pagination import paginate
+from app.services.response_cache import cached_json, campaign_tag, user_tag
 from app.config import settings
+from app.core.deps import get_current_user
+from app.core.security import decode_access_token
 
 router = APIRouter(prefix="/api/v1/dashboard", tags=["Dashboard"])
 log = logging.getLogger(__name__)
 
 
-# ============================================================================
-# WebSocket Connection Manager
-# ============================================================================
-
-class ConnectionManager:
-    """Manage WebSocket connections for real-time updates"""
-    def __init__(self):
-        self.active_connections: dict[int, List[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
-        log.info(f"WebSocket connected for user {user_id}")
-    
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-        log.info(f"WebSocket disconnected for user {user_id}")
-    
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
-
-
-manager = ConnectionManager()
-
-
 # ============================================================================
 # Pydantic Models
 # ============================================================================
@@ -129,51 +102,32 @@ def get_date_range(period: str) -> tuple[datetime, datetime]:
 async def get_dashboard_stats(
     user_id: int,
     period: str = "today",
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get dashboard statistics for user"""
     
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
+    
     start_date, end_date = get_date_range(period)
     
-    # Total calls
-    total_calls = db.query(func.count(Call.id)).filter(
-        Call.user_id == user_id,
-        Call.started_at >= start_date,
-        Call.started_at <= end_date
-    ).scalar() or 0
-    
-    # Active calls (currently in progress)
-    active_calls = db.query(func.count(Call.id)).filter(
-        Call.user_id == user_id,
-        Call.status.in_(["initiated", "ringing", "answered", "in-progress"])
-    ).scalar() or 0
-    
-    # Total minutes
-    total_seconds = db.query(func.sum(Call.duration)).filter(
-        Call.user_id == user_id,
-        Call.started_at >= start_date,
-        Call.started_at <= end_date,
-        Call.duration.isnot(None)
-    ).scalar() or 0
-    total_minutes = int(total_seconds / 60) if total_seconds else 0
+    # calls / completed / seconds / cost from the hourly rollups
+    totals = call_totals(db, user_id, start_date, end_date)
+    total_calls = totals["calls"]
+    total_seconds = totals["seconds"]
+    total_cost = totals["cost"]
     
-    # Total cost
-    total_cost = db.query(func.sum(Call.cost)).filter(
-        Call.user_id == user_id,
-        Call.started_at >= start_date,
-        Call.started_at <= end_date,
-        Call.cost.isnot(None)
-    ).scalar() or 0.0
+    # Active calls (currently in progress), from the live call registry
+    active_calls = await live_calls.active_count(user_id)
     
-    # Success rate (completed calls / total calls)
-    completed_calls = db.query(func.count(Call.id)).filter(
-        Call.user_id == user_id,
-        Call.started_at >= start_date,
-        Call.started_at <= end_date,
-        Call.status == "completed"
-    ).scalar() or 0
+    total_minutes = int(total_seconds / 60) if total_seconds else 0
     
-    success_rate = (completed_calls / total_calls * 100) if total_calls > 0 else 0.0
+    # Success rate (completed calls / total calls)
+    success_rate = (totals["completed"] / total_calls * 100) if total_calls > 0 else 0.0
     
     # Average call duration
     avg_duration = int(total_seconds / total_calls) if total_calls > 0 else 0
@@ -193,17 +147,26 @@ async def get_recent_calls(
     user_id: int,
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get recent calls for user"""
+    """Get recent calls for user (pass next_cursor back as cursor for the next page)"""
     
-    calls = db.query(Call).filter(
-        Call.user_id == user_id
-    ).order_by(
-        Call.started_at.desc()
-    ).limit(limit).offset(offset).all()
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
     
-    return {
+    calls, next_cursor = paginate(
+        db.query(Call).filter(Call.user_id == user_id),
+        [(Call.started_at, True), (Call.id, True)],
+        limit=limit, cursor=cursor, offset=offset
+    )
+    
+    result = {
         "calls": [
             CallStats(
                 call_id=call.call_control_id or str(call.id),
@@ -217,32 +180,40 @@ async def get_recent_calls(
                 ended_at=call.ended_at
             )
             for call in calls
-        ]
+        ],
+        "next_cursor": next_cursor
     }
+    if include_total:
+        # Approximate: from the hourly rollups, which trail new calls by a few seconds
+        result["total"] = call_totals(db, user_id, datetime.min, datetime.utcnow() + timedelta(hours=1))["calls"]
+    return result
 
 
 @router.get("/calls/{user_id}/active")
 async def get_active_calls(
     user_id: int,
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """Get currently active calls"""
     
-    active_calls = db.query(Call).filter(
-        Call.user_id == user_id,
-        Call.status.in_(["initiated", "ringing", "answered", "in-progress"])
-    ).all()
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
+    
+    active_calls = await live_calls.active_calls(user_id)
     
     return {
         "active_calls": [
             {
-                "call_id": call.call_control_id or str(call.id),
+                "call_id": call.call_control_id,
                 "direction": call.direction,
                 "from_number": call.from_number,
                 "to_number": call.to_number,
                 "status": call.status,
                 "started_at": call.started_at,
-                "duration_seconds": (datetime.utcnow() - call.started_at).total_seconds() if call.started_at else 0
+                "duration_seconds": (datetime.utcnow() - call.started_at).total_seconds()
             }
             for call in active_calls
         ]
@@ -252,62 +223,81 @@ async def get_active_calls(
 @router.get("/campaigns/{user_id}/stats")
 async def get_campaign_stats(
     user_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get campaign statistics"""
     
-    campaigns = db.query(BulkCampaign).filter(
-        BulkCampaign.user_id == user_id
-    ).order_by(
-        BulkCampaign.created_at.desc()
-    ).limit(10).all()
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
+    
+    def build():
+        campaigns = db.query(BulkCampaign).filter(
+            BulkCampaign.user_id == user_id
+        ).order_by(
+            BulkCampaign.created_at.desc()
+        ).limit(10).all()
     
-    campaign_stats = []
+        campaign_stats = []
     
-    for campaign in campaigns:
-        # Calculate success rate
-        success_count = db.query(func.count(CampaignRecipient.id)).filter(
-            CampaignRecipient.campaign_id == campaign.id,
-            CampaignRecipient.status == "completed"
-        ).scalar() or 0
+        for campaign in campaigns:
+            # Calculate success rate
+            success_count = db.query(func.count(CampaignRecipient.id)).filter(
+                CampaignRecipient.campaign_id == campaign.id,
+                CampaignRecipient.status == "completed"
+            ).scalar() or 0
         
-        success_rate = (success_count / campaign.total_recipients * 100) if campaign.total_recipients > 0 else 0.0
+            success_rate = (success_count / campaign.total_recipients * 100) if campaign.total_recipients > 0 else 0.0
         
-        # Calculate average duration
-        avg_duration = db.query(func.avg(CampaignRecipient.call_duration)).filter(
-            CampaignRecipient.campaign_id == campaign.id,
-            CampaignRecipient.call_duration.isnot(None)
-        ).scalar() or 0
+            # Calculate average duration
+            avg_duration = db.query(func.avg(CampaignRecipient.call_duration)).filter(
+                CampaignRecipient.campaign_id == campaign.id,
+                CampaignRecipient.call_duration.isnot(None)
+            ).scalar() or 0
         
-        # Calculate total cost
-        total_cost = db.query(func.sum(CampaignRecipient.cost)).filter(
-            CampaignRecipient.campaign_id == campaign.id
-        ).scalar() or 0.0
+            # Calculate total cost
+            total_cost = db.query(func.sum(CampaignRecipient.cost)).filter(
+                CampaignRecipient.campaign_id == campaign.id
+            ).scalar() or 0.0
         
-        campaign_stats.append(
-            CampaignStats(
-                campaign_id=campaign.id,
-                name=campaign.name,
-                status=campaign.status.value,
-                total_recipients=campaign.total_recipients,
-                completed=campaign.completed_count,
-                success_rate=round(success_rate, 1),
-                avg_duration=int(avg_duration) if avg_duration else 0,
-                total_cost=round(total_cost, 2)
+            campaign_stats.append(
+                CampaignStats(
+                    campaign_id=campaign.id,
+                    name=campaign.name,
+                    status=campaign.status.value,
+                    total_recipients=campaign.total_recipients,
+                    completed=campaign.completed_count,
+                    success_rate=round(success_rate, 1),
+                    avg_duration=int(avg_duration) if avg_duration else 0,
+                    total_cost=round(total_cost, 2)
+                )
             )
-        )
     
-    return {"campaigns": campaign_stats}
+        tags = [user_tag(user_id), *(campaign_tag(c.id) for c in campaigns)]
+        return {"campaigns": campaign_stats}, tags
+    
+    return cached_json(request, build, current_user.id)
 
 
 @router.get("/usage/{user_id}")
 async def get_usage_breakdown(
     user_id: int,
     period: str = "month",
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get usage breakdown by feature"""
     
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
+    
     start_date, end_date = get_date_range(period)
     
     # Query usage logs
@@ -321,8 +311,17 @@ async def get_usage_breakdown(
         UsageLog.created_at <= end_date
     ).group_by(UsageLog.feature_type).all()
     
+    calls = call_totals(db, user_id, start_date, end_date)
+    
     return {
         "period": period,
+        "calls": {
+            "total": calls["calls"],
+            "answered": calls["answered"],
+            "completed": calls["completed"],
+            "minutes": round(calls["seconds"] / 60, 1),
+            "cost": round(calls["cost"], 2)
+        },
         "usage": [
             {
                 "feature": log.feature_type.value,
@@ -334,37 +333,89 @@ async def get_usage_breakdown(
     }
 
 
+@router.get("/usage/{user_id}/export")
+async def export_usage(
+    user_id: int,
+    period: str = "month",
+    format: str = "csv",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream raw usage records for the period as CSV, gzip'd CSV or NDJSON"""
+    
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
+    
+    start_date, end_date = get_date_range(period)
+    
+    return export_response(
+        [
+            ("created_at", "Date", UsageLog.created_at),
+            ("feature", "Feature", UsageLog.feature_type),
+            ("resource_id", "Resource", UsageLog.resource_id),
+            ("quantity", "Quantity", UsageLog.quantity),
+            ("unit", "Unit", UsageLog.unit),
+            ("unit_cost", "Unit Cost", UsageLog.unit_cost),
+            ("total_cost", "Total Cost", UsageLog.total_cost),
+        ],
+        where=[
+            UsageLog.user_id == user_id,
+            UsageLog.created_at >= start_date,
+            UsageLog.created_at <= end_date
+        ],
+        order_by=[UsageLog.created_at, UsageLog.id],
+        fmt=format,
+        filename=f"usage_{period}",
+    )
+
+
 @router.get("/subscription/{user_id}")
 async def get_subscription_info(
     user_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get subscription information and limits"""
     
-    subscription = db.query(Subscription).filter(
-        Subscription.user_id == user_id
-    ).first()
+    if current_user.id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot access other user's data"
+        )
     
-    if not subscription:
-        return {
-            "tier": "none",
-            "message": "No active subscription"
-        }
+    def build():
+        tags = [user_tag(user_id)]
+        
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == user_id
+        ).first()
     
-    # Calculate usage percentage
-    minutes_used_pct = (subscription.monthly_minutes_used / subscription.monthly_minutes_included * 100) if subscription.monthly_minutes_included > 0 else 0
+        if not subscription:
+            return {
+                "tier": "none",
+                "message": "No active subscription"
+            }, tags
     
-    return {
-        "tier": subscription.tier.value,
-        "monthly_price": subscription.monthly_price,
-        "minutes_included": subscription.monthly_minutes_included,
-        "minutes_used": subscription.monthly_minutes_used,
-        "minutes_remaining": max(0, subscription.monthly_minutes_included - subscription.monthly_minutes_used),
-        "minutes_used_percentage": round(minutes_used_pct, 1),
-        "trial_ends_at": subscription.trial_ends_at,
-        "is_active": subscription.is_active,
-        "billing_cycle_end": subscription.billing_cycle_end
-    }
+        # Calculate usage percentage
+        minutes_used_pct = (subscription.monthly_minutes_used / subscription.monthly_minutes_included * 100) if subscription.monthly_minutes_included > 0 else 0
+    
+        return {
+            "tier": subscription.tier.value,
+            "monthly_price": subscription.monthly_price,
+            "minutes_included": subscription.monthly_minutes_included,
+            "minutes_used": subscription.monthly_minutes_used,
+            "minutes_remaining": max(0, subscription.monthly_minutes_included - subscription.monthly_minutes_used),
+            "minutes_used_percentage": round(minutes_used_pct, 1),
+            "trial_ends_at": subscription.trial_ends_at,
+            "is_active": subscription.is_active,
+            "billing_cycle_end": subscription.billing_cycle_end
+        }, tags
+    
+    return cached_json(request, build, current_user.id)
 
 
 # ============================================================================
@@ -372,31 +423,29 @@ async def get_subscription_info(
 # ============================================================================
 
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    """WebSocket endpoint for real-time updates"""
+async def websocket_endpoint(websocket: WebSocket, user_id: int, token: Optional[str] = None):
+    """WebSocket endpoint for real-time updates (?token=<access token>; browsers can't set headers here)"""
     
-    await manager.connect(websocket, user_id)
+    payload = decode_access_token(token) if token else None
+    if payload is None or str(payload.get("sub")) != str(user_id):
+        # Refused before the handshake completes; nothing is subscribed
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    subscriber = await event_bus.connect(websocket, user_id)
     
     try:
         while True:
             # Wait for messages from client
             data = await websocket.receive_text()
             
-            # Echo back (or handle commands)
-            await websocket.send_json({
+            # Reply through the sender task so frames never interleave
+            subscriber.offer({
                 "type": "pong",
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }, key="pong")
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
-
-
-# Helper function to broadcast call updates (call from webhooks)
-async def broadcast_call_update(user_id: int, call_data: dict):
-    """Broadcast call update to user's dashboard"""
-    await manager.send_personal_message({
-        "type": "call_update",
-        "data": call_data,
-        "timestamp": datetime.utcnow().isoformat()
-    }, user_id)
+        pass
+    finally:
+        event_bus.disconnect(subscriber)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.core.deps import get_current_user
+from app.models.job import Job
+from app.models.user import User
+from app.services.job_queue import job_info
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Status of a background job (queued, running, succeeded or dead) and its result"""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    # Ids are sequential; someone else's job looks the same as a missing one
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_info(job)
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.phone_number import PhoneNumber
 from app.models.rootcall_config import RootCallConfig
+from app.services.client_config import invalidate_client_config
 from pydantic import BaseModel
 import telnyx
 import os
@@ -75,6 +76,7 @@ async def purchase_number(data: PurchaseNumber, db: Session = Depends(get_db)):
         )
         db.add(config)
         db.commit()
+        invalidate_client_config(data.phone_number)
         
         return {"success": True, "phone_number": data.phone_number}
     except Exception as e:
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import requests
 
 from app.config import settings
+from app.core.deps import get_optional_user
+from app.models.user import User
+from app.services.job_queue import submit
 
 TELNYX_API = "https://api.telnyx.com/v2"
 RETELL_API = "https://api.retellai.com"
@@ -94,28 +97,42 @@ def retell_update_number(req: InboundRequest) -> Dict[str, Any]:
     r.raise_for_status()
     return r.json()
 
+def wire_inbound(req: InboundRequest) -> Dict[str, Any]:
+    # 1) Ensure External Connection -> Retell
+    ec = get_or_create_external_connection(
+        name="retell-inbound",
+        sip_uri="sip:sip.retellai.com;transport=tcp"
+    )
+
+    # 2) Point your DID to that External Connection (inbound to Retell)
+    assigned = assign_did_to_connection(req.phone_number, ec["id"])
+
+    # 3) Make sure Retell has SIP auth + agent + webhook
+    retell = retell_update_number(req)
+
+    return {
+        "status": "ok",
+        "external_connection": {"id": ec["id"], "name": ec["connection_name"]},
+        "inbound_routing": {"did": assigned.get("phone_number"), "connection_id": ec["id"]},
+        "retell_number": retell,
+        "message": f"Inbound wired: {req.phone_number} → Retell agent {req.retell_agent_id}"
+    }
+
 @router.post("/inbound")
-def provision_inbound(req: InboundRequest):
+def provision_inbound(
+    req: InboundRequest,
+    background: bool = False,
+    current_user: Optional[User] = Depends(get_optional_user),
+):
+    """background=true queues the provisioning job and returns its id (poll /api/v1/jobs/{id})"""
+    if background:
+        # Jobs are only readable by whoever submitted them
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Sign in to queue provisioning in the background")
+        job_id = submit("provision.inbound", req.model_dump(), user_id=current_user.id)
+        return {"status": "queued", "job_id": job_id}
     try:
-        # 1) Ensure External Connection -> Retell
-        ec = get_or_create_external_connection(
-            name="retell-inbound",
-            sip_uri="sip:sip.retellai.com;transport=tcp"
-        )
-
-        # 2) Point your DID to that External Connection (inbound to Retell)
-        assigned = assign_did_to_connection(req.phone_number, ec["id"])
-
-        # 3) Make sure Retell has SIP auth + agent + webhook
-        retell = retell_update_number(req)
-
-        return {
-            "status": "ok",
-            "external_connection": {"id": ec["id"], "name": ec["connection_name"]},
-            "inbound_routing": {"did": assigned.get("phone_number"), "connection_id": ec["id"]},
-            "retell_number": retell,
-            "message": f"Inbound wired: {req.phone_number} → Retell agent {req.retell_agent_id}"
-        }
+        return wire_inbound(req)
     except requests.HTTPError as e:
         try:
             detail = e.response.json()
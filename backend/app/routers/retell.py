@@ -8,12 +8,15 @@ from app.database import get_db
 from app.models.call import Call
 from app.models.phone_number import PhoneNumber
 from app.models.ai_agent import AIAgent
+from app.services.event_bus import publish_call_event
+from app.services.live_calls import live_calls
 from app.services.retell_service import retell_service
+from app.services.webhook_dedup import dedupe_retell_event
 
 router = APIRouter(prefix="/retell", tags=["Retell"])
 log = logging.getLogger(__name__)
 
-@router.post("/webhook")
+@router.post("/webhook", dependencies=[Depends(dedupe_retell_event)])
 async def handle_retell_webhook(request: Request, db: Session = Depends(get_db)):
     """Handle Retell webhooks (call events)"""
     
@@ -36,8 +39,14 @@ async def handle_retell_webhook(request: Request, db: Session = Depends(get_db))
         )
         db.add(call)
         db.commit()
+        publish_call_event(call.user_id, call_id, call.status, direction="inbound",
+                           from_number=call.from_number, to_number=call.to_number)
+        await live_calls.started(call_id, call.user_id, phone_number_id=call.phone_number_id, direction="inbound",
+                                 from_number=call.from_number, to_number=call.to_number,
+                                 status=call.status, source="retell")
     
     elif event_type == "call_ended":
+        await live_calls.ended(call_id)
         # Update call record
         call = db.query(Call).filter(Call.call_control_id == call_id).first()
         if call:
@@ -46,6 +55,8 @@ async def handle_retell_webhook(request: Request, db: Session = Depends(get_db))
             call.ended_at = datetime.utcnow()
             call.transcription = data.get("transcript", "")
             db.commit()
+            publish_call_event(call.user_id, call_id, "completed",
+                               ended_at=call.ended_at.isoformat(), duration=call.duration)
     
     elif event_type == "call_analyzed":
         # Store analysis data
@@ -54,6 +65,8 @@ async def handle_retell_webhook(request: Request, db: Session = Depends(get_db))
             call.summary = data.get("call_summary", "")
             call.sentiment = data.get("sentiment", "")
             db.commit()
+            publish_call_event(call.user_id, call_id, call.status,
+                               summary=call.summary, sentiment=call.sentiment)
     
     return {"status": "ok"}
 
@@ -2,15 +2,13 @@
 """
 RootCall Client Portal API Routes - SECURE VERSION WITH TELNYX + RETELL
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status, File, UploadFile
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
-import io
-import csv
 import os
 import secrets
 import logging
@@ -28,6 +26,13 @@ from app.models.rootcall_call_log import RootCallCallLog
 # Services
 from app.services.telnyx_service import TelnyxService
 from app.services.retell_service import RetellService
+from app.services.client_config import invalidate_client_config
+from app.services import trusted_contacts as trusted_index
+from app.services import call_stats
+from app.services.export_stream import export_response
+from app.services.response_cache import cached_json, phone_tag, user_tag
+from app.services.call_archive import iter_archived
+from app.services.phone_numbers import normalize_e164
 
 # Auth
 try:
@@ -68,6 +73,7 @@ class ProvisionRequest(BaseModel):
 @router.get("/api/rootcall/stats/{client_id}")
 async def get_stats(
     client_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -79,47 +85,18 @@ async def get_stats(
             detail="Cannot access other user's data"
         )
     
-    phones = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).all()
-    phone_ids = [p.id for p in phones]
+    def build():
+        phone_ids = [pid for (pid,) in db.query(PhoneNumber.id).filter(PhoneNumber.user_id == client_id)]
+        stats = call_stats.portal_stats(call_stats.action_counts(db, phone_ids))
+        return stats, [user_tag(client_id), *map(phone_tag, phone_ids)]
     
-    if not phone_ids:
-        return {
-            "spam_blocked": 0,
-            "calls_screened": 0,
-            "trusted_forwarded": 0,
-            "total_calls": 0
-        }
-    
-    spam_blocked = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids),
-        RootCallCallLog.action == "spam_blocked"
-    ).count()
-    
-    calls_screened = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids),
-        RootCallCallLog.action == "screened"
-    ).count()
-    
-    trusted_forwarded = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids),
-        RootCallCallLog.action == "trusted_forwarded"
-    ).count()
-    
-    total_calls = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids)
-    ).count()
-    
-    return {
-        "spam_blocked": spam_blocked,
-        "calls_screened": calls_screened,
-        "trusted_forwarded": trusted_forwarded,
-        "total_calls": total_calls
-    }
+    return cached_json(request, build, current_user.id)
 
 
 @router.get("/api/rootcall/calls/{client_id}")
 async def get_recent_calls(
     client_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -131,26 +108,29 @@ async def get_recent_calls(
             detail="Cannot access other user's data"
         )
     
-    phones = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).all()
-    phone_ids = [p.id for p in phones]
+    def build():
+        phone_ids = [pid for (pid,) in db.query(PhoneNumber.id).filter(PhoneNumber.user_id == client_id)]
+        tags = [user_tag(client_id), *map(phone_tag, phone_ids)]
+        
+        if not phone_ids:
+            return [], tags
+        
+        logs = db.query(RootCallCallLog).filter(
+            RootCallCallLog.phone_number_id.in_(phone_ids)
+        ).order_by(RootCallCallLog.timestamp.desc()).limit(20).all()
+        
+        return [
+            {
+                "timestamp": log.timestamp.isoformat(),
+                "from_number": log.from_number,
+                "caller_name": log.caller_name or "Unknown",
+                "action": log.action,
+                "status": log.status
+            }
+            for log in logs
+        ], tags
     
-    if not phone_ids:
-        return []
-    
-    logs = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids)
-    ).order_by(RootCallCallLog.timestamp.desc()).limit(20).all()
-    
-    return [
-        {
-            "timestamp": log.timestamp.isoformat(),
-            "from_number": log.from_number,
-            "caller_name": log.caller_name or "Unknown",
-            "action": log.action,
-            "status": log.status
-        }
-        for log in logs
-    ]
+    return cached_json(request, build, current_user.id)
 
 
 # ============================================
@@ -160,6 +140,7 @@ async def get_recent_calls(
 @router.get("/api/rootcall/config/{client_id}")
 async def get_config(
     client_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -171,26 +152,26 @@ async def get_config(
             detail="Cannot access other user's data"
         )
     
-    phone = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).first()
-    if not phone:
-        raise HTTPException(status_code=404, detail="No phone number")
-    
-    config = db.query(RootCallConfig).filter(RootCallConfig.phone_number_id == phone.id).first()
-    if not config:
-        raise HTTPException(status_code=404, detail="No config")
+    def build():
+        phone = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).first()
+        if not phone:
+            raise HTTPException(status_code=404, detail="No phone number")
+        
+        config = db.query(RootCallConfig).filter(RootCallConfig.phone_number_id == phone.id).first()
+        if not config:
+            raise HTTPException(status_code=404, detail="No config")
+        
+        return {
+            "client_name": config.client_name,
+            "client_cell": config.client_cell,
+            "sms_alerts_enabled": config.sms_alerts_enabled,
+            "alert_on_spam": config.alert_on_spam,
+            "alert_on_unknown": config.alert_on_unknown,
+            "auto_block_spam": config.auto_block_spam,
+            "trusted_contacts": trusted_index.list_trusted_contacts(db, config)
+        }, [user_tag(client_id), phone_tag(phone.id)]
     
-    return {
-        "client_name": config.client_name,
-        "client_cell": config.client_cell,
-        "sms_alerts_enabled": config.sms_alerts_enabled,
-        "alert_on_spam": config.alert_on_spam,
-        "alert_on_unknown": config.alert_on_unknown,
-        "auto_block_spam": config.auto_block_spam,
-        "trusted_contacts": [
-            {"phone_number": p, "name": ""} 
-            for p in (config.trusted_contacts or [])
-        ]
-    }
+    return cached_json(request, build, current_user.id)
 
 
 @router.patch("/api/rootcall/config/{client_id}")
@@ -240,6 +221,7 @@ async def update_config(
         config.auto_block_spam = updates.auto_block_spam
     
     db.commit()
+    invalidate_client_config(phone.phone_number)
     return {"success": True}
 
 
@@ -270,16 +252,48 @@ async def add_trusted_contact(
     if not config:
         raise HTTPException(status_code=404, detail="No config")
     
-    if not config.trusted_contacts:
-        config.trusted_contacts = []
+    if not normalize_e164(contact.phone_number):
+        raise HTTPException(status_code=400, detail="Invalid phone number")
     
-    if contact.phone_number not in config.trusted_contacts:
-        config.trusted_contacts.append(contact.phone_number)
-        db.commit()
+    trusted_index.add_trusted_contact(db, config, contact.phone_number, contact.name)
     
     return {"success": True}
 
 
+@router.post("/api/rootcall/trusted-contacts/{client_id}/import")
+async def import_trusted_contacts(
+    client_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Bulk import trusted contacts from a CSV (phone_number,name) or vCard file - AUTHENTICATED"""
+    
+    if current_user.id != client_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot modify other user's contacts"
+        )
+    
+    phone = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).first()
+    if not phone:
+        raise HTTPException(status_code=404, detail="No phone number")
+    
+    config = db.query(RootCallConfig).filter(RootCallConfig.phone_number_id == phone.id).first()
+    if not config:
+        raise HTTPException(status_code=404, detail="No config")
+    
+    try:
+        contacts = trusted_index.parse_contacts_file(file.filename, await file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = trusted_index.add_trusted_contacts(db, config, contacts)
+    log.info(f"Imported trusted contacts for user {client_id}: {result['added']} added, {result['rejected']} rejected")
+    
+    return {"success": True, **result}
+
+
 @router.delete("/api/rootcall/trusted-contacts/{client_id}/{phone_number}")
 async def remove_trusted_contact(
     client_id: int,
@@ -303,9 +317,7 @@ async def remove_trusted_contact(
     if not config:
         raise HTTPException(status_code=404, detail="No config")
     
-    if config.trusted_contacts and phone_number in config.trusted_contacts:
-        config.trusted_contacts.remove(phone_number)
-        db.commit()
+    trusted_index.remove_trusted_contact(db, config, phone_number)
     
     return {"success": True}
 
@@ -317,10 +329,11 @@ async def remove_trusted_contact(
 @router.get("/api/rootcall/export/{client_id}")
 async def export_calls(
     client_id: int,
+    format: str = "csv",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Export call logs as CSV - AUTHENTICATED"""
+    """Export call logs as CSV, gzip'd CSV or NDJSON (streamed) - AUTHENTICATED"""
     
     if current_user.id != client_id:
         raise HTTPException(
@@ -328,34 +341,28 @@ async def export_calls(
             detail="Cannot export other user's data"
         )
     
-    phones = db.query(PhoneNumber).filter(PhoneNumber.user_id == client_id).all()
-    phone_ids = [p.id for p in phones]
+    phone_ids = [pid for (pid,) in db.query(PhoneNumber.id).filter(PhoneNumber.user_id == client_id)]
     
     if not phone_ids:
         raise HTTPException(status_code=404, detail="No phone numbers")
     
-    logs = db.query(RootCallCallLog).filter(
-        RootCallCallLog.phone_number_id.in_(phone_ids)
-    ).order_by(RootCallCallLog.timestamp.desc()).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Timestamp', 'From', 'Caller Name', 'Action', 'Status'])
-    
-    for log in logs:
-        writer.writerow([
-            log.timestamp.isoformat(),
-            log.from_number,
-            log.caller_name or 'Unknown',
-            log.action,
-            log.status
-        ])
-    
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=rootcall_calls.csv"}
+    return export_response(
+        [
+            ("timestamp", "Timestamp", RootCallCallLog.timestamp),
+            ("from_number", "From", RootCallCallLog.from_number),
+            ("caller_name", "Caller Name", func.coalesce(RootCallCallLog.caller_name, "Unknown")),
+            ("action", "Action", RootCallCallLog.action),
+            ("status", "Status", RootCallCallLog.status),
+        ],
+        where=[RootCallCallLog.phone_number_id.in_(phone_ids)],
+        order_by=[RootCallCallLog.timestamp.desc()],
+        fmt=format,
+        filename="rootcall_calls",
+        # Months moved to cold storage follow the hot rows, newest first
+        archived=lambda: (
+            (r["timestamp"], r["from_number"], r["caller_name"] or "Unknown", r["action"], r["status"])
+            for r in iter_archived(RootCallCallLog.__tablename__, phone_ids)
+        ),
     )
 
 
@@ -604,6 +611,7 @@ Be polite but firm with scammers. Protect the user at all costs."""
         )
         db.add(config)
         db.commit()
+        invalidate_client_config(phone_number)
         db.refresh(phone_record)
         
         log.info("[COMPLETE] Provisioning successful!")
@@ -693,6 +701,7 @@ async def get_dashboard_setup(
         )
         db.add(config)
         db.commit()
+        invalidate_client_config(phone.phone_number)
         db.refresh(config)
     
     has_number = phone is not None
@@ -758,6 +767,7 @@ async def import_existing_number(
             )
             db.add(config)
             db.commit()
+            invalidate_client_config(phone_number)
             
             return {
                 "success": True,
@@ -794,6 +804,7 @@ async def import_existing_number(
     )
     db.add(config)
     db.commit()
+    invalidate_client_config(phone_number)
     db.refresh(phone_record)
     
     return {
@@ -831,6 +842,7 @@ async def delete_my_number(
     # Deactivate
     phone.is_active = False
     db.commit()
+    invalidate_client_config(phone.phone_number)
     
     log.info(f"Deactivated number {phone.phone_number} for user {current_user.id}")
     
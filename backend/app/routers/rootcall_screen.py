@@ -1,9 +1,18 @@
 import os
+import asyncio
 import logging
 from typing import Optional
-from fastapi import APIRouter, Request, Response
+from fastapi import APIRouter, Depends, Request, Response
 from app.services.client_config import get_client_config
-import httpx
+from app.services.telnyx_client import get_telnyx_client
+from app.services.phone_numbers import normalize_cache_stats, phone_from_field
+from app.services.spam_scorer import SpamVerdict, spam_scorer
+from app.services.caller_velocity import caller_velocity
+from app.services.call_log import call_log_writer
+from app.services.event_bus import publish_call_event
+from app.services.live_calls import live_calls
+from app.services.webhook_dispatcher import screen_dispatcher
+from app.services.webhook_dedup import dedupe_telnyx_event, release_webhook_event, webhook_dedup
 
 log = logging.getLogger("rootcall")
 
@@ -17,20 +26,13 @@ async def send_sms_alert(to_number: str, message: str, from_number: str = "+1813
         log.warning("[SMS] Missing API key or phone number")
         return False
     
-    url = "https://api.telnyx.com/v2/messages"
-    
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r = await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={"from": from_number, "to": to_number, "text": message}
-            )
-            log.info("[SMS] Sent to %s: status %s", to_number, r.status_code)
-            return r.status_code in [200, 201, 202]
-        except Exception as e:
-            log.error("[SMS] Error: %s", e)
-            return False
+    try:
+        r = await get_telnyx_client().send_message(from_number, to_number, message)
+        log.info("[SMS] Sent to %s: status %s", to_number, r.status_code)
+        return r.status_code in [200, 201, 202]
+    except Exception as e:
+        log.error("[SMS] Error: %s", e)
+        return False
 
 router = APIRouter(prefix="/telnyx/rootcall", tags=["RootCall Screen"])
 
@@ -61,27 +63,13 @@ async def telnyx_gather_speak(ccid: str, text: str):
         log.error("Missing TELNYX_API_KEY")
         return {"error": "Missing API key"}
 
-    url = f"https://api.telnyx.com/v2/calls/{ccid}/actions/gather_using_speak"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r = await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={
-                    "payload": text,
-                    "voice": "female",
-                    "language": "en-US",
-                    "valid_digits": "1234567890*#",
-                    "timeout_millis": 10000,
-                    "maximum_digits": 1,
-                    "minimum_digits": 1
-                }
-            )
-            log.info("Gather response: %s", r.status_code)
-            return r.json() if r.text else {"ok": True}
-        except Exception as e:
-            log.error("Gather error: %s", e)
-            return {"error": str(e)}
+    try:
+        r = await get_telnyx_client().gather_using_speak(ccid, text)
+        log.info("Gather response: %s", r.status_code)
+        return r.json() if r.text else {"ok": True}
+    except Exception as e:
+        log.error("Gather error: %s", e)
+        return {"error": str(e)}
 
 async def telnyx_answer(ccid: str):
     """Answer the incoming call"""
@@ -93,19 +81,13 @@ async def telnyx_answer(ccid: str):
         log.error("Missing TELNYX_API_KEY")
         return {"error": "Missing API key"}
     
-    url = f"https://api.telnyx.com/v2/calls/{ccid}/actions/answer"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r = await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={}
-            )
-            log.info("Answer response: %s", r.status_code)
-            return r.json() if r.text else {"ok": True}
-        except Exception as e:
-            log.error("Answer error: %s", e)
-            return {"error": str(e)}
+    try:
+        r = await get_telnyx_client().answer(ccid)
+        log.info("Answer response: %s", r.status_code)
+        return r.json() if r.text else {"ok": True}
+    except Exception as e:
+        log.error("Answer error: %s", e)
+        return {"error": str(e)}
 
 
 async def telnyx_speak(ccid: str, text: str):
@@ -118,23 +100,13 @@ async def telnyx_speak(ccid: str, text: str):
         log.error("Missing TELNYX_API_KEY")
         return {"error": "Missing API key"}
     
-    url = f"https://api.telnyx.com/v2/calls/{ccid}/actions/speak"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r = await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={
-                    "payload": text,
-                    "voice": "female",
-                    "language": "en-US"
-                }
-            )
-            log.info("Speak response: %s", r.status_code)
-            return r.json() if r.text else {"ok": True}
-        except Exception as e:
-            log.error("Speak error: %s", e)
-            return {"error": str(e)}
+    try:
+        r = await get_telnyx_client().speak(ccid, text)
+        log.info("Speak response: %s", r.status_code)
+        return r.json() if r.text else {"ok": True}
+    except Exception as e:
+        log.error("Speak error: %s", e)
+        return {"error": str(e)}
 
 async def telnyx_transfer(ccid: str, to: str):
     """Transfer call to destination"""
@@ -146,25 +118,19 @@ async def telnyx_transfer(ccid: str, to: str):
         log.error("Missing TELNYX_API_KEY")
         return {"error": "Missing API key"}
     
-    url = f"https://api.telnyx.com/v2/calls/{ccid}/actions/transfer"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            r = await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={"to": to}
-            )
-            log.info("Transfer response: %s", r.status_code)
-            log.info("Transfer response body: %s", r.text)
-            
-            if r.status_code >= 400:
-                log.error("Transfer FAILED: %s", r.text)
-                return {"error": r.text, "status_code": r.status_code}
-            
-            return r.json() if r.text else {"ok": True}
-        except Exception as e:
-            log.error("Transfer error: %s", e)
-            return {"error": str(e)}
+    try:
+        r = await get_telnyx_client().transfer(ccid, to)
+        log.info("Transfer response: %s", r.status_code)
+        log.info("Transfer response body: %s", r.text)
+        
+        if r.status_code >= 400:
+            log.error("Transfer FAILED: %s", r.text)
+            return {"error": r.text, "status_code": r.status_code}
+        
+        return r.json() if r.text else {"ok": True}
+    except Exception as e:
+        log.error("Transfer error: %s", e)
+        return {"error": str(e)}
 
 async def telnyx_hangup(ccid: str):
     """Hangup the call"""
@@ -175,22 +141,19 @@ async def telnyx_hangup(ccid: str):
     if not TELNYX_API_KEY:
         return
     
-    url = f"https://api.telnyx.com/v2/calls/{ccid}/actions/hangup"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            await client.post(
-                url,
-                headers={"Authorization": f"Bearer {TELNYX_API_KEY}"},
-                json={}
-            )
-        except Exception as e:
-            log.error("Hangup error: %s", e)
+    try:
+        await get_telnyx_client().hangup(ccid)
+    except Exception as e:
+        log.error("Hangup error: %s", e)
 
-@router.post("/webhook", status_code=200)
+@router.post("/webhook", status_code=200, dependencies=[Depends(dedupe_telnyx_event)])
 async def screen_call(request: Request):
     """
     Main RootCall screening webhook - NO AUTHENTICATION REQUIRED
     This endpoint receives webhooks directly from Telnyx
+
+    Only validates and enqueues the event; Telnyx actions run on the
+    per-call ordered dispatcher so we answer 200 within milliseconds.
     """
     
     # Log the incoming request
@@ -216,27 +179,46 @@ async def screen_call(request: Request):
     payload = data.get("payload", {})
     
     ccid = payload.get("call_control_id")
-    # Handle both string and dict formats for from/to
-    from_field = payload.get("from", "")
-    to_field = payload.get("to", "")
+    if not ccid:
+        log.warning("[WEBHOOK] No call_control_id found")
+        return {"status": "no_ccid"}
     
-    if isinstance(from_field, dict):
-        from_num = from_field.get("phone_number", "")
-    else:
-        from_num = str(from_field)
+    if not screen_dispatcher.submit(ccid, process_screen_event, evt, payload):
+        # Queue full - let Telnyx redeliver instead of dropping the event
+        await release_webhook_event(request)
+        return Response(status_code=503)
     
-    if isinstance(to_field, dict):
-        to_num = to_field.get("phone_number", "")
-    else:
-        to_num = str(to_field)
+    return {"status": "accepted", "event": evt}
+
+
+async def record_outcome(cfg, ccid: str, from_num: str, cnam: str, action: str,
+                         verdict: Optional[SpamVerdict] = None):
+    """Feed the caller's reputation and queue the outcome for the call log"""
+    spam_scorer.record_outcome(from_num, action)
+    call_log_writer.submit(
+        ccid,
+        action,
+        from_num,
+        phone_number_id=cfg.get("phone_number_id"),
+        caller_name=cnam,
+        spam_score=verdict.score if verdict else None,
+        is_spam=verdict.is_spam if verdict else None,
+        is_trusted=action == "trusted_forwarded" or None,
+    )
+    publish_call_event(cfg.get("user_id"), ccid, action, from_number=from_num, caller_name=cnam,
+                       spam_score=verdict.score if verdict else None)
+
+
+async def process_screen_event(evt: str, payload: dict):
+    """Handle one screening event (runs on the call's dispatcher shard)"""
+    ccid = payload.get("call_control_id")
+    # Handles both string and dict formats for from/to, normalized to E.164
+    from_num = phone_from_field(payload.get("from", ""))
+    to_num = phone_from_field(payload.get("to", ""))
     cnam = payload.get("caller_id_name", "")
     
     log.info("[CALL] Event: %s | From: %s | To: %s | CCID: %s", evt, from_num, to_num, ccid)
     
-    if not ccid:
-        log.warning("[WEBHOOK] No call_control_id found")
-        return {"status": "no_ccid"}
-    
     # Get client config
     cfg = get_client_config(to_num)
     if not cfg:
@@ -245,6 +227,12 @@ async def screen_call(request: Request):
     
     # Handle call.initiated - Answer immediately
     if evt == "call.initiated":
+        # Count every call per caller across all DIDs (robocall bursts)
+        caller_velocity.record(from_num, to_num)
+        publish_call_event(cfg.get("user_id"), ccid, "initiated", direction="inbound",
+                           from_number=from_num, to_number=to_num, caller_name=cnam)
+        await live_calls.started(ccid, cfg.get("user_id"), phone_number_id=cfg.get("phone_number_id"),
+                                 direction="inbound", from_number=from_num, to_number=to_num)
         log.info("[INITIATED] Answering call")
         result = await telnyx_answer(ccid)
         return {"status": "answered", "result": result}
@@ -252,21 +240,9 @@ async def screen_call(request: Request):
     # Handle call.answered - Start screening
     if evt == "call.answered":
         client_cell = cfg.get("client_cell", "")
-        trusted = cfg.get("trusted_contacts", [])
+        trusted = cfg.get("trusted_contacts", frozenset())
         
-        # 1) Check for spam
-        spam_keywords = ["spam", "scam", "fraud", "robocall", "telemarketer"]
-        if any(keyword in cnam.lower() for keyword in spam_keywords):
-            log.warning("[SPAM] Blocked: %s (%s)", from_num, cnam)
-            
-            # Send SMS alert
-            if cfg.get("sms_alerts_enabled") and cfg.get("alert_on_spam"):
-                await send_sms_alert(client_cell, f"[RootCall] SPAM BLOCKED: {cnam or from_num}")
-            
-            await telnyx_hangup(ccid)
-            return {"status": "spam_blocked"}
-        
-        # 2) Check if trusted
+        # 1) Check if trusted - the client's own list always wins
         if from_num in trusted:
             log.info("[TRUSTED] Forwarding %s to %s", from_num, client_cell)
             
@@ -275,8 +251,26 @@ async def screen_call(request: Request):
                 await send_sms_alert(client_cell, f"[RootCall] Trusted contact {cnam or from_num} calling")
             
             await telnyx_transfer(ccid, client_cell)
+            await record_outcome(cfg, ccid, from_num, cnam, "trusted_forwarded")
             return {"status": "trusted_forwarded"}
         
+        # 2) Check for spam (CNAM patterns, reputation, call velocity) before paying for TTS
+        verdict = spam_scorer.score(from_num, cnam)
+        if verdict.is_spam and cfg.get("auto_block_spam", True):
+            log.warning("[SPAM] Blocked: %s (%s) score=%s matches=%s velocity=%s",
+                        from_num, cnam, verdict.score, verdict.matches, verdict.velocity_score)
+            
+            # Send SMS alert
+            if cfg.get("sms_alerts_enabled") and cfg.get("alert_on_spam"):
+                await send_sms_alert(client_cell, f"[RootCall] SPAM BLOCKED: {cnam or from_num}")
+            
+            await telnyx_hangup(ccid)
+            await record_outcome(cfg, ccid, from_num, cnam, "spam_blocked", verdict)
+            return {"status": "spam_blocked", "spam_score": verdict.score}
+        if verdict.is_spam:
+            log.warning("[SPAM] Likely spam %s (%s) score=%s - auto block off, screening",
+                        from_num, cnam, verdict.score)
+        
         # 3) Unknown caller - Screen them
         log.info("[SCREENING] Asking %s to identify themselves", from_num)
         
@@ -293,7 +287,8 @@ async def screen_call(request: Request):
             ccid,
             "Hello, who is calling? Press 1 if this is a doctor or medical office. Press 2 if you are family. Press 3 for all other calls."
         )
-        return {"status": "screening_started"}
+        await record_outcome(cfg, ccid, from_num, cnam, "screened", verdict)
+        return {"status": "screening_started", "spam_score": verdict.score}
     
     # Handle gather.ended - Process caller response
     if evt == "call.gather.ended":
@@ -306,29 +301,29 @@ async def screen_call(request: Request):
             # Medical call - transfer immediately
             log.info("[MEDICAL] Transferring to %s", client_cell)
             await telnyx_speak(ccid, "Transferring you now.")
-            import asyncio
             await asyncio.sleep(1)
             await telnyx_transfer(ccid, client_cell)
+            await record_outcome(cfg, ccid, from_num, cnam, "medical_transferred")
             return {"status": "medical_transferred"}
         elif digits == "2":
             # Family - transfer
             log.info("[FAMILY] Transferring to %s", client_cell)
             await telnyx_speak(ccid, "One moment please.")
-            import asyncio
             await asyncio.sleep(1)
             await telnyx_transfer(ccid, client_cell)
+            await record_outcome(cfg, ccid, from_num, cnam, "family_transferred")
             return {"status": "family_transferred"}
         else:
             # Other - send to voicemail or reject
             log.info("[OTHER] Rejecting call")
             await telnyx_speak(ccid, "Sorry, the person you are trying to reach is not available. Goodbye.")
-            import asyncio
             await asyncio.sleep(2)
             await telnyx_hangup(ccid)
+            await record_outcome(cfg, ccid, from_num, cnam, "rejected")
             return {"status": "rejected"}
 
         client_cell = cfg.get("client_cell", "")
-        trusted = cfg.get("trusted_contacts", [])
+        trusted = cfg.get("trusted_contacts", frozenset())
         retell_did = cfg.get("retell_did", "")
         caregiver = cfg.get("caregiver_cell", "")
         
@@ -389,6 +384,8 @@ async def screen_call(request: Request):
     # Handle hangup events
     if evt in ("call.hangup", "call.ended", "call.hangup.completed"):
         log.info("[ENDED] Call ended: %s", evt)
+        await live_calls.ended(ccid)
+        publish_call_event(cfg.get("user_id"), ccid, "completed")
         return {"status": "ok", "event": evt}
     
     # All other events
@@ -402,15 +399,24 @@ async def health_check():
         "status": "ok",
         "service": "RootCall Call Screening",
         "dry_run": DRY_RUN,
-        "has_api_key": bool(TELNYX_API_KEY)
+        "has_api_key": bool(TELNYX_API_KEY),
+        "dispatcher": screen_dispatcher.stats(),
+        "call_log": call_log_writer.stats(),
+        "dedup": webhook_dedup.stats()
     }
 
 @router.get("/debug")
 async def debug_info():
     """Debug info - no auth required"""
     from app.services.client_config import CLIENT_LINES
+    from app.services.config_cache import config_cache
     return {
         "dry_run": DRY_RUN,
+        "config_cache": config_cache.stats(),
+        "phone_normalize_cache": normalize_cache_stats(),
+        "spam_scorer": spam_scorer.stats(),
+        "caller_velocity": caller_velocity.stats(),
+        "reputation_index": spam_scorer.global_index.stats() if spam_scorer.global_index else None,
         "has_telnyx_key": bool(TELNYX_API_KEY),
         "has_sms_from": bool(TELNYX_SMS_FROM),
         "client_count": len(CLIENT_LINES),
@@ -2,11 +2,12 @@ import os
 import json
 import logging
 from typing import Dict, Any
-import httpx
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException
 
 # Per-line mapping (public DID -> retell DID / cell)
 from app.services.client_config import get_client_config
+from app.services.telnyx_client import get_telnyx_client
+from app.services.webhook_dedup import dedupe_telnyx_event
 
 log = logging.getLogger("rootcall")
 
@@ -42,46 +43,36 @@ if not TELNYX_API_KEY:
     log.warning("TELNYX_API_KEY is not set. Call Control actions will fail.")
 
 class TelnyxCC:
-    BASE = "https://api.telnyx.com/v2"
-
-    @staticmethod
-    def _headers() -> Dict[str, str]:
-        return {
-            "Authorization": f"Bearer {TELNYX_API_KEY}",
-            "Content-Type": "application/json",
-        }
+    """Thin wrapper over the shared pooled client (app.services.telnyx_client)"""
 
     @classmethod
-    def _post(cls, ccid: str, action: str, payload: Dict[str, Any] | None = None) -> Dict[str, Any]:
-        url = f"{cls.BASE}/call_controls/{ccid}/actions/{action}"
-        payload = payload or {}
-        with httpx.Client(timeout=10.0) as client:
-            r = client.post(url, headers=cls._headers(), json=payload)
+    async def _post(cls, ccid: str, action: str, payload: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        r = await get_telnyx_client().post(f"/call_controls/{ccid}/actions/{action}", payload or {})
         if r.status_code // 100 != 2:
             log.error("Telnyx %s failed (%s): %s", action, r.status_code, r.text)
             raise HTTPException(status_code=502, detail=f"Telnyx {action} error")
         return r.json() if r.text else {}
 
     @classmethod
-    def answer(cls, ccid: str):
-        return cls._post(ccid, "answer")
+    async def answer(cls, ccid: str):
+        return await cls._post(ccid, "answer")
 
     @classmethod
-    def hangup(cls, ccid: str):
-        return cls._post(ccid, "hangup")
+    async def hangup(cls, ccid: str):
+        return await cls._post(ccid, "hangup")
 
     @classmethod
-    def speak(cls, ccid: str, text: str, voice: str = "female_en-US"):
-        return cls._post(ccid, "speak", {"payload": {"language": "en-US", "voice": voice, "payload": text}})
+    async def speak(cls, ccid: str, text: str, voice: str = "female_en-US"):
+        return await cls._post(ccid, "speak", {"payload": {"language": "en-US", "voice": voice, "payload": text}})
 
     @classmethod
-    def transfer_to(cls, ccid: str, destination: str):
+    async def transfer_to(cls, ccid: str, destination: str):
         # destination can be E.164 or SIP URI
-        return cls._post(ccid, "transfer", {"to": destination})
+        return await cls._post(ccid, "transfer", {"to": destination})
 
     @classmethod
-    def record_start(cls, ccid: str):
-        return cls._post(ccid, "start_recording")
+    async def record_start(cls, ccid: str):
+        return await cls._post(ccid, "start_recording")
 
 # --- FastAPI router ---
 router = APIRouter(prefix="/telnyx/rootcall", tags=["RootCall Telnyx"])
@@ -93,7 +84,7 @@ def _auth_ok(req: Request) -> bool:
         return True
     return req.headers.get("x-webhook-token") == WEBHOOK_AUTH_TOKEN
 
-@router.post("/webhook")
+@router.post("/webhook", dependencies=[Depends(dedupe_telnyx_event)])
 async def telnyx_webhook(request: Request):
     if not _auth_ok(request):
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -115,20 +106,20 @@ async def telnyx_webhook(request: Request):
     CLIENT_CELL = cfg.get("client_cell", "")
 
     if evt == "call.initiated":
-        TelnyxCC.answer(ccid)
+        await TelnyxCC.answer(ccid)
         return {"ok": True}
 
     if evt == "call.answered":
         # 1) Trusted → send to client cell
         if is_trusted(frm) and CLIENT_CELL:
-            TelnyxCC.transfer_to(ccid, CLIENT_CELL)
+            await TelnyxCC.transfer_to(ccid, CLIENT_CELL)
             return {"status": "trusted_transfer", "to": CLIENT_CELL}
 
         # 2) Risk screen (spam)
         lookup = number_lookup(frm)
         if should_block_by_risk(lookup):
             notify_blocked(frm, lookup.get("cnam", ""))
-            TelnyxCC.hangup(ccid)
+            await TelnyxCC.hangup(ccid)
             return {"status": "blocked_spam"}
 
         # 3) Priority intents (healthcare/bank) could be verified here
@@ -136,17 +127,17 @@ async def telnyx_webhook(request: Request):
         if intent in ("healthcare", "bank") and CLIENT_CELL:
             whitelist(frm, tag=intent)
             notify_verified(intent)
-            TelnyxCC.transfer_to(ccid, CLIENT_CELL)
+            await TelnyxCC.transfer_to(ccid, CLIENT_CELL)
             return {"status": "verified_transfer", "intent": intent}
 
         # 4) Unknown → Retell DID (already bound to agent)
         if RETELL_DID:
-            TelnyxCC.transfer_to(ccid, RETELL_DID)
+            await TelnyxCC.transfer_to(ccid, RETELL_DID)
             return {"status": "retell_transfer_did", "to": RETELL_DID}
 
         # 5) Fallback mini-voicemail
-        TelnyxCC.speak(ccid, "This line is protected by RootCall. Please state your name and reason for calling.")
-        TelnyxCC.record_start(ccid)
+        await TelnyxCC.speak(ccid, "This line is protected by RootCall. Please state your name and reason for calling.")
+        await TelnyxCC.record_start(ccid)
         return {"status": "screening_vm"}
 
     if evt in ("call.hangup", "call.ended"):
@@ -172,7 +163,7 @@ if os.getenv("ROOTCALL_DRY_RUN") == "1":
     _orig_post = TelnyxCC._post
 
     @classmethod
-    def _mock_post(cls, ccid: str, action: str, payload: Dict[str, Any] | None = None):
+    async def _mock_post(cls, ccid: str, action: str, payload: Dict[str, Any] | None = None):
         log.info("[DRY_RUN] Telnyx %s ccid=%s payload=%s", action, ccid, payload)
         # mimic a 2xx response body so the rest of the flow proceeds
         return {"ok": True, "dry_run": True, "action": action, "ccid": ccid, "payload": payload or {}}
@@ -2,7 +2,6 @@ from fastapi import APIRouter, Request, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime
 import logging
-import httpx
 import asyncio
 from deepgram import DeepgramClient
 from openai import OpenAI
@@ -11,16 +10,17 @@ from app.database import get_db
 from app.models.call import Call
 from app.models.phone_number import PhoneNumber
 from app.models.ai_agent import AIAgent
+from app.services.event_bus import publish_call_event
+from app.services.job_queue import enqueue
+from app.services.live_calls import live_calls
+from app.services.telnyx_client import get_telnyx_client
+from app.services.webhook_dedup import dedupe_telnyx_event
 
 router = APIRouter(prefix="/telnyx/webhooks", tags=["Telnyx Webhooks"])
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-TELNYX_BASE = "https://api.telnyx.com/v2"
-HEADERS_JSON = {
-    "Authorization": f"Bearer {settings.TELNYX_API_KEY}",
-    "Content-Type": "application/json",
-}
+TELNYX_BASE = settings.TELNYX_BASE_URL
 
 deepgram = DeepgramClient(api_key=settings.DEEPGRAM_API_KEY)
 openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -31,8 +31,7 @@ conversation_history = {}
 call_states = {}
 
 async def _post(url: str, json_data: dict):
-    async with httpx.AsyncClient(timeout=30) as c:
-        r = await c.post(url, headers=HEADERS_JSON, json=json_data)
+    r = await get_telnyx_client().post(url, json_data)
     if r.status_code >= 300:
         log.error("Telnyx error: %s", r.text)
         raise HTTPException(r.status_code, f"Telnyx error: {r.text}")
@@ -96,7 +95,12 @@ async def get_ai_response(user_message: str, call_control_id: str, system_prompt
         log.error("OpenAI failed: %s", e)
         return "I'm sorry, could you repeat that?"
 
-@router.post("/voice")
+async def _register_outbound(call: Call) -> None:
+    """Add an outbound call to the live registry from its Call row (a no-op if already there)"""
+    await live_calls.started(call.call_control_id, call.user_id, phone_number_id=call.phone_number_id,
+                             direction="outbound", from_number=call.from_number, to_number=call.to_number)
+
+@router.post("/voice", dependencies=[Depends(dedupe_telnyx_event)])
 async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
     body = await request.json()
     
@@ -116,6 +120,11 @@ async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
         ).first()
         
         if not phone:
+            # Outbound (campaign) calls dial out from our DID, so to_number is not ours; the campaign
+            # run writes their Call row, which may not be flushed yet (call.answered registers it then)
+            call = db.query(Call).filter(Call.call_control_id == call_control_id).first()
+            if call is not None and call.direction == "outbound":
+                await _register_outbound(call)
             return {"ok": False}
         
         # Cache agent data as dict
@@ -127,29 +136,41 @@ async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
                     "system_prompt": agent.system_prompt
                 }
         
-        call = Call(
-            user_id=phone.user_id,
-            phone_number_id=phone.id,
-            call_control_id=call_control_id,
-            telnyx_call_id=payload.get("call_session_id"),
-            direction="inbound",
-            from_number=from_number,
-            to_number=to_number,
-            status="initiated",
-            ai_agent_id=phone.ai_agent_id,
-        )
-        db.add(call)
-        db.commit()
+        # call_control_id is unique - never insert the same call twice
+        existing = db.query(Call.id).filter(Call.call_control_id == call_control_id).first()
+        if not existing:
+            call = Call(
+                user_id=phone.user_id,
+                phone_number_id=phone.id,
+                call_control_id=call_control_id,
+                telnyx_call_id=payload.get("call_session_id"),
+                direction="inbound",
+                from_number=from_number,
+                to_number=to_number,
+                status="initiated",
+                ai_agent_id=phone.ai_agent_id,
+            )
+            db.add(call)
+            db.commit()
+            publish_call_event(phone.user_id, call_control_id, "initiated", direction="inbound",
+                               from_number=from_number, to_number=to_number)
+        await live_calls.started(call_control_id, phone.user_id, phone_number_id=phone.id, direction="inbound",
+                                 from_number=from_number, to_number=to_number)
         
         await _post(f"{TELNYX_BASE}/calls/{call_control_id}/actions/answer", {})
         return {"ok": True}
     
     elif event_type == "call.answered":
         call = db.query(Call).filter(Call.call_control_id == call_control_id).first()
+        if call is not None and call.direction == "outbound":
+            await _register_outbound(call)
+        await live_calls.update(call_control_id, "answered")
         if call:
             call.status = "answered"
             call.answered_at = datetime.utcnow()
             db.commit()
+            publish_call_event(call.user_id, call_control_id, "answered",
+                               answered_at=call.answered_at.isoformat())
         
         agent_data = agent_cache.get(call_control_id, {})
         greeting = agent_data.get("greeting_message")
@@ -179,6 +200,12 @@ async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
                 await speak_text(ai_response, call_control_id)
             else:
                 call_states[call_control_id] = "ready"
+        elif recording_url and call_control_id not in call_states:
+            # Whole-call recording (no AI conversation on it): transcribe off the request path
+            enqueue(db, "call.transcribe",
+                    {"call_control_id": call_control_id, "recording_url": recording_url},
+                    dedupe_key=f"transcribe:{call_control_id}")
+            db.commit()
         
         return {"ok": True}
     
@@ -189,6 +216,7 @@ async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
             del call_states[call_control_id]
         if call_control_id in agent_cache:
             del agent_cache[call_control_id]
+        await live_calls.ended(call_control_id)
         
         call = db.query(Call).filter(Call.call_control_id == call_control_id).first()
         if call:
@@ -197,10 +225,12 @@ async def telnyx_voice_webhook(request: Request, db: Session = Depends(get_db)):
             if call.answered_at:
                 call.duration = int((call.ended_at - call.answered_at).total_seconds())
             db.commit()
+            publish_call_event(call.user_id, call_control_id, "completed",
+                               ended_at=call.ended_at.isoformat(), duration=call.duration)
         return {"ok": True}
     
     return {"ok": True}
 
-@router.post("/messaging")
+@router.post("/messaging", dependencies=[Depends(dedupe_telnyx_event)])
 async def telnyx_msg_webhook(request: Request):
     return {"ok": True}
@@ -1,5 +1,5 @@
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import Iterable, Dict, Any, Optional
 from datetime import datetime, timedelta
 import telnyx
 from sqlalchemy.orm import Session
@@ -10,8 +10,12 @@ from app.models.bulk_campaign import (
     BulkCampaign, CampaignRecipient, CampaignStatus, 
     RecipientStatus, CampaignType
 )
-from app.models.call import Call
 from app.models.phone_number import PhoneNumber
+from app.services.campaign_dispatcher import CampaignDispatcher, campaign_throttles
+from app.services.campaign_progress import campaign_progress, load_snapshot
+from app.services.job_queue import enqueue
+from app.services.recipient_loader import load_recipients
+from app.services.recipient_state import RecipientStateWriter
 from app.services.telnyx_service import TelnyxService
 
 telnyx.api_key = settings.TELNYX_API_KEY
@@ -44,29 +48,14 @@ class BulkCampaignService:
     def add_recipients(
         db: Session,
         campaign_id: int,
-        recipients: List[Dict[str, Any]]
-    ) -> List[CampaignRecipient]:
-        """Add recipients to a campaign"""
-        campaign = db.query(BulkCampaign).filter(BulkCampaign.id == campaign_id).first()
-        if not campaign:
+        recipients: Iterable[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        """Bulk-load recipients (normalized numbers) into a campaign; returns counts, not rows"""
+        exists = db.query(BulkCampaign.id).filter(BulkCampaign.id == campaign_id).first()
+        if not exists:
             raise ValueError("Campaign not found")
         
-        recipient_objects = []
-        for recipient_data in recipients:
-            recipient = CampaignRecipient(
-                campaign_id=campaign_id,
-                **recipient_data
-            )
-            recipient_objects.append(recipient)
-            db.add(recipient)
-        
-        campaign.total_recipients = len(recipient_objects)
-        db.commit()
-        
-        for r in recipient_objects:
-            db.refresh(r)
-        
-        return recipient_objects
+        return load_recipients(db, campaign_id, recipients)
     
     @staticmethod
     async def start_campaign(
@@ -83,27 +72,37 @@ class BulkCampaignService:
         
         campaign.status = CampaignStatus.RUNNING
         campaign.started_at = datetime.utcnow()
+        # Dispatched by a job worker (services/jobs), committed together with the status
+        job = BulkCampaignService._enqueue_run(db, campaign_id, campaign.user_id)
         db.commit()
         
-        # Start processing in background
-        asyncio.create_task(
-            BulkCampaignService._process_campaign(db, campaign_id)
-        )
-        
         return {
             "success": True,
             "campaign_id": campaign_id,
             "status": "running",
-            "total_recipients": campaign.total_recipients
+            "total_recipients": campaign.total_recipients,
+            "job_id": job.id
         }
     
+    @staticmethod
+    def _enqueue_run(db: Session, campaign_id: int, user_id: Optional[int] = None):
+        # One run per campaign at a time; resuming while the old run is still active reuses it
+        return enqueue(
+            db, "campaign.run", {"campaign_id": campaign_id},
+            dedupe_key=f"campaign:{campaign_id}", user_id=user_id,
+        )
+    
     @staticmethod
     async def _process_campaign(db: Session, campaign_id: int):
-        """Process campaign recipients (runs in background)"""
+        """Process campaign recipients (the campaign.run job; db belongs to the job)"""
         campaign = db.query(BulkCampaign).filter(BulkCampaign.id == campaign_id).first()
         if not campaign:
             return
         
+        snapshot = load_snapshot(campaign_id)
+        if snapshot:
+            campaign_progress.track(snapshot)
+        
         phone_number = db.query(PhoneNumber).filter(
             PhoneNumber.id == campaign.phone_number_id
         ).first()
@@ -111,6 +110,7 @@ class BulkCampaignService:
         if not phone_number:
             campaign.status = CampaignStatus.FAILED
             db.commit()
+            campaign_progress.set_status(campaign_id, CampaignStatus.FAILED)
             return
         
         recipients = db.query(CampaignRecipient).filter(
@@ -119,63 +119,54 @@ class BulkCampaignService:
                 CampaignRecipient.status == RecipientStatus.PENDING
             )
         ).all()
+        # Detached: their changes are written in batches by the state writer, never by db.commit()
+        for recipient in recipients:
+            db.expunge(recipient)
         
-        calls_this_minute = 0
-        calls_this_hour = 0
-        minute_start = datetime.utcnow()
-        hour_start = datetime.utcnow()
+        from_number = phone_number.phone_number
+        send_call = campaign.campaign_type in (CampaignType.VOICE, CampaignType.BOTH)
+        send_sms = campaign.campaign_type in (CampaignType.SMS, CampaignType.BOTH)
         
-        active_tasks = set()
+        state = RecipientStateWriter(
+            campaign_id,
+            batch_size=settings.RECIPIENT_STATE_BATCH_SIZE,
+            flush_ms=settings.RECIPIENT_STATE_FLUSH_MS,
+        )
         
-        for recipient in recipients:
-            db.refresh(campaign)
-            if campaign.status == CampaignStatus.PAUSED:
-                break
-            
-            now = datetime.utcnow()
-            
-            if (now - minute_start).total_seconds() >= 60:
-                calls_this_minute = 0
-                minute_start = now
-            
-            if (now - hour_start).total_seconds() >= 3600:
-                calls_this_hour = 0
-                hour_start = now
-            
-            if calls_this_minute >= campaign.calls_per_minute:
-                await asyncio.sleep(60 - (now - minute_start).total_seconds())
-                calls_this_minute = 0
-                minute_start = datetime.utcnow()
-            
-            if calls_this_hour >= campaign.calls_per_hour:
-                sleep_time = 3600 - (now - hour_start).total_seconds()
-                await asyncio.sleep(sleep_time)
-                calls_this_hour = 0
-                hour_start = datetime.utcnow()
-            
-            while len(active_tasks) >= campaign.concurrent_calls:
-                done, active_tasks = await asyncio.wait(
-                    active_tasks, 
-                    return_when=asyncio.FIRST_COMPLETED
-                )
-            
-            if campaign.campaign_type == CampaignType.VOICE or campaign.campaign_type == CampaignType.BOTH:
-                task = asyncio.create_task(
-                    BulkCampaignService._make_call(
-                        db, campaign, recipient, phone_number.phone_number
-                    )
-                )
-                active_tasks.add(task)
-                calls_this_minute += 1
-                calls_this_hour += 1
-            
-            if campaign.campaign_type == CampaignType.SMS or campaign.campaign_type == CampaignType.BOTH:
-                await BulkCampaignService._send_sms(
-                    db, campaign, recipient, phone_number.phone_number
-                )
+        async def dispatch(recipient: CampaignRecipient):
+            if send_call:
+                await BulkCampaignService._make_call(state, campaign, recipient, from_number)
+            if send_sms:
+                await BulkCampaignService._send_sms(state, campaign, recipient, from_number)
         
-        if active_tasks:
-            await asyncio.wait(active_tasks)
+        dispatcher = CampaignDispatcher(
+            db, campaign_id,
+            throttles=campaign_throttles(campaign, from_number),
+            concurrency=campaign.concurrent_calls,
+            tick=settings.CAMPAIGN_DISPATCH_TICK_SECONDS,
+        )
+        state.start()
+        try:
+            status = await dispatcher.run(recipients, dispatch)
+        finally:
+            await state.stop()
+        
+        if status != CampaignStatus.RUNNING:
+            # Stopped before running out of recipients; the row may have changed or be gone
+            campaign = db.query(BulkCampaign).filter(
+                BulkCampaign.id == campaign_id
+            ).populate_existing().first()
+            if not campaign:
+                # Deleted mid-run; end any progress streams still following it
+                campaign_progress.set_status(campaign_id, CampaignStatus.FAILED)
+                return
+            if status == CampaignStatus.PAUSED and campaign.status == CampaignStatus.RUNNING:
+                # Resumed while this run was winding down (resume reused this job)
+                return await BulkCampaignService._process_campaign(db, campaign_id)
+            # Paused (resume_campaign queues a new run for the remaining recipients) or
+            # stopped by someone else; either way this run does not complete the campaign
+            campaign_progress.set_status(campaign_id, campaign.status)
+            return
         
         campaign.status = CampaignStatus.COMPLETED
         campaign.completed_at = datetime.utcnow()
@@ -195,85 +186,98 @@ class BulkCampaignService:
         ).count()
         
         db.commit()
+        campaign_progress.set_status(
+            campaign_id, CampaignStatus.COMPLETED,
+            completed=campaign.completed_count, failed=campaign.failed_count
+        )
     
     @staticmethod
     async def _make_call(
-        db: Session,
+        state: RecipientStateWriter,
         campaign: BulkCampaign,
         recipient: CampaignRecipient,
         from_number: str
     ):
         """Make an individual call"""
+        stage = recipient.status
         try:
             recipient.status = RecipientStatus.IN_PROGRESS
-            recipient.attempts += 1
+            recipient.attempts = (recipient.attempts or 0) + 1
             recipient.last_attempt_at = datetime.utcnow()
-            db.commit()
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, RecipientStatus.IN_PROGRESS)
+            stage = RecipientStatus.IN_PROGRESS
             
             voice_message = campaign.voice_message
             if campaign.enable_sms_personalization and recipient.name:
                 voice_message = voice_message.replace("{{name}}", recipient.name)
             
-            call_result = TelnyxService.make_call(
+            # Blocking HTTP; off the event loop so other sends keep going
+            call_result = await asyncio.to_thread(
+                TelnyxService.make_call,
                 to_number=recipient.phone_number,
                 from_number=from_number,
                 webhook_url=settings.TELNYX_VOICE_WEBHOOK_URL
             )
             
             if call_result:
-                call = Call(
-                    user_id=campaign.user_id,
-                    phone_number_id=campaign.phone_number_id,
-                    ai_agent_id=campaign.ai_agent_id,
-                    call_control_id=call_result.get("call_control_id"),
-                    telnyx_call_id=call_result.get("call_session_id"),
-                    direction="outbound",
-                    from_number=from_number,
-                    to_number=recipient.phone_number,
-                    status="initiated"
-                )
-                db.add(call)
-                db.commit()
+                # Inserted with the next flush; call_id is set on the recipient then
+                state.add_call(recipient.id, {
+                    "user_id": campaign.user_id,
+                    "phone_number_id": campaign.phone_number_id,
+                    "ai_agent_id": campaign.ai_agent_id,
+                    "call_control_id": call_result.get("call_control_id"),
+                    "telnyx_call_id": call_result.get("call_session_id"),
+                    "direction": "outbound",
+                    "from_number": from_number,
+                    "to_number": recipient.phone_number,
+                    "status": "initiated"
+                })
                 
-                recipient.call_id = call.id
                 recipient.status = RecipientStatus.COMPLETED
                 recipient.completed_at = datetime.utcnow()
                 
                 if voice_message:
                     await asyncio.sleep(2)
-                    TelnyxService.speak_text(
+                    await asyncio.to_thread(
+                        TelnyxService.speak_text,
                         call_result.get("call_control_id"),
                         voice_message
                     )
                 
-                campaign.success_count += 1
+                state.count(success=1)
             else:
                 recipient.status = RecipientStatus.FAILED
                 recipient.error_message = "Failed to initiate call"
-                campaign.failed_count += 1
+                state.count(failed=1)
             
-            db.commit()
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, recipient.status, success=bool(call_result))
             
         except Exception as e:
             print(f"Error making call to {recipient.phone_number}: {e}")
             recipient.status = RecipientStatus.FAILED
             recipient.error_message = str(e)
-            campaign.failed_count += 1
-            db.commit()
+            state.count(failed=1)
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, RecipientStatus.FAILED)
     
     @staticmethod
     async def _send_sms(
-        db: Session,
+        state: RecipientStateWriter,
         campaign: BulkCampaign,
         recipient: CampaignRecipient,
         from_number: str
     ):
         """Send an individual SMS"""
+        stage = recipient.status
         try:
             recipient.status = RecipientStatus.IN_PROGRESS
-            recipient.attempts += 1
+            recipient.attempts = (recipient.attempts or 0) + 1
             recipient.last_attempt_at = datetime.utcnow()
-            db.commit()
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, RecipientStatus.IN_PROGRESS)
+            stage = RecipientStatus.IN_PROGRESS
             
             sms_message = campaign.sms_message
             if campaign.enable_sms_personalization:
@@ -283,7 +287,8 @@ class BulkCampaignService:
                     for key, value in recipient.custom_data.items():
                         sms_message = sms_message.replace(f"{{{{{key}}}}}", str(value))
             
-            result = TelnyxService.send_sms(
+            result = await asyncio.to_thread(
+                TelnyxService.send_sms,
                 to_number=recipient.phone_number,
                 from_number=from_number,
                 text=sms_message,
@@ -295,20 +300,22 @@ class BulkCampaignService:
                 recipient.message_status = "sent"
                 recipient.status = RecipientStatus.COMPLETED
                 recipient.completed_at = datetime.utcnow()
-                campaign.success_count += 1
+                state.count(success=1)
             else:
                 recipient.status = RecipientStatus.FAILED
                 recipient.error_message = "Failed to send SMS"
-                campaign.failed_count += 1
+                state.count(failed=1)
             
-            db.commit()
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, recipient.status, success=bool(result))
             
         except Exception as e:
             print(f"Error sending SMS to {recipient.phone_number}: {e}")
             recipient.status = RecipientStatus.FAILED
             recipient.error_message = str(e)
-            campaign.failed_count += 1
-            db.commit()
+            state.count(failed=1)
+            state.save(recipient)
+            campaign_progress.move(campaign.id, stage, RecipientStatus.FAILED)
     
     @staticmethod
     def pause_campaign(db: Session, campaign_id: int) -> Dict[str, Any]:
@@ -322,6 +329,7 @@ class BulkCampaignService:
         
         campaign.status = CampaignStatus.PAUSED
         db.commit()
+        campaign_progress.set_status(campaign_id, CampaignStatus.PAUSED)
         
         return {"success": True, "status": "paused"}
     
@@ -336,13 +344,10 @@ class BulkCampaignService:
             raise ValueError("Campaign is not paused")
         
         campaign.status = CampaignStatus.RUNNING
+        job = BulkCampaignService._enqueue_run(db, campaign_id, campaign.user_id)
         db.commit()
         
-        asyncio.create_task(
-            BulkCampaignService._process_campaign(db, campaign_id)
-        )
-        
-        return {"success": True, "status": "running"}
+        return {"success": True, "status": "running", "job_id": job.id}
     
     @staticmethod
     def get_campaign_stats(db: Session, campaign_id: int) -> Dict[str, Any]:
@@ -0,0 +1,504 @@
+"""
+Call History Partitions & Archive
+
+calls (by started_at) and rootcall_call_logs (by timestamp) are split into
+calendar months so the hot tables only ever hold ARCHIVE_RETENTION_MONTHS
+of history:
+
+    PostgreSQL - both tables are range-partitioned by month (see migration
+                 b7d2e94c1f60); partitions are created PARTITION_MONTHS_AHEAD
+                 months in advance and an expired month is one DROP TABLE
+    SQLite etc - plain tables; an expired month is one indexed range DELETE
+
+Before a month leaves the database it is written to the archive, one file
+per (table, month, phone number) under ARCHIVE_URL (a local directory or
+s3://bucket/prefix). Files are Parquet (zstd) when pyarrow is installed,
+otherwise gzip'd column-oriented JSON; readers handle both. A month's
+manifest.json is written last and doubles as its commit marker, so a run
+that dies half way simply redoes that month. Manifests of
+rootcall_call_logs also keep per-phone action counts, so the stats
+counters survive archiving (call_stats backfill adds them back).
+
+Exports read the archive transparently after the hot rows
+(iter_archived), and rollup rebuilds never reach back past the archived
+months. Archiving only runs when ARCHIVE_RETENTION_MONTHS > 0:
+
+    python -m app.services.call_archive partitions
+    python -m app.services.call_archive archive [--dry-run]
+    python -m app.services.call_archive list
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.call import Call
+from app.models.rootcall_call_log import RootCallCallLog
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+try:
+    import boto3
+except ImportError:  # optional dependency
+    boto3 = None
+
+log = logging.getLogger("rootcall")
+
+
+class ArchivedTable:
+    """A table archived by month: time column partitions it, group column splits the files"""
+    __slots__ = ("model", "name", "time_column", "group_column", "columns")
+
+    def __init__(self, model, time_column: str, group_column: str):
+        self.model = model
+        self.name = model.__tablename__
+        self.time_column = time_column
+        self.group_column = group_column
+        self.columns = [c.name for c in model.__table__.columns]
+
+
+TABLES: Dict[str, ArchivedTable] = {
+    t.name: t for t in (
+        ArchivedTable(Call, "started_at", "phone_number_id"),
+        ArchivedTable(RootCallCallLog, "timestamp", "phone_number_id"),
+    )
+}
+
+
+# ============================================
+# MONTHS
+# ============================================
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def month_key(month: datetime) -> str:
+    return month.strftime("%Y-%m")
+
+
+def retention_horizon(now: Optional[datetime] = None) -> Optional[datetime]:
+    """First month kept hot; None while archiving is disabled"""
+    if settings.ARCHIVE_RETENTION_MONTHS <= 0:
+        return None
+    return add_months(month_start(now or datetime.utcnow()), -settings.ARCHIVE_RETENTION_MONTHS)
+
+
+# ============================================
+# STORAGE
+# ============================================
+
+class LocalArchiveStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def list_dirs(self, prefix: str) -> List[str]:
+        try:
+            return sorted(e.name for e in os.scandir(self._path(prefix)) if e.is_dir())
+        except FileNotFoundError:
+            return []
+
+
+class S3ArchiveStore:
+    def __init__(self, url: str):
+        if boto3 is None:
+            raise RuntimeError("ARCHIVE_URL points at S3 but boto3 is not installed")
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3 = boto3.client("s3")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def write(self, key: str, data: bytes) -> None:
+        self._s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except self._s3.exceptions.NoSuchKey:
+            return None
+
+    def list_dirs(self, prefix: str) -> List[str]:
+        names = []
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix) + "/", Delimiter="/"):
+            for entry in page.get("CommonPrefixes", []):
+                names.append(entry["Prefix"].rstrip("/").rsplit("/", 1)[-1])
+        return sorted(names)
+
+
+def open_store(url: Optional[str] = None):
+    url = url or settings.ARCHIVE_URL
+    if url.startswith("s3://"):
+        return S3ArchiveStore(url)
+    return LocalArchiveStore(url[len("file://"):] if url.startswith("file://") else url)
+
+
+# ============================================
+# FILE FORMAT
+# ============================================
+
+def encode_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> Tuple[str, bytes]:
+    """(file extension, bytes) for rows stored column by column"""
+    data = {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+    if pa is not None:
+        buf = io.BytesIO()
+        pq.write_table(pa.table(data), buf, compression="zstd")
+        return "parquet", buf.getvalue()
+    payload = {
+        "columns": list(columns),
+        "data": [
+            [v.isoformat() if isinstance(v, datetime) else v for v in data[name]]
+            for name in columns
+        ],
+    }
+    return "json.gz", gzip.compress(json.dumps(payload, default=str).encode("utf-8"), 6)
+
+
+def decode_rows(table: ArchivedTable, extension: str, blob: bytes) -> List[Dict[str, Any]]:
+    if extension == "parquet":
+        if pq is None:
+            raise RuntimeError("Archive file is Parquet but pyarrow is not installed")
+        return pq.read_table(io.BytesIO(blob)).to_pylist()
+    payload = json.loads(gzip.decompress(blob))
+    model_columns = table.model.__table__.columns
+    columns = []
+    for name, values in zip(payload["columns"], payload["data"]):
+        if name in model_columns and isinstance(model_columns[name].type, DateTime):
+            values = [datetime.fromisoformat(v) if v else None for v in values]
+        columns.append(values)
+    return [dict(zip(payload["columns"], row)) for row in zip(*columns)]
+
+
+# ============================================
+# MANIFESTS / READ PATH
+# ============================================
+
+def _manifest_key(table: str, month: str) -> str:
+    return f"{table}/{month}/manifest.json"
+
+
+def load_manifest(store, table: str, month: str) -> Optional[Dict[str, Any]]:
+    blob = store.read(_manifest_key(table, month))
+    return json.loads(blob) if blob else None
+
+
+def archived_months(table: str, store=None) -> List[str]:
+    """YYYY-MM of every completely archived month, oldest first"""
+    store = store or open_store()
+    return [m for m in store.list_dirs(table) if store.read(_manifest_key(table, m)) is not None]
+
+
+def hot_since(table: str, store=None) -> Optional[datetime]:
+    """First month still (only) in the database; None when nothing is archived"""
+    months = archived_months(table, store)
+    if not months:
+        return None
+    return add_months(datetime.strptime(months[-1], "%Y-%m"), 1)
+
+
+def iter_archived(
+    table: str,
+    group_ids: Optional[Iterable[int]] = None,
+    newest_first: bool = True,
+    store=None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Archived rows as dicts, month by month, for some phones (all when
+    group_ids is None), ordered by (time, id). Holds one phone-month in
+    memory at a time per requested phone.
+    """
+    spec = TABLES[table]
+    store = store or open_store()
+    wanted = None if group_ids is None else {str(g) for g in group_ids}
+    months = archived_months(table, store)
+    for month in (reversed(months) if newest_first else months):
+        manifest = load_manifest(store, table, month)
+        rows: List[Dict[str, Any]] = []
+        for group, entry in manifest["files"].items():
+            if wanted is not None and group not in wanted:
+                continue
+            blob = store.read(f"{table}/{month}/{entry['file']}")
+            if blob is None:
+                log.error("[ARCHIVE] Missing %s/%s/%s", table, month, entry["file"])
+                continue
+            rows.extend(decode_rows(spec, entry["file"].split(".", 1)[1], blob))
+        rows.sort(key=lambda r: (r[spec.time_column] or datetime.min, r["id"]), reverse=newest_first)
+        yield from rows
+
+
+def archived_action_counts(store=None) -> Counter:
+    """(phone_number_id, action) -> count over all archived rootcall_call_logs months"""
+    store = store or open_store()
+    counts: Counter = Counter()
+    for month in archived_months(RootCallCallLog.__tablename__, store):
+        manifest = load_manifest(store, RootCallCallLog.__tablename__, month)
+        for pid, action, n in manifest.get("action_counts", []):
+            counts[(pid, action)] += n
+    return counts
+
+
+# ============================================
+# POSTGRES PARTITIONS
+# ============================================
+
+def is_partitioned(db: Session, table: str) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month.strftime('%Y%m')}"
+
+
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None) -> List[str]:
+    """Create monthly partitions from this month through months_ahead months ahead"""
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    created = []
+    this_month = month_start(datetime.utcnow())
+    for table in TABLES:
+        if not is_partitioned(db, table):
+            continue
+        for n in range(months_ahead + 1):
+            month = add_months(this_month, n)
+            name = partition_name(table, month)
+            if db.execute(text("SELECT to_regclass(:t)"), {"t": name}).scalar():
+                continue
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+    db.commit()
+    if created:
+        log.info("[ARCHIVE] Created partitions %s", created)
+    return created
+
+
+# ============================================
+# ARCHIVING
+# ============================================
+
+def _oldest_month(db: Session, spec: ArchivedTable) -> Optional[datetime]:
+    column = getattr(spec.model, spec.time_column)
+    oldest = db.query(column).order_by(column.asc()).limit(1).scalar()
+    return month_start(oldest) if oldest else None
+
+
+def _export_month(db: Session, store, spec: ArchivedTable, month: datetime) -> Dict[str, Any]:
+    """Write one month to the archive, one file per group; returns the manifest"""
+    table = spec.model.__table__
+    time_col = table.c[spec.time_column]
+    group_col = table.c[spec.group_column]
+    stmt = (
+        table.select()
+        .where(time_col >= month, time_col < add_months(month, 1))
+        .order_by(group_col, time_col, table.c.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    manifest: Dict[str, Any] = {"table": spec.name, "month": month_key(month), "rows": 0, "files": {}}
+    action_counts: Counter = Counter()
+    group_index = spec.columns.index(spec.group_column)
+
+    def flush(group, rows):
+        extension, blob = encode_rows(spec.columns, rows)
+        name = f"{spec.group_column}={group}.{extension}"
+        store.write(f"{spec.name}/{month_key(month)}/{name}", blob)
+        manifest["files"][str(group)] = {"file": name, "rows": len(rows)}
+        manifest["rows"] += len(rows)
+
+    current, rows = None, []
+    for row in db.execute(stmt):
+        group = row[group_index] or 0
+        if rows and group != current:
+            flush(current, rows)
+            rows = []
+        current = group
+        rows.append(tuple(row))
+        if spec.model is RootCallCallLog:
+            action_counts[(group, row.action)] += 1
+    if rows:
+        flush(current, rows)
+
+    if spec.model is RootCallCallLog:
+        manifest["action_counts"] = [[pid, action, n] for (pid, action), n in sorted(action_counts.items())]
+    manifest["archived_at"] = datetime.utcnow().isoformat()
+    # Commit marker: only now is the month considered archived
+    store.write(_manifest_key(spec.name, month_key(month)), json.dumps(manifest).encode("utf-8"))
+    return manifest
+
+
+def _drop_month(db: Session, spec: ArchivedTable, month: datetime) -> None:
+    """Remove an archived month from the hot table"""
+    if is_partitioned(db, spec.name):
+        name = partition_name(spec.name, month)
+        if db.execute(text("SELECT to_regclass(:t)"), {"t": name}).scalar():
+            db.execute(text(f"DROP TABLE {name}"))
+    # Rows that landed in the default partition, or the whole month without partitions
+    time_col = spec.model.__table__.c[spec.time_column]
+    db.execute(spec.model.__table__.delete().where(time_col >= month, time_col < add_months(month, 1)))
+    db.commit()
+
+
+def archive_expired(db: Session, store=None, dry_run: bool = False) -> List[Dict[str, Any]]:
+    """Archive and drop every month older than the retention horizon"""
+    horizon = retention_horizon()
+    if horizon is None:
+        return []
+    store = store or open_store()
+    done = []
+    for spec in TABLES.values():
+        month = _oldest_month(db, spec)
+        while month is not None and month < horizon:
+            key = month_key(month)
+            manifest = load_manifest(store, spec.name, key)
+            if dry_run:
+                done.append({"table": spec.name, "month": key, "archived": manifest is not None})
+            else:
+                if manifest is None:
+                    started = time.monotonic()
+                    manifest = _export_month(db, store, spec, month)
+                    log.info("[ARCHIVE] %s %s: %s rows in %.1fs", spec.name, key, manifest["rows"],
+                             time.monotonic() - started)
+                else:
+                    # Already exported: a previous run stopped before the drop
+                    log.info("[ARCHIVE] %s %s already archived, dropping", spec.name, key)
+                _drop_month(db, spec, month)
+                done.append({"table": spec.name, "month": key, "rows": manifest["rows"]})
+            month = add_months(month, 1)
+    return done
+
+
+def run_maintenance() -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return {"partitions": ensure_partitions(db), "archived": archive_expired(db)}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ArchiveMaintainer:
+    """Daily partition creation + archiving; a file lock keeps it to one worker per host"""
+
+    def __init__(self, lock_path: str, interval: int):
+        self.lock_path = lock_path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="call-archive")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _run_locked(self) -> Optional[Dict[str, Any]]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None  # another worker is on it
+            try:
+                return run_maintenance()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._run_locked)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("[ARCHIVE] Maintenance failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+archive_maintainer = ArchiveMaintainer(settings.ARCHIVE_LOCK_PATH, settings.ARCHIVE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Call history partitions and archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("partitions", help="create upcoming monthly partitions (PostgreSQL)")
+    archive = sub.add_parser("archive", help="archive and drop months past the retention window")
+    archive.add_argument("--dry-run", action="store_true", help="only list the months that would go")
+    sub.add_parser("list", help="list archived months per table")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.command == "partitions":
+            print(ensure_partitions(session))
+        elif args.command == "archive":
+            for entry in archive_expired(session, dry_run=args.dry_run):
+                print(entry)
+        else:
+            for name in TABLES:
+                print(name, archived_months(name))
+    finally:
+        session.close()
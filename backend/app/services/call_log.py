@@ -0,0 +1,277 @@
+"""
+Screening Outcome Log - write-behind
+
+Persists what RootCall decided for a call: one RootCallCallLog row per
+outcome (what the portal stats, recent calls and export read) plus the
+screening fields on the matching Call row (spam_score, is_spam, ...), when
+the call was also recorded by the voice webhook.
+
+screen_call never waits on the database: submit() drops the record into a
+bounded in-memory queue and returns. One background task flushes the queue
+as a single multi-row INSERT (COPY on PostgreSQL) plus one batched UPDATE
+for Call rows, every CALL_LOG_BATCH_SIZE records or CALL_LOG_FLUSH_MS
+milliseconds, whichever comes first. Stopping the writer drains whatever
+is still queued. Each batch also bumps the per-phone action counters the
+stats endpoints read (see call_stats) and drops their cached responses.
+
+Started/stopped from the FastAPI lifespan in app/main.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, insert, update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.call import Call
+from app.models.rootcall_call_log import RootCallCallLog
+from app.services.call_stats import count_actions, increment_action_counts
+from app.services.response_cache import phone_tag, response_cache
+
+log = logging.getLogger("rootcall")
+
+# RootCallCallLog.status per action
+ACTION_STATUS = {
+    "spam_blocked": "blocked",
+    "trusted_forwarded": "forwarded",
+    "screened": "screening",
+    "medical_transferred": "transferred",
+    "family_transferred": "transferred",
+    "rejected": "rejected",
+}
+
+LOG_COLUMNS = ("phone_number_id", "from_number", "caller_name", "action", "status", "call_control_id")
+
+# Only overwrite Call columns the record actually carries
+_CALL_UPDATE = (
+    update(Call)
+    .where(Call.call_control_id == bindparam("ccid"))
+    .values(
+        screening_action=bindparam("screening_action"),
+        caller_name=func.coalesce(bindparam("caller_name"), Call.caller_name),
+        spam_score=func.coalesce(bindparam("spam_score"), Call.spam_score),
+        is_spam=func.coalesce(bindparam("is_spam"), Call.is_spam),
+        is_trusted=func.coalesce(bindparam("is_trusted"), Call.is_trusted),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+
+def build_log_record(
+    call_control_id: str,
+    action: str,
+    from_number: str,
+    phone_number_id: Optional[int] = None,
+    caller_name: Optional[str] = None,
+    spam_score: Optional[int] = None,
+    is_spam: Optional[bool] = None,
+    is_trusted: Optional[bool] = None,
+) -> Dict[str, Any]:
+    return {
+        "phone_number_id": phone_number_id,
+        "from_number": (from_number or "")[:20],
+        "caller_name": caller_name[:255] if caller_name else None,
+        "action": action,
+        "status": ACTION_STATUS.get(action, "completed"),
+        "call_control_id": call_control_id,
+        "spam_score": spam_score,
+        "is_spam": is_spam,
+        "is_trusted": is_trusted,
+    }
+
+
+def _copy_log_rows(db, rows: List[Dict[str, Any]]) -> None:
+    """COPY rows into rootcall_call_logs inside the session's transaction (psycopg2)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([
+            # Empty unquoted field = NULL in COPY ... CSV
+            "" if row[col] is None else row[col]
+            for col in LOG_COLUMNS
+        ])
+    buf.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {RootCallCallLog.__tablename__} ({', '.join(LOG_COLUMNS)}) FROM STDIN "
+            "WITH (FORMAT csv, FORCE_NOT_NULL (from_number, action, status))",
+            buf,
+        )
+    finally:
+        cursor.close()
+
+
+def write_log_batch(rows: List[Dict[str, Any]], use_copy: bool = False) -> None:
+    """Write one batch in a single transaction (blocking)"""
+    db = SessionLocal()
+    try:
+        if use_copy:
+            _copy_log_rows(db, rows)
+        else:
+            db.execute(insert(RootCallCallLog), [{col: row[col] for col in LOG_COLUMNS} for row in rows])
+
+        call_updates = [
+            {
+                "ccid": row["call_control_id"],
+                "screening_action": row["action"],
+                "caller_name": row["caller_name"],
+                "spam_score": row["spam_score"],
+                "is_spam": row["is_spam"],
+                "is_trusted": row["is_trusted"],
+            }
+            for row in rows if row["call_control_id"]
+        ]
+        if call_updates:
+            db.connection().execute(_CALL_UPDATE, call_updates)
+
+        # Same transaction: the counters never drift from the rows they count
+        increment_action_counts(db, count_actions(rows))
+
+        db.commit()
+        response_cache.invalidate_tags(
+            phone_tag(row["phone_number_id"]) for row in rows if row["phone_number_id"]
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class CallLogWriter:
+    """Bounded queue + single flusher task"""
+
+    def __init__(self, batch_size: int, flush_ms: int, queue_maxsize: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.queue_maxsize = queue_maxsize
+        self.use_copy = settings.DATABASE_URL.startswith(("postgresql", "postgres"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_maxsize)
+        self._task = asyncio.create_task(self._run(), name="call-log-writer")
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Flush everything still queued, then stop"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("[CALL LOG] Drain timed out with %s records pending", self._queue.qsize())
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _drain(self) -> None:
+        # None is the stop marker; the flusher writes what is ahead of it and exits
+        await self._queue.put(None)
+        await self._task
+
+    def submit(self, call_control_id: str, action: str, from_number: str, **fields: Any) -> bool:
+        """Queue one outcome; never blocks. False if the record had to be dropped."""
+        self.start()
+        try:
+            self._queue.put_nowait(build_log_record(call_control_id, action, from_number, **fields))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.error("[CALL LOG] Queue full, dropped %s for %s", action, call_control_id)
+            return False
+        self.submitted += 1
+        return True
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            item = await self._queue.get()
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+            if stopping:
+                # Drain: pick up anything queued behind the stop marker
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(write_log_batch, chunk, self.use_copy)
+            except Exception as e:
+                self.failed_batches += 1
+                self.dropped += len(chunk)
+                log.error("[CALL LOG] Failed to write %s records: %s", len(chunk), e)
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.batches += 1
+            self.written += len(chunk)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_size,
+            "flush_ms": int(self.flush_interval * 1000),
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "flush_ms_last": round(self.last_flush_ms, 2),
+            "flush_ms_max": round(self.max_flush_ms, 2),
+            "flush_ms_avg": round(self.total_flush_ms / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+call_log_writer = CallLogWriter(
+    batch_size=settings.CALL_LOG_BATCH_SIZE,
+    flush_ms=settings.CALL_LOG_FLUSH_MS,
+    queue_maxsize=settings.CALL_LOG_QUEUE_MAXSIZE,
+)
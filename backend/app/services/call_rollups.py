@@ -0,0 +1,370 @@
+"""
+Hourly Call Rollups
+
+call_hourly_rollups keeps one row per (user, phone number, hour the call
+started) with calls / answered / completed / seconds / cost, so dashboard
+statistics read at most 24 rows per phone for a day and ~720 for a month
+instead of scanning calls.
+
+Buckets are recomputed, never incremented: whenever a session commits a
+change to a Call (created, answered, hung up, cost filled in...) the
+bucket the call started in is marked dirty, and every ROLLUP_FLUSH_SECONDS
+the updater re-aggregates the dirty buckets from calls. A hangup or cost
+arriving hours after the call started just marks that old bucket again, and
+replaying the same event twice gives the same numbers. Every
+ROLLUP_SWEEP_SECONDS the last ROLLUP_SWEEP_HOURS hours are recomputed as
+well, which picks up writes made by other worker processes and anything
+that bypassed the ORM session (bulk UPDATEs).
+
+Rollups outlive the raw rows: months archived out of calls (see
+call_archive) keep their rollups and are never rebuilt.
+
+Rebuild any range (or everything still in calls) with:
+
+    python -m app.services.call_rollups rebuild [--since 2025-01-01] [--until 2025-02-01]
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import case, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.call import Call
+from app.models.call_rollup import CallHourlyRollup
+from app.services.call_archive import hot_since
+
+log = logging.getLogger(__name__)
+
+# (user_id, phone_number_id, hour)
+Bucket = Tuple[int, int, datetime]
+
+# Call attributes that feed a rollup; changes to anything else don't dirty a bucket
+ROLLUP_FIELDS = ("user_id", "phone_number_id", "started_at", "answered_at", "status", "duration", "cost")
+
+HOUR = timedelta(hours=1)
+
+_rollups_available: Optional[bool] = None
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def rollups_available(db: Session) -> bool:
+    """Whether call_hourly_rollups exists (checked once per process)"""
+    global _rollups_available
+    if _rollups_available is None:
+        _rollups_available = inspect(db.get_bind()).has_table(CallHourlyRollup.__tablename__)
+        if not _rollups_available:
+            log.warning("Call rollups unavailable, dashboard stats read calls directly")
+    return _rollups_available
+
+
+# ============================================
+# AGGREGATION
+# ============================================
+
+def _hour_expr(dialect: str):
+    """SQL expression truncating Call.started_at to the hour, stored like a DateTime bind"""
+    if dialect == "postgresql":
+        return func.date_trunc("hour", Call.started_at)
+    if dialect == "sqlite":
+        # Same text format SQLAlchemy stores DateTime in, so range filters compare correctly
+        return func.strftime("%Y-%m-%d %H:00:00.000000", Call.started_at)
+    return func.date_format(Call.started_at, "%Y-%m-%d %H:00:00")
+
+
+def _call_aggregates():
+    """calls, answered, completed, seconds, cost over a set of Call rows"""
+    return (
+        func.count(Call.id),
+        func.coalesce(func.sum(case((Call.answered_at.isnot(None), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Call.status == "completed", 1), else_=0)), 0),
+        func.coalesce(func.sum(Call.duration), 0),
+        func.coalesce(func.sum(Call.cost), 0.0),
+    )
+
+
+def _replace_range(db: Session, start: Optional[datetime], end: Optional[datetime],
+                   phone_ids: Optional[Iterable[int]] = None) -> None:
+    """Delete and re-aggregate rollups for hours in [start, end), optionally only some phones"""
+    table = CallHourlyRollup.__table__
+    delete = table.delete()
+    source = []
+    if start is not None:
+        delete = delete.where(table.c.hour >= start)
+        source.append(Call.started_at >= start)
+    if end is not None:
+        delete = delete.where(table.c.hour < end)
+        source.append(Call.started_at < end)
+    if phone_ids is not None:
+        phone_ids = list(phone_ids)
+        delete = delete.where(table.c.phone_number_id.in_(phone_ids))
+        source.append(Call.phone_number_id.in_(phone_ids))
+    db.execute(delete)
+
+    hour = _hour_expr(db.get_bind().dialect.name)
+    grouped = (
+        select(Call.user_id, Call.phone_number_id, hour, *_call_aggregates(), func.now())
+        .where(Call.started_at.isnot(None), *source)
+        .group_by(Call.user_id, Call.phone_number_id, hour)
+    )
+    db.execute(
+        insert(table).from_select(
+            ["user_id", "phone_number_id", "hour", "calls", "answered", "completed", "seconds", "cost", "updated_at"],
+            grouped,
+        )
+    )
+
+
+def refresh_buckets(buckets: Iterable[Bucket]) -> int:
+    """Recompute the given buckets in one transaction (blocking); returns hours touched"""
+    by_hour: Dict[datetime, Set[int]] = defaultdict(set)
+    for _user_id, phone_number_id, hour in buckets:
+        by_hour[hour].add(phone_number_id)
+
+    db = SessionLocal()
+    try:
+        for hour in sorted(by_hour):
+            _replace_range(db, hour, hour + HOUR, by_hour[hour])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return len(by_hour)
+
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+    """
+    Rebuild rollups for [since, until) (whole hours; everything by default)
+    from calls. Months already archived out of calls are left as they are.
+    """
+    hot = hot_since(Call.__tablename__)
+    if hot and (since is None or since < hot):
+        since = hot
+    since = floor_hour(since) if since else None
+    until = floor_hour(until) + HOUR if until else None
+    _replace_range(db, since, until)
+    db.commit()
+    query = db.query(func.count()).select_from(CallHourlyRollup)
+    if since:
+        query = query.filter(CallHourlyRollup.hour >= since)
+    if until:
+        query = query.filter(CallHourlyRollup.hour < until)
+    return query.scalar()
+
+
+# ============================================
+# READS
+# ============================================
+
+def call_totals(db: Session, user_id: int, start: datetime, end: datetime) -> Dict[str, float]:
+    """
+    calls / answered / completed / seconds / cost for calls started in
+    [start, end]. From rollups, start is rounded down to the hour.
+    """
+    if rollups_available(db):
+        r = CallHourlyRollup
+        row = db.query(
+            func.coalesce(func.sum(r.calls), 0),
+            func.coalesce(func.sum(r.answered), 0),
+            func.coalesce(func.sum(r.completed), 0),
+            func.coalesce(func.sum(r.seconds), 0),
+            func.coalesce(func.sum(r.cost), 0.0),
+        ).filter(
+            r.user_id == user_id,
+            r.hour >= floor_hour(start),
+            r.hour < end,
+        ).one()
+    else:
+        # One pass over the raw rows instead of one scan per figure
+        row = db.query(*_call_aggregates()).filter(
+            Call.user_id == user_id,
+            Call.started_at >= start,
+            Call.started_at <= end,
+        ).one()
+
+    calls, answered, completed, seconds, cost = row
+    return {
+        "calls": int(calls),
+        "answered": int(answered),
+        "completed": int(completed),
+        "seconds": int(seconds),
+        "cost": float(cost),
+    }
+
+
+# ============================================
+# CHANGE TRACKING
+# ============================================
+
+def _touched_buckets(call: Call, compare: bool) -> Set[Bucket]:
+    """Buckets a flushed Call affects; with compare, only if a rollup field changed"""
+    buckets: Set[Bucket] = set()
+    if compare:
+        changed = [inspect(call).attrs[name].history for name in ROLLUP_FIELDS]
+        if not any(h.has_changes() for h in changed):
+            return buckets
+        # Moving a call between users/phones/hours dirties the bucket it left too
+        old = {
+            name: (h.deleted[0] if h.deleted else getattr(call, name))
+            for name, h in zip(ROLLUP_FIELDS, changed)
+        }
+        if old["user_id"] is not None and old["phone_number_id"] is not None and old["started_at"]:
+            buckets.add((old["user_id"], old["phone_number_id"], floor_hour(old["started_at"])))
+    if call.user_id is not None and call.phone_number_id is not None:
+        buckets.add((call.user_id, call.phone_number_id, floor_hour(call.started_at or datetime.utcnow())))
+    return buckets
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_call_changes(session, flush_context):
+    # new/dirty/deleted and attribute history still show the pre-flush state here
+    buckets: Set[Bucket] = set()
+    for obj in session.new:
+        if isinstance(obj, Call):
+            buckets |= _touched_buckets(obj, compare=False)
+    for obj in session.dirty:
+        if isinstance(obj, Call):
+            buckets |= _touched_buckets(obj, compare=True)
+    for obj in session.deleted:
+        if isinstance(obj, Call):
+            buckets |= _touched_buckets(obj, compare=False)
+    if buckets:
+        session.info.setdefault("rollup_buckets", set()).update(buckets)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_call_changes(session):
+    buckets = session.info.pop("rollup_buckets", None)
+    if buckets:
+        rollup_updater.mark(buckets)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_call_changes(session):
+    session.info.pop("rollup_buckets", None)
+
+
+# ============================================
+# UPDATER
+# ============================================
+
+class RollupUpdater:
+    """Recomputes dirty buckets every flush interval; sweeps recent hours periodically"""
+
+    def __init__(self, flush_seconds: float, sweep_seconds: int, sweep_hours: int):
+        self.flush_seconds = flush_seconds
+        self.sweep_seconds = sweep_seconds
+        self.sweep_hours = sweep_hours
+        self._dirty: Set[Bucket] = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_sweep = 0.0
+        self.refreshed_hours = 0
+        self.sweeps = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def mark(self, buckets: Iterable[Bucket]) -> None:
+        """Called from any thread once a change to these buckets is committed"""
+        with self._lock:
+            self._dirty.update(buckets)
+
+    def _take(self) -> Set[Bucket]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._last_sweep = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="call-rollups")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        buckets = self._take()
+        if not buckets:
+            return
+        try:
+            self.refreshed_hours += await asyncio.to_thread(refresh_buckets, buckets)
+        except Exception as e:
+            self.failures += 1
+            self.mark(buckets)  # retried on the next flush
+            log.error("Rollup refresh failed for %s buckets: %s", len(buckets), e)
+
+    async def sweep(self) -> None:
+        since = datetime.utcnow() - timedelta(hours=self.sweep_hours)
+        db = SessionLocal()
+        try:
+            await asyncio.to_thread(rebuild_rollups, db, since)
+            self.sweeps += 1
+        except Exception as e:
+            self.failures += 1
+            log.error("Rollup sweep failed: %s", e)
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+            if time.monotonic() - self._last_sweep >= self.sweep_seconds:
+                self._last_sweep = time.monotonic()
+                await self.sweep()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "dirty_buckets": len(self._dirty),
+            "refreshed_hours": self.refreshed_hours,
+            "sweeps": self.sweeps,
+            "failures": self.failures,
+        }
+
+
+rollup_updater = RollupUpdater(
+    flush_seconds=settings.ROLLUP_FLUSH_SECONDS,
+    sweep_seconds=settings.ROLLUP_SWEEP_SECONDS,
+    sweep_hours=settings.ROLLUP_SWEEP_HOURS,
+)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Hourly call rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute rollups from calls")
+    rebuild.add_argument("--since", type=datetime.fromisoformat, help="first hour (UTC) to rebuild")
+    rebuild.add_argument("--until", type=datetime.fromisoformat, help="last hour (UTC) to rebuild")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(f"{rebuild_rollups(session, args.since, args.until)} rollup rows")
+    finally:
+        session.close()
@@ -0,0 +1,181 @@
+"""
+RootCall Call Stats
+
+Per-phone, per-action counts of rootcall_call_logs rows, for the portal
+stats card and the admin dashboard.
+
+rootcall_action_counts holds one running total per (phone_number_id,
+action). call_log.write_log_batch increments it in the same transaction as
+the log INSERT, so reading stats is a handful of primary-key rows however
+much call history a client has. Until the table exists (migration not run
+yet) reads fall back to a single GROUP BY action over the logs and the
+writer skips the increments.
+
+Backfill (or repair) the counters from the logs with:
+
+    python -m app.services.call_stats backfill
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.rootcall_call_log import RootCallActionCount, RootCallCallLog
+from app.services.call_archive import archived_action_counts
+
+log = logging.getLogger("rootcall")
+
+# Actions the portal stats card shows, in response order
+STATS_ACTIONS = ("spam_blocked", "screened", "trusted_forwarded")
+# A screened call logs "screened" and then, once the caller presses a key, one of these;
+# the call is counted once, by its "screened" row (callers who hang up never get a second row)
+AFTER_SCREEN_ACTIONS = ("medical_transferred", "family_transferred", "rejected")
+
+_counters_available: Optional[bool] = None
+
+
+def counters_available(db: Session) -> bool:
+    """Whether rootcall_action_counts exists (checked once per process)"""
+    global _counters_available
+    if _counters_available is None:
+        _counters_available = settings.CALL_STATS_USE_COUNTERS and inspect(db.get_bind()).has_table(
+            RootCallActionCount.__tablename__
+        )
+        if not _counters_available:
+            log.warning("[CALL STATS] Action counters unavailable, stats read rootcall_call_logs directly")
+    return _counters_available
+
+
+def count_actions(rows: Iterable[Dict]) -> Counter:
+    """(phone_number_id or 0, action) -> count for a batch of log rows"""
+    return Counter((row["phone_number_id"] or 0, row["action"]) for row in rows)
+
+
+def increment_action_counts(db: Session, counts: Counter) -> None:
+    """
+    Add counts to rootcall_action_counts inside the caller's transaction.
+    Keys are applied in sorted order so concurrent writers lock rows in the
+    same order.
+    """
+    if not counts or not counters_available(db):
+        return
+    table = RootCallActionCount.__table__
+    params = [
+        {"phone_number_id": pid, "action": action, "count": n}
+        for (pid, action), n in sorted(counts.items())
+    ]
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.phone_number_id, table.c.action],
+            set_={"count": table.c.count + stmt.excluded.count, "updated_at": func.now()},
+        )
+        db.execute(stmt, params)
+        return
+
+    # No native upsert: UPDATE, INSERT the keys that did not exist yet
+    for row in params:
+        result = db.execute(
+            update(table)
+            .where(table.c.phone_number_id == row["phone_number_id"], table.c.action == row["action"])
+            .values(count=table.c.count + row["count"], updated_at=func.now())
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(**row))
+
+
+def action_counts(db: Session, phone_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    action -> number of logged calls, for the given phones (all phones when
+    phone_ids is None). One query either way.
+    """
+    if phone_ids is not None:
+        phone_ids = list(phone_ids)
+        if not phone_ids:
+            return {}
+
+    if counters_available(db):
+        model = RootCallActionCount
+        query = db.query(model.action, func.sum(model.count))
+    else:
+        model = RootCallCallLog
+        query = db.query(model.action, func.count(model.id))
+    if phone_ids is not None:
+        query = query.filter(model.phone_number_id.in_(phone_ids))
+    return {action: int(total or 0) for action, total in query.group_by(model.action).all()}
+
+
+def call_total(counts: Dict[str, int]) -> int:
+    """Calls (not log rows) behind per-action counts"""
+    return sum(n for action, n in counts.items() if action not in AFTER_SCREEN_ACTIONS)
+
+
+def portal_stats(counts: Dict[str, int]) -> Dict[str, int]:
+    """The stats card shape served by /api/rootcall/stats"""
+    return {
+        "spam_blocked": counts.get("spam_blocked", 0),
+        "calls_screened": counts.get("screened", 0),
+        "trusted_forwarded": counts.get("trusted_forwarded", 0),
+        "total_calls": call_total(counts),
+    }
+
+
+def backfill_action_counts(db: Session) -> Tuple[int, int]:
+    """
+    Rebuild rootcall_action_counts from rootcall_call_logs (plus the counts
+    recorded for archived months) in one transaction.
+    Returns (counter rows, log rows counted).
+    """
+    table = RootCallActionCount.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        # Hold off the log writer until we commit, so no batch is counted twice or missed
+        db.connection().exec_driver_sql(f"LOCK TABLE {table.name} IN EXCLUSIVE MODE")
+    db.execute(table.delete())
+
+    phone_id = func.coalesce(RootCallCallLog.phone_number_id, 0)
+    grouped = (
+        select(phone_id, RootCallCallLog.action, func.count(RootCallCallLog.id), func.now())
+        .group_by(phone_id, RootCallCallLog.action)
+    )
+    db.execute(
+        insert(table).from_select(["phone_number_id", "action", "count", "updated_at"], grouped)
+    )
+    increment_action_counts(db, archived_action_counts())
+    db.commit()
+
+    rows, total = db.query(func.count(), func.coalesce(func.sum(RootCallActionCount.count), 0)).one()
+    return rows, int(total)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="RootCall per-phone action counters")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="rebuild the counters from rootcall_call_logs")
+    sub.add_parser("show", help="print call counts per action across all phones")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.command == "backfill":
+            rows, total = backfill_action_counts(session)
+            print(f"{rows} counter rows, {total} calls")
+        else:
+            print(action_counts(session))
+    finally:
+        session.close()
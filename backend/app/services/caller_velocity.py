@@ -0,0 +1,127 @@
+"""
+Caller Velocity Detector
+
+Robocallers dial many of our DIDs from one number within minutes. Every
+call.initiated is recorded here against the caller number (across all
+DIDs); when a caller crosses VELOCITY_MAX_CALLS calls or VELOCITY_MAX_DIDS
+distinct DIDs inside VELOCITY_WINDOW_SECONDS it is flagged, and spam_scorer
+treats that as a spam signal before any gather/TTS is paid for.
+
+Each caller gets a small ring buffer of per-bucket counts (the window split
+into VELOCITY_BUCKETS buckets), so recording and checking are constant time.
+Memory is bounded: at most VELOCITY_MAX_CALLERS callers are tracked and the
+least recently seen are dropped first. Counts are per worker process.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+
+class _CallerWindow:
+    __slots__ = ("counts", "stamps", "dids")
+
+    def __init__(self, buckets: int):
+        self.counts = array("I", bytes(4 * buckets))
+        self.stamps = array("q", [-1] * buckets)
+        # DID -> last bucket it was called in (insertion order = recency)
+        self.dids: Dict[str, int] = {}
+
+
+class CallerVelocity:
+    """Sliding-window call and distinct-DID counters per caller number"""
+
+    def __init__(self, window_seconds: int, buckets: int, max_calls: int, max_dids: int, max_callers: int):
+        self.window_seconds = window_seconds
+        self.buckets = max(1, buckets)
+        self.bucket_seconds = max(window_seconds / self.buckets, 0.001)
+        self.max_calls = max_calls
+        self.max_dids = max_dids
+        self.max_callers = max_callers
+        self._callers: "OrderedDict[str, _CallerWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.flagged = 0
+
+    def _bucket(self, now: Optional[float]) -> int:
+        return int((time.monotonic() if now is None else now) // self.bucket_seconds)
+
+    def record(self, caller: str, did: str, now: Optional[float] = None) -> None:
+        """Count one call from caller to did"""
+        if not caller or not caller.startswith("+"):
+            return  # anonymous / withheld numbers are not one caller
+        bucket = self._bucket(now)
+        slot = bucket % self.buckets
+        with self._lock:
+            window = self._callers.get(caller)
+            if window is None:
+                window = self._callers[caller] = _CallerWindow(self.buckets)
+                while len(self._callers) > self.max_callers:
+                    self._callers.popitem(last=False)
+            else:
+                self._callers.move_to_end(caller)
+
+            if window.stamps[slot] != bucket:
+                window.stamps[slot] = bucket
+                window.counts[slot] = 0
+            window.counts[slot] += 1
+
+            if did:
+                window.dids.pop(did, None)
+                window.dids[did] = bucket
+                # Only need to know whether max_dids was reached
+                while len(window.dids) > self.max_dids + 1:
+                    window.dids.pop(next(iter(window.dids)))
+            self.recorded += 1
+
+    def counts(self, caller: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """(calls, distinct DIDs) for caller within the window"""
+        window = self._callers.get(caller)
+        if window is None:
+            return 0, 0
+        oldest = self._bucket(now) - self.buckets + 1
+        calls = sum(c for c, s in zip(window.counts, window.stamps) if s >= oldest)
+        dids = sum(1 for b in window.dids.values() if b >= oldest)
+        return calls, dids
+
+    def score(self, caller: str, now: Optional[float] = None) -> int:
+        """
+        100 once either threshold is reached. Approaching one (over half way)
+        gives at most 49, enough to tip a call that other signals already
+        find suspicious but never a block on its own.
+        """
+        calls, dids = self.counts(caller, now)
+        ratio = max(
+            calls / self.max_calls if self.max_calls else 0,
+            dids / self.max_dids if self.max_dids else 0,
+        )
+        if ratio >= 1:
+            self.flagged += 1
+            return 100
+        if ratio < 0.5:
+            return 0
+        return int(ratio * 50)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "window_seconds": self.window_seconds,
+            "max_calls": self.max_calls,
+            "max_dids": self.max_dids,
+            "tracked_callers": len(self._callers),
+            "recorded": self.recorded,
+            "flagged": self.flagged,
+        }
+
+
+caller_velocity = CallerVelocity(
+    window_seconds=settings.VELOCITY_WINDOW_SECONDS,
+    buckets=settings.VELOCITY_BUCKETS,
+    max_calls=settings.VELOCITY_MAX_CALLS,
+    max_dids=settings.VELOCITY_MAX_DIDS,
+    max_callers=settings.VELOCITY_MAX_CALLERS,
+)
@@ -0,0 +1,190 @@
+"""
+Campaign Dispatcher
+
+Paces a campaign's recipients with token buckets rather than fixed clock
+windows, so a minute's quota is spread over the minute instead of going
+out in one burst:
+
+    per campaign     - calls_per_minute and calls_per_hour, as two nested
+                       buckets (a recipient needs a token from both)
+    per from-number  - CAMPAIGN_FROM_NUMBER_PER_MINUTE / _PER_HOUR, shared by
+                       every campaign dialing from the same number
+    per account      - CAMPAIGN_ACCOUNT_PER_MINUTE / _PER_HOUR, shared by
+                       every campaign of the same user
+    concurrency      - at most concurrent_calls recipients in flight (voice
+                       and SMS alike)
+
+Buckets hold CAMPAIGN_DISPATCH_BURST tokens at most, so sends go out at the
+stricter of the limits, evenly spaced (calls_per_minute=10, calls_per_hour=100
+is one send every 36 seconds, not ten a minute until the hour's quota is
+gone), and resume at that pace after a pause. A campaign runs on one
+worker at a time (see services/jobs), so its own buckets are exact.
+
+The shared buckets (from-number, account) are per process, not global:
+each job worker process (JOB_WORKER_PROCESSES per worker service, plus the
+web app when JOB_EMBEDDED_CONCURRENCY > 0) keeps its own, so campaigns
+sharing a number or an account but running in different processes can
+together send up to the limit times the number of processes. Set the
+CAMPAIGN_FROM_NUMBER_* / CAMPAIGN_ACCOUNT_* limits with that in mind.
+
+The campaign's status is read once per CAMPAIGN_DISPATCH_TICK_SECONDS, not
+per recipient, in a worker thread; pausing stops dispatch within a tick.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.bulk_campaign import BulkCampaign, CampaignStatus
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """per_period tokens every period seconds, refilled continuously, holding at most burst"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, per_period: float, period: float, burst: float = 1):
+        self.rate = per_period / period
+        self.capacity = max(1.0, min(float(burst), float(per_period)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Throttle:
+    """Nested buckets: a send needs a token from every one of them"""
+
+    def __init__(self, buckets: Iterable[TokenBucket]):
+        self.buckets = list(buckets)
+
+    def delay(self, now: float) -> float:
+        return max((b.delay(now) for b in self.buckets), default=0.0)
+
+    def take(self, now: float) -> None:
+        for bucket in self.buckets:
+            bucket.take(now)
+
+
+def build_throttle(per_minute: int, per_hour: int, burst: float) -> Optional[Throttle]:
+    """Per-minute and per-hour buckets; a limit <= 0 is no limit"""
+    buckets = []
+    if per_minute and per_minute > 0:
+        buckets.append(TokenBucket(per_minute, 60, burst))
+    if per_hour and per_hour > 0:
+        buckets.append(TokenBucket(per_hour, 3600, burst))
+    return Throttle(buckets) if buckets else None
+
+
+_shared: Dict[str, Optional[Throttle]] = {}
+
+
+def shared_throttle(key: str, per_minute: int, per_hour: int) -> Optional[Throttle]:
+    """This process's throttle for key (a from-number or an account); other processes have their own"""
+    if key not in _shared:
+        _shared[key] = build_throttle(per_minute, per_hour, settings.CAMPAIGN_DISPATCH_BURST)
+    return _shared[key]
+
+
+def campaign_throttles(campaign: BulkCampaign, from_number: str) -> List[Throttle]:
+    throttles = [
+        build_throttle(campaign.calls_per_minute, campaign.calls_per_hour, settings.CAMPAIGN_DISPATCH_BURST),
+        shared_throttle(f"from:{from_number}", settings.CAMPAIGN_FROM_NUMBER_PER_MINUTE,
+                        settings.CAMPAIGN_FROM_NUMBER_PER_HOUR),
+        shared_throttle(f"account:{campaign.user_id}", settings.CAMPAIGN_ACCOUNT_PER_MINUTE,
+                        settings.CAMPAIGN_ACCOUNT_PER_HOUR),
+    ]
+    return [t for t in throttles if t is not None]
+
+
+class CampaignDispatcher:
+    """Runs dispatch(item) for each item, paced by throttles, while the campaign is running"""
+
+    def __init__(self, db: Session, campaign_id: int, throttles: List[Throttle],
+                 concurrency: int, tick: float):
+        self.db = db
+        self.campaign_id = campaign_id
+        self.throttles = throttles
+        self.tick = tick
+        self.slots = asyncio.Semaphore(max(1, concurrency))
+        self.status = CampaignStatus.RUNNING
+        self._checked = float("-inf")
+        self.dispatched = 0
+
+    def _read_status(self) -> Optional[CampaignStatus]:
+        return self.db.query(BulkCampaign.status).filter(BulkCampaign.id == self.campaign_id).scalar()
+
+    async def _check_status(self) -> bool:
+        """At most once per tick: is the campaign still running?"""
+        now = time.monotonic()
+        if now - self._checked >= self.tick:
+            self._checked = now
+            status = await asyncio.to_thread(self._read_status)
+            self.status = status or CampaignStatus.FAILED
+        return self.status == CampaignStatus.RUNNING
+
+    def _until_check(self) -> float:
+        return max(0.0, self._checked + self.tick - time.monotonic())
+
+    async def _wait_slot(self) -> bool:
+        while await self._check_status():
+            try:
+                await asyncio.wait_for(self.slots.acquire(), max(self._until_check(), 0.01))
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    async def _wait_tokens(self) -> bool:
+        while await self._check_status():
+            now = time.monotonic()
+            delay = max((t.delay(now) for t in self.throttles), default=0.0)
+            if delay <= 0:
+                for throttle in self.throttles:
+                    throttle.take(now)
+                return True
+            await asyncio.sleep(min(delay, max(self._until_check(), 0.01)))
+        return False
+
+    async def _run_one(self, dispatch: Callable[[Any], Awaitable[None]], item: Any) -> None:
+        try:
+            await dispatch(item)
+        except Exception as e:
+            log.error("Campaign %s dispatch failed: %s", self.campaign_id, e)
+        finally:
+            self.slots.release()
+
+    async def run(self, items: Iterable[Any], dispatch: Callable[[Any], Awaitable[None]]) -> CampaignStatus:
+        """Dispatch until items run out or the campaign stops running; returns the last status seen"""
+        active = set()
+        for item in items:
+            if not await self._wait_slot():
+                break
+            if not await self._wait_tokens():
+                self.slots.release()
+                break
+            task = asyncio.create_task(self._run_one(dispatch, item))
+            active.add(task)
+            task.add_done_callback(active.discard)
+            self.dispatched += 1
+        if active:
+            await asyncio.gather(*active)
+        return self.status
@@ -0,0 +1,225 @@
+"""
+Campaign Progress Stream
+
+Live recipient counts for running campaigns, pushed to the campaign UI over
+Server-Sent Events instead of polled COUNT queries.
+
+The dispatcher reports every recipient transition here (move(), in
+memory). Every CAMPAIGN_PROGRESS_TICK_SECONDS the campaigns that changed
+are published as one "campaign_progress" snapshot each on the dashboard
+event bus, keyed per campaign so snapshots waiting for a slow viewer
+coalesce. Each SSE stream subscribes to the bus for the campaign's owner
+and sends only the fields that changed since its previous event:
+
+    event: snapshot     full counts when the stream opens
+    event: progress     changed fields only, at most once per tick
+    event: done         final counts once the campaign stops running
+
+A stream costs one database read when it opens, and none when the campaign
+is being dispatched by this process. With DASHBOARD_PUBSUB_BACKEND=redis
+snapshots published by any worker reach every stream; without it, a stream
+whose campaign runs in another process (the job worker) re-reads the
+counts from the database every CAMPAIGN_PROGRESS_HEARTBEAT_SECONDS of
+silence, so it still progresses and sends "done".
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.bulk_campaign import BulkCampaign, CampaignRecipient, CampaignStatus, RecipientStatus
+from app.services.event_bus import event_bus
+
+log = logging.getLogger(__name__)
+
+EVENT_TYPE = "campaign_progress"
+COUNT_FIELDS = ("pending", "in_progress", "completed", "failed", "success")
+# Streams end on these; the hub also forgets paused campaigns (dispatch restarts on resume)
+TERMINAL_STATUSES = {CampaignStatus.COMPLETED.value, CampaignStatus.FAILED.value}
+UNTRACKED_STATUSES = TERMINAL_STATUSES | {CampaignStatus.PAUSED.value}
+
+
+def _value(status: Any) -> str:
+    return getattr(status, "value", status)
+
+
+def load_snapshot(campaign_id: int) -> Optional[Dict[str, Any]]:
+    """Counts straight from the database (one grouped COUNT); None if no such campaign"""
+    db = SessionLocal()
+    try:
+        campaign = db.query(BulkCampaign).filter(BulkCampaign.id == campaign_id).first()
+        if campaign is None:
+            return None
+        counts = {
+            _value(status): n
+            for status, n in db.query(CampaignRecipient.status, func.count(CampaignRecipient.id))
+            .filter(CampaignRecipient.campaign_id == campaign_id)
+            .group_by(CampaignRecipient.status)
+        }
+        return {
+            "campaign_id": campaign_id,
+            "user_id": campaign.user_id,
+            "status": _value(campaign.status),
+            "total": campaign.total_recipients or 0,
+            "pending": counts.get(RecipientStatus.PENDING.value, 0),
+            "in_progress": counts.get(RecipientStatus.IN_PROGRESS.value, 0),
+            "completed": counts.get(RecipientStatus.COMPLETED.value, 0),
+            "failed": counts.get(RecipientStatus.FAILED.value, 0),
+            "success": campaign.success_count or 0,
+            "cost": float(campaign.actual_cost or 0.0),
+        }
+    finally:
+        db.close()
+
+
+class CampaignProgressHub:
+    """In-memory counts of the campaigns dispatched by this process"""
+
+    def __init__(self, tick: float):
+        self.tick = tick
+        self._campaigns: Dict[int, Dict[str, Any]] = {}
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+
+    def track(self, snapshot: Dict[str, Any]) -> None:
+        """Start following a campaign from a load_snapshot() result"""
+        self._campaigns[snapshot["campaign_id"]] = dict(snapshot)
+        self._dirty.add(snapshot["campaign_id"])
+
+    def snapshot(self, campaign_id: int) -> Optional[Dict[str, Any]]:
+        state = self._campaigns.get(campaign_id)
+        return dict(state) if state is not None else None
+
+    def move(self, campaign_id: int, old: Any, new: Any, success: bool = False, cost: float = 0.0) -> None:
+        """One recipient went from status old to new"""
+        state = self._campaigns.get(campaign_id)
+        if state is None:
+            return
+        old, new = _value(old), _value(new)
+        if old in state:
+            state[old] = max(0, state[old] - 1)
+        if new in state:
+            state[new] += 1
+        if success:
+            state["success"] += 1
+        state["cost"] += cost
+        self._dirty.add(campaign_id)
+
+    def set_status(self, campaign_id: int, status: Any, **counts: Any) -> None:
+        state = self._campaigns.get(campaign_id)
+        if state is None:
+            return
+        state["status"] = _value(status)
+        state.update(counts)
+        self._dirty.add(campaign_id)
+
+    def flush(self) -> int:
+        """Publish every campaign that changed since the last tick"""
+        dirty, self._dirty = self._dirty, set()
+        for campaign_id in dirty:
+            state = self._campaigns.get(campaign_id)
+            if state is None:
+                continue
+            event_bus.publish(state["user_id"], EVENT_TYPE, dict(state), key=f"{EVENT_TYPE}:{campaign_id}")
+            self.published += 1
+            if state["status"] in UNTRACKED_STATUSES:
+                del self._campaigns[campaign_id]
+        return len(dirty)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="campaign-progress")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("Campaign progress publish failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"campaigns": len(self._campaigns), "tick_seconds": self.tick, "published": self.published}
+
+
+campaign_progress = CampaignProgressHub(tick=settings.CAMPAIGN_PROGRESS_TICK_SECONDS)
+
+
+# ============================================
+# SSE
+# ============================================
+
+class _ProgressSink:
+    """Event bus subscriber that keeps one campaign's snapshots"""
+
+    def __init__(self, campaign_id: int):
+        self.campaign_id = campaign_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def send_json(self, event: Dict[str, Any]) -> None:
+        if event.get("type") == EVENT_TYPE and event["data"].get("campaign_id") == self.campaign_id:
+            self.queue.put_nowait(event["data"])
+
+    async def close(self, code: Optional[int] = None) -> None:
+        self.queue.put_nowait(None)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+def _public(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in state.items() if k != "user_id"}
+
+
+async def progress_events(snapshot: Dict[str, Any]) -> AsyncIterator[str]:
+    """SSE stream for one campaign, starting from snapshot"""
+    campaign_id = snapshot["campaign_id"]
+    sink = _ProgressSink(campaign_id)
+    subscriber = await event_bus.attach(sink, snapshot["user_id"])
+    try:
+        # The dispatcher may have moved on while the snapshot was being read
+        latest = campaign_progress.snapshot(campaign_id) or snapshot
+        last = _public(latest)
+        yield f"retry: {int(settings.CAMPAIGN_PROGRESS_TICK_SECONDS * 1000)}\n" + _sse("snapshot", last)
+        while last["status"] not in TERMINAL_STATUSES:
+            try:
+                state = await asyncio.wait_for(sink.queue.get(), settings.CAMPAIGN_PROGRESS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Quiet bus: another process may be dispatching and the in-memory bus never hears
+                # about it, so fall back to the database once per heartbeat
+                if campaign_progress.snapshot(campaign_id) is not None:
+                    yield ": keepalive\n\n"
+                    continue
+                state = await asyncio.to_thread(load_snapshot, campaign_id)
+                if state is None:
+                    break  # campaign deleted
+                if _public(state) == last:
+                    yield ": keepalive\n\n"
+                    continue
+            else:
+                if state is None:
+                    break  # dropped by the bus (too slow) or shutting down
+            state = _public(state)
+            delta = {k: v for k, v in state.items() if last.get(k) != v}
+            last = state
+            if delta:
+                delta["campaign_id"] = campaign_id
+                yield _sse("progress", delta)
+        yield _sse("done", last)
+    finally:
+        event_bus.disconnect(subscriber)
@@ -3,11 +3,14 @@ Updated Client Config Service - Database-driven
 Replace: app/services/client_config.py
 Reads RootCall configuration from database instead of hardcoded CLIENT_LINES
 """
-from typing import Dict, Optional
+from typing import Dict, Mapping, Optional
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models.rootcall_config import RootCallConfig
 from app.models.phone_number import PhoneNumber
+from app.services.config_cache import config_cache, freeze_config
+from app.services import trusted_contacts as trusted_index
+from app.services.phone_numbers import normalize_e164
 import logging
 
 log = logging.getLogger("rootcall")
@@ -24,23 +27,47 @@ CLIENT_LINES: Dict[str, Dict] = {
     }
 }
 
-def get_client_config(telnyx_number: str, db: Session = None) -> Optional[Dict]:
+def _normalize_did(telnyx_number: str) -> str:
+    normalized = normalize_e164(telnyx_number)
+    if normalized:
+        return normalized
+    # Not a valid number - keep the old "+digits" key so lookups still miss cleanly
+    normalized = (telnyx_number or "").strip()
+    if not normalized.startswith("+"):
+        normalized = f"+{normalized}"
+    return normalized
+
+
+def invalidate_client_config(telnyx_number: str) -> None:
+    """Drop the cached config for a DID (call after any write to its PhoneNumber/RootCallConfig)"""
+    config_cache.invalidate(_normalize_did(telnyx_number))
+
+
+def get_client_config(telnyx_number: str, db: Session = None) -> Optional[Mapping]:
     """
     Get RootCall configuration for a phone number
-    First checks database, falls back to hardcoded CLIENT_LINES for backward compatibility
+    Served from the in-memory config cache; on a miss checks the database,
+    then falls back to hardcoded CLIENT_LINES for backward compatibility
     
     Args:
         telnyx_number: The phone number to look up (e.g., "+18135478218")
         db: Optional database session (creates one if not provided)
     
     Returns:
-        Dict with configuration or None if not found
+        Read-only config mapping or None if not found
     """
-    # Normalize phone number
-    normalized = telnyx_number.strip()
-    if not normalized.startswith("+"):
-        normalized = f"+{normalized}"
+    normalized = _normalize_did(telnyx_number)
+    
+    hit, cached = config_cache.get(normalized)
+    if hit:
+        return cached
     
+    config = _load_client_config(normalized, db)
+    config_cache.set(normalized, config)
+    return config
+
+
+def _load_client_config(normalized: str, db: Session = None) -> Optional[Mapping]:
     # Try database first
     should_close_db = False
     if db is None:
@@ -62,11 +89,14 @@ def get_client_config(telnyx_number: str, db: Session = None) -> Optional[Dict]:
             if config:
                 # Convert database model to dict format expected by screening logic
                 result = {
+                    "phone_number_id": phone.id,
+                    "user_id": config.user_id,
                     "client_cell": config.client_cell,
                     "client_name": config.client_name,
                     "retell_agent_id": config.retell_agent_id,
                     "retell_did": config.retell_did,
-                    "trusted_contacts": config.trusted_contacts or [],
+                    # frozenset -> O(1) membership test in screening
+                    "trusted_contacts": trusted_index.load_trusted_set(db, config),
                     "caregiver_cell": config.caregiver_cell or "",
                     "sms_alerts_enabled": config.sms_alerts_enabled,
                     "alert_on_spam": config.alert_on_spam,
@@ -74,7 +104,7 @@ def get_client_config(telnyx_number: str, db: Session = None) -> Optional[Dict]:
                     "auto_block_spam": config.auto_block_spam,
                 }
                 log.info(f"[DB CONFIG] Loaded config for {normalized}: {config.client_name}")
-                return result
+                return freeze_config(result)
             else:
                 log.warning(f"[DB CONFIG] No RootCall config found for phone {phone.id}")
                 
@@ -87,61 +117,44 @@ def get_client_config(telnyx_number: str, db: Session = None) -> Optional[Dict]:
     # Fallback to hardcoded config for backward compatibility
     if normalized in CLIENT_LINES:
         log.info(f"[HARDCODED CONFIG] Using fallback config for {normalized}")
-        return CLIENT_LINES[normalized]
+        fallback = dict(CLIENT_LINES[normalized])
+        fallback["trusted_contacts"] = trusted_index.trusted_set_from_list(fallback.get("trusted_contacts"))
+        return freeze_config(fallback)
     
     log.warning(f"[CONFIG] No configuration found for {normalized}")
     return None
 
-def get_trusted_contacts(telnyx_number: str, db: Session = None) -> list:
-    """Get list of trusted phone numbers for a given Telnyx number"""
+def get_trusted_contacts(telnyx_number: str, db: Session = None) -> frozenset:
+    """Get the set of trusted (E.164) phone numbers for a given Telnyx number"""
     config = get_client_config(telnyx_number, db)
     if config:
-        return config.get("trusted_contacts", [])
-    return []
+        return config.get("trusted_contacts", frozenset())
+    return frozenset()
 
 def is_trusted_contact(telnyx_number: str, caller_number: str, db: Session = None) -> bool:
     """Check if a caller is on the trusted contact list"""
-    trusted = get_trusted_contacts(telnyx_number, db)
-    
-    # Normalize caller number
-    caller_normalized = caller_number.strip()
-    if not caller_normalized.startswith("+"):
-        caller_normalized = f"+{caller_normalized}"
-    
-    return caller_normalized in trusted
+    caller_normalized = normalize_e164(caller_number)
+    return caller_normalized is not None and caller_normalized in get_trusted_contacts(telnyx_number, db)
+
+def _get_config_for_did(telnyx_number: str, db: Session) -> Optional[RootCallConfig]:
+    phone = db.query(PhoneNumber).filter(
+        PhoneNumber.phone_number == _normalize_did(telnyx_number)
+    ).first()
+    if not phone:
+        return None
+    return db.query(RootCallConfig).filter(
+        RootCallConfig.phone_number_id == phone.id
+    ).first()
 
 def add_trusted_contact(telnyx_number: str, contact_number: str, db: Session) -> bool:
     """Add a number to the trusted contacts list"""
     try:
-        phone = db.query(PhoneNumber).filter(
-            PhoneNumber.phone_number == telnyx_number
-        ).first()
-        
-        if not phone:
-            return False
-            
-        config = db.query(RootCallConfig).filter(
-            RootCallConfig.phone_number_id == phone.id
-        ).first()
-        
+        config = _get_config_for_did(telnyx_number, db)
         if not config:
             return False
-        
-        # Normalize contact number
-        contact_normalized = contact_number.strip()
-        if not contact_normalized.startswith("+"):
-            contact_normalized = f"+{contact_normalized}"
-        
-        # Add to list if not already there
-        if config.trusted_contacts is None:
-            config.trusted_contacts = []
-            
-        if contact_normalized not in config.trusted_contacts:
-            config.trusted_contacts.append(contact_normalized)
-            db.commit()
-            log.info(f"[CONFIG] Added trusted contact {contact_normalized} for {telnyx_number}")
+        if trusted_index.add_trusted_contact(db, config, contact_number):
+            log.info(f"[CONFIG] Added trusted contact {contact_number} for {telnyx_number}")
             return True
-            
         return False
         
     except Exception as e:
@@ -152,32 +165,12 @@ def add_trusted_contact(telnyx_number: str, contact_number: str, db: Session) ->
 def remove_trusted_contact(telnyx_number: str, contact_number: str, db: Session) -> bool:
     """Remove a number from the trusted contacts list"""
     try:
-        phone = db.query(PhoneNumber).filter(
-            PhoneNumber.phone_number == telnyx_number
-        ).first()
-        
-        if not phone:
-            return False
-            
-        config = db.query(RootCallConfig).filter(
-            RootCallConfig.phone_number_id == phone.id
-        ).first()
-        
+        config = _get_config_for_did(telnyx_number, db)
         if not config:
             return False
-        
-        # Normalize contact number
-        contact_normalized = contact_number.strip()
-        if not contact_normalized.startswith("+"):
-            contact_normalized = f"+{contact_normalized}"
-        
-        # Remove from list
-        if config.trusted_contacts and contact_normalized in config.trusted_contacts:
-            config.trusted_contacts.remove(contact_normalized)
-            db.commit()
-            log.info(f"[CONFIG] Removed trusted contact {contact_normalized} for {telnyx_number}")
+        if trusted_index.remove_trusted_contact(db, config, contact_number):
+            log.info(f"[CONFIG] Removed trusted contact {contact_number} for {telnyx_number}")
             return True
-            
         return False
         
     except Exception as e:
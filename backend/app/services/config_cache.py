@@ -0,0 +1,191 @@
+"""
+Routing Config Cache
+
+In-memory cache of RootCall routing config, keyed by normalized DID, so the
+screening hot path (call.initiated / call.answered / call.gather.ended)
+never touches the database for config.
+
+Entries are immutable snapshots (MappingProxyType, tuples, frozensets) so no caller can
+mutate shared state. Every write path calls invalidate(did); when
+CONFIG_INVALIDATION_BACKEND=redis the invalidation is also published so
+the other uvicorn/gunicorn workers drop their copy. A TTL bounds staleness
+if a write path ever forgets to invalidate.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from app.config import settings
+
+log = logging.getLogger("rootcall")
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency
+    aioredis = None
+
+INVALIDATE_ALL = "*"
+
+
+def freeze_config(config: Dict[str, Any]) -> Mapping[str, Any]:
+    """Return a read-only snapshot of a config dict"""
+    frozen = {
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in config.items()
+    }
+    return MappingProxyType(frozen)
+
+
+class ConfigCache:
+    """DID -> immutable config snapshot (None = known to have no config)"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Optional[Mapping[str, Any]]]] = {}
+        self._bus: Optional["RedisInvalidationBus"] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, did: str) -> Tuple[bool, Optional[Mapping[str, Any]]]:
+        entry = self._entries.get(did)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[1]
+
+    def set(self, did: str, config: Optional[Mapping[str, Any]]) -> None:
+        self._entries[did] = (time.monotonic() + self.ttl, config)
+
+    def invalidate(self, did: str, publish: bool = True) -> None:
+        self.invalidations += 1
+        if did == INVALIDATE_ALL:
+            self._entries.clear()
+        else:
+            self._entries.pop(did, None)
+        if publish and self._bus is not None:
+            self._bus.publish(did)
+
+    def clear(self, publish: bool = True) -> None:
+        self.invalidate(INVALIDATE_ALL, publish=publish)
+
+    def attach_bus(self, bus: Optional["RedisInvalidationBus"]) -> None:
+        self._bus = bus
+
+    def detach_bus(self) -> Optional["RedisInvalidationBus"]:
+        bus, self._bus = self._bus, None
+        return bus
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "pubsub": self._bus is not None,
+        }
+
+
+class RedisInvalidationBus:
+    """
+    Cross-worker invalidation over Redis pub/sub. publish() only queues the
+    DID (it runs in request handlers and in after_commit hooks, which must
+    not wait on Redis); a task on the app's event loop sends them.
+    """
+
+    def __init__(self, url: str, channel: str):
+        if aioredis is None:
+            raise RuntimeError("redis package not installed (pip install redis)")
+        self.url = url
+        self.channel = channel
+        self._publisher = aioredis.from_url(url, decode_responses=True)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def publish(self, did: str) -> None:
+        """Queue an invalidation for the other workers; never blocks, safe from any thread"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._pending.put_nowait, did)
+        except RuntimeError:  # loop already closed (shutdown)
+            log.warning("[CONFIG CACHE] Dropped invalidation for %s, event loop closed", did)
+
+    async def _send(self, did: str) -> None:
+        try:
+            await self._publisher.publish(self.channel, did)
+        except Exception as e:
+            log.error("[CONFIG CACHE] Invalidation publish failed for %s: %s", did, e)
+
+    async def _publish_pending(self) -> None:
+        while True:
+            await self._send(await self._pending.get())
+
+    def start(self, cache: ConfigCache) -> None:
+        if self._tasks and not all(task.done() for task in self._tasks):
+            return
+        self._loop = asyncio.get_running_loop()
+        self._pending = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._listen(cache), name="config-cache-invalidation"),
+            asyncio.create_task(self._publish_pending(), name="config-cache-publish"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Send what was queued before shutdown
+        while self._pending is not None and not self._pending.empty():
+            await self._send(self._pending.get_nowait())
+        self._loop = None
+        await self._publisher.close()
+
+    async def _listen(self, cache: ConfigCache) -> None:
+        while True:
+            client = aioredis.from_url(self.url, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Anything may have changed while we were not subscribed
+                cache.clear(publish=False)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        cache.invalidate(message["data"], publish=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("[CONFIG CACHE] Invalidation listener error: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+
+config_cache = ConfigCache(ttl=settings.CONFIG_CACHE_TTL_SECONDS)
+
+
+async def start_config_cache() -> None:
+    if settings.CONFIG_INVALIDATION_BACKEND != "redis":
+        return
+    try:
+        bus = RedisInvalidationBus(settings.REDIS_URL, settings.CONFIG_INVALIDATION_CHANNEL)
+    except Exception as e:
+        log.error("[CONFIG CACHE] Redis pub/sub unavailable (%s), local invalidation only", e)
+        return
+    config_cache.attach_bus(bus)
+    bus.start(config_cache)
+
+
+async def stop_config_cache() -> None:
+    bus = config_cache.detach_bus()
+    if bus is not None:
+        await bus.stop()
@@ -0,0 +1,422 @@
+"""
+Live Dashboard Event Bus
+
+Webhooks publish call lifecycle events here; every dashboard WebSocket of
+the call's user gets them.
+
+publish() never awaits a socket. Each connection has its own sender task
+and a bounded backlog, so one slow browser can't hold up the webhook or the
+other dashboards:
+
+    coalescing - events with the same key (e.g. the same call) replace the
+                 one still waiting in the backlog instead of queuing behind
+                 it; a dashboard only needs the latest state of a call
+    backpressure - a client whose backlog reaches WS_QUEUE_SIZE, or whose
+                 socket doesn't accept a frame within WS_SEND_TIMEOUT_SECONDS,
+                 is disconnected (close code 1013, try again later)
+    liveness   - an idle connection is pinged every WS_PING_SECONDS, and any
+                 failed send removes the connection
+
+All sends on a socket go through its sender task (replies to client pings
+too), so frames are never written concurrently.
+
+Events travel over a pub/sub backend with one channel per user_id, and a
+worker only subscribes to the users that have a dashboard open on it:
+
+    memory - in-process, delivered straight to this worker's sockets
+             (DASHBOARD_PUBSUB_BACKEND=memory, the default)
+    redis  - PUBLISH on DASHBOARD_PUBSUB_PREFIX<user_id>; every worker
+             holding a socket for that user receives it, so a webhook
+             handled by one worker reaches dashboards on all of them
+             (redis from infrastructure/docker-compose.yml works locally)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency
+    aioredis = None
+
+# Close code for clients that can't keep up
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+def make_event(event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": event_type, "data": data, "timestamp": datetime.utcnow().isoformat()}
+
+
+class Subscriber:
+    """One dashboard connection: coalescing backlog + sender task"""
+
+    def __init__(self, bus: "EventBus", websocket: WebSocket, user_id: int):
+        self.bus = bus
+        self.websocket = websocket
+        self.user_id = user_id
+        self._pending: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._seq = 0
+        self.closed = False
+        self.sent = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._send_loop(), name=f"ws-sender-{self.user_id}")
+
+    def offer(self, event: Dict[str, Any], key: Optional[str] = None) -> bool:
+        """Queue event; False if the client is too far behind and was dropped"""
+        if self.closed:
+            return False
+        if key is not None and key in self._pending:
+            # Coalesce: keep the slot (and order) of the older event, send the newer state
+            self._pending[key] = event
+            self.bus.coalesced += 1
+            return True
+        if len(self._pending) >= self.bus.queue_size:
+            self.bus.dropped_clients += 1
+            log.warning("Dropping slow dashboard client for user %s (%s events behind)",
+                        self.user_id, len(self._pending))
+            self.close(CLOSE_TRY_AGAIN_LATER)
+            return False
+        if key is None:
+            self._seq += 1
+            key = ("_", self._seq)
+        self._pending[key] = event
+        self._wakeup.set()
+        return True
+
+    async def _send_loop(self) -> None:
+        try:
+            while not self.closed:
+                if not self._pending:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.bus.ping_seconds)
+                    except asyncio.TimeoutError:
+                        self._pending[("_ping",)] = make_event("ping", {})
+                    continue
+                _, event = self._pending.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_json(event), self.bus.send_timeout)
+                self.sent += 1
+                self.bus.delivered += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Timed out or the socket is gone
+            log.info("Dashboard socket for user %s closed: %s", self.user_id, e or type(e).__name__)
+        finally:
+            self.close()
+
+    def close(self, code: Optional[int] = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        self.bus._remove(self)
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.bus.send_timeout)
+        except Exception:
+            pass
+
+
+# ============================================
+# PUB/SUB BACKENDS
+# ============================================
+
+class MemoryPubSub:
+    """Single worker: publish delivers straight to the local sockets"""
+
+    def __init__(self, deliver=None):
+        self._deliver = deliver
+
+    async def start(self, deliver) -> None:
+        self._deliver = deliver
+
+    def publish(self, user_id: int, event: Dict[str, Any], key: Optional[str]) -> None:
+        if self._deliver is not None:
+            self._deliver(user_id, event, key)
+
+    async def subscribe(self, user_id: int) -> None:
+        pass
+
+    def unsubscribe(self, user_id: int) -> None:
+        pass
+
+    async def close(self) -> None:
+        self._deliver = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory"}
+
+
+class RedisPubSub:
+    """
+    One Redis channel per user. Publishes are queued and sent in pipelined
+    batches by a background task, so publish() stays non-blocking; one
+    subscriber connection per worker listens on the channels of its
+    connected users.
+    """
+
+    def __init__(self, url: str, prefix: str, max_pending: int = 10000):
+        if aioredis is None:
+            raise RuntimeError("redis package not installed (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._users: Set[int] = set()
+        self._pubsub = None
+        self._subscribed = asyncio.Event()
+        self._deliver = None
+        self._tasks: list = []
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def channel(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def start(self, deliver) -> None:
+        self._deliver = deliver
+        self._tasks = [
+            asyncio.create_task(self._publish_loop(), name="dashboard-pubsub-publish"),
+            asyncio.create_task(self._listen(), name="dashboard-pubsub-listen"),
+        ]
+
+    def publish(self, user_id: int, event: Dict[str, Any], key: Optional[str]) -> None:
+        try:
+            self._outbox.put_nowait((self.channel(user_id), json.dumps({"event": event, "key": key}, default=str)))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("Dashboard pub/sub backlog full, dropping event for user %s", user_id)
+
+    async def _publish_loop(self) -> None:
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty() and len(batch) < 500:
+                batch.append(self._outbox.get_nowait())
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for channel, payload in batch:
+                        pipe.publish(channel, payload)
+                    await pipe.execute()
+                self.published += len(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.dropped += len(batch)
+                log.error("Dashboard pub/sub publish failed (%s events): %s", len(batch), e)
+                await asyncio.sleep(1)
+
+    async def subscribe(self, user_id: int) -> None:
+        self._users.add(user_id)
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.subscribe(self.channel(user_id))
+                self._subscribed.set()
+            except Exception as e:
+                # The listener resubscribes every connected user when it reconnects
+                self.errors += 1
+                log.error("Dashboard pub/sub subscribe failed for user %s: %s", user_id, e)
+
+    def unsubscribe(self, user_id: int) -> None:
+        self._users.discard(user_id)
+        asyncio.create_task(self._unsubscribe(user_id))
+
+    async def _unsubscribe(self, user_id: int) -> None:
+        # Skip if the user reconnected in the meantime
+        if user_id in self._users or self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(self.channel(user_id))
+        except Exception as e:
+            self.errors += 1
+            log.error("Dashboard pub/sub unsubscribe failed for user %s: %s", user_id, e)
+
+    async def _listen(self) -> None:
+        while True:
+            client = aioredis.from_url(self.url, decode_responses=True)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                users = set(self._users)
+                if users:
+                    await pubsub.subscribe(*(self.channel(u) for u in users))
+                self._pubsub = pubsub
+                # Users that connected while we were subscribing
+                missing = self._users - users
+                if missing:
+                    await pubsub.subscribe(*(self.channel(u) for u in missing))
+                while True:
+                    if not pubsub.subscribed:
+                        # get_message needs at least one channel
+                        self._subscribed.clear()
+                        await self._subscribed.wait()
+                        continue
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    self.received += 1
+                    user_id = int(message["channel"][len(self.prefix):])
+                    body = json.loads(message["data"])
+                    self._deliver(user_id, body["event"], body.get("key"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                log.error("Dashboard pub/sub listener error: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                self._pubsub = None
+                await pubsub.close()
+                await client.close()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._redis.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "channels": len(self._users),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def _build_backend():
+    if settings.DASHBOARD_PUBSUB_BACKEND == "redis":
+        try:
+            return RedisPubSub(settings.REDIS_URL, settings.DASHBOARD_PUBSUB_PREFIX)
+        except Exception as e:
+            log.error("Dashboard Redis pub/sub unavailable (%s), events stay on this worker", e)
+    return MemoryPubSub()
+
+
+# ============================================
+# BUS
+# ============================================
+
+class EventBus:
+    def __init__(self, queue_size: int, send_timeout: float, ping_seconds: float):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.ping_seconds = ping_seconds
+        self.backend = MemoryPubSub(self.deliver)
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped_clients = 0
+
+    async def start(self, backend=None) -> None:
+        """Attach the pub/sub backend (memory unless configured otherwise)"""
+        self.backend = backend or _build_backend()
+        await self.backend.start(self.deliver)
+        for user_id in self._subscribers:
+            await self.backend.subscribe(user_id)
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> Subscriber:
+        await websocket.accept()
+        return await self.attach(websocket, user_id)
+
+    async def attach(self, sink: Any, user_id: int) -> Subscriber:
+        """Subscribe anything with async send_json(event) / close(code) (e.g. an SSE stream)"""
+        subscriber = Subscriber(self, sink, user_id)
+        first = user_id not in self._subscribers
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        subscriber.start()
+        if first:
+            await self.backend.subscribe(user_id)
+        log.info("Dashboard subscriber connected for user %s", user_id)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        subscriber.close()
+
+    def _remove(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+                self.backend.unsubscribe(subscriber.user_id)
+                log.info("Last dashboard subscriber disconnected for user %s", subscriber.user_id)
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: Optional[int], event_type: str, data: Dict[str, Any],
+                key: Optional[str] = None) -> None:
+        """
+        Publish an event to every dashboard of user_id, on any worker.
+        Events with the same key coalesce while they wait. Event loop only.
+        """
+        if user_id is None:
+            return
+        self.published += 1
+        self.backend.publish(user_id, make_event(event_type, data), key)
+
+    def deliver(self, user_id: int, event: Dict[str, Any], key: Optional[str] = None) -> int:
+        """Hand an event to this worker's connections of user_id; returns how many took it"""
+        subscribers = self._subscribers.get(user_id)
+        if not subscribers:
+            return 0
+        return sum(1 for s in list(subscribers) if s.offer(event, key))
+
+    async def close(self) -> None:
+        """Disconnect everyone and detach the backend (shutdown)"""
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                subscriber.close(1001)  # going away
+        await self.backend.close()
+        self.backend = MemoryPubSub(self.deliver)
+        await asyncio.sleep(0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped_clients": self.dropped_clients,
+            "pubsub": self.backend.stats(),
+        }
+
+
+event_bus = EventBus(
+    queue_size=settings.WS_QUEUE_SIZE,
+    send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+    ping_seconds=settings.WS_PING_SECONDS,
+)
+
+
+def publish_call_event(user_id: Optional[int], call_control_id: Optional[str], status: str, **fields: Any) -> None:
+    """call_update for one call; updates for the same call coalesce"""
+    data = {"call_id": call_control_id, "status": status, **fields}
+    event_bus.publish(user_id, "call_update", data, key=f"call_update:{call_control_id}")
@@ -0,0 +1,170 @@
+"""
+Streaming Exports
+
+One export engine for call logs, campaign recipients and usage. Rows are
+read from a server-side cursor (yield_per, EXPORT_BATCH_SIZE rows at a
+time) and encoded batch by batch inside a generator, so memory stays flat
+however many rows are exported and the first bytes go out as soon as the
+first batch is fetched.
+
+Formats:
+    csv     - text/csv with a header row
+    csv.gz  - the same CSV, gzip-compressed on the fly
+    ndjson  - one JSON object per line
+
+The generator opens and closes its own session: StreamingResponse iterates
+it after the endpoint (and its request-scoped session) has returned. An
+export can also append rows from cold storage after the database rows
+(archived=, see call_archive.iter_archived).
+"""
+from __future__ import annotations
+
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import SessionLocal
+
+# (key, CSV header, column expression); key names the NDJSON field
+ExportColumn = Tuple[str, str, Any]
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self, headers: Sequence[str]):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._writer.writerow(headers)
+
+    def encode(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        writerow = self._writer.writerow
+        for row in rows:
+            writerow(["" if v is None else _plain(v) for v in row])
+        data = self._buffer.getvalue()
+        # Reuse the buffer: only one batch is ever held in memory
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _GzipCsvEncoder(_CsvEncoder):
+    def __init__(self, headers: Sequence[str]):
+        super().__init__(headers)
+        self._gzip = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def encode(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        return self._gzip.compress(super().encode(rows))
+
+    def finish(self) -> bytes:
+        return self._gzip.flush()
+
+
+class _NdjsonEncoder:
+    def __init__(self, keys: Sequence[str]):
+        self._keys = keys
+        self._dumps = json.JSONEncoder(default=str, ensure_ascii=False).encode
+
+    def encode(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        keys = self._keys
+        lines = [self._dumps({k: _plain(v) for k, v in zip(keys, row)}) for row in rows]
+        lines.append("")
+        return "\n".join(lines).encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+def _encoder(fmt: str, columns: Sequence[ExportColumn]):
+    if fmt == "ndjson":
+        return _NdjsonEncoder([key for key, _, _ in columns])
+    headers = [header for _, header, _ in columns]
+    return _GzipCsvEncoder(headers) if fmt == "csv.gz" else _CsvEncoder(headers)
+
+
+def iter_export(
+    stmt,
+    columns: Sequence[ExportColumn],
+    fmt: str,
+    batch_size: int,
+    archived: Optional[Callable[[], Iterable[Sequence[Any]]]] = None,
+) -> Iterator[bytes]:
+    """Execute stmt with a server-side cursor and yield encoded chunks, then archived rows"""
+    encoder = _encoder(fmt, columns)
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        first = encoder.encode(())  # header row (or gzip header) without waiting for the query
+        if first:
+            yield first
+        for rows in result.partitions():
+            chunk = encoder.encode(rows)
+            if chunk:
+                yield chunk
+        if archived is not None:
+            rows = iter(archived())
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                chunk = encoder.encode(batch)
+                if chunk:
+                    yield chunk
+        tail = encoder.finish()
+        if tail:
+            yield tail
+    finally:
+        db.close()
+
+
+def export_response(
+    columns: List[ExportColumn],
+    where: Sequence[Any] = (),
+    order_by: Sequence[Any] = (),
+    fmt: str = "csv",
+    filename: str = "export",
+    batch_size: int = None,
+    archived: Optional[Callable[[], Iterable[Sequence[Any]]]] = None,
+) -> StreamingResponse:
+    """
+    StreamingResponse exporting SELECT columns WHERE ... ORDER BY ... in fmt.
+    archived, if given, returns rows (in column order) streamed after the
+    database rows.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format '{fmt}' (use {', '.join(EXPORT_FORMATS)})",
+        )
+    media_type, extension = EXPORT_FORMATS[fmt]
+    stmt = select(*(expr for _, _, expr in columns)).where(*where).order_by(*order_by)
+    return StreamingResponse(
+        iter_export(stmt, columns, fmt, batch_size or settings.EXPORT_BATCH_SIZE, archived),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{extension}"},
+    )
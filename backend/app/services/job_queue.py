@@ -0,0 +1,450 @@
+"""
+Durable Job Queue
+
+Work that outlives a request - campaign dispatch, number provisioning,
+recording transcription, appointment reminders - is stored as a row in the
+jobs table and run by worker processes (python -m app.worker), never as a
+task in a web worker's event loop. A redeploy or crash doesn't lose it:
+
+    enqueue     - adds the job to the caller's transaction, so it exists
+                  exactly when the change that asked for it is committed
+    claim       - a worker takes due jobs with a conditional UPDATE (SELECT
+                  ... FOR UPDATE SKIP LOCKED first on PostgreSQL) and leases
+                  them for JOB_LEASE_SECONDS
+    heartbeat   - a worker renews the leases of its running jobs every
+                  JOB_HEARTBEAT_SECONDS, and cancels a job whose lease it lost
+    visibility  - when a lease expires (the worker died or hung) the job can
+                  be claimed again: delivery is at-least-once, so handlers
+                  must tolerate running twice
+    retries     - a failed run is re-queued with exponential backoff from
+                  JOB_RETRY_BACKOFF_SECONDS; after max_attempts runs the job
+                  is dead and keeps its last error
+
+Handlers are registered with @job_handler(kind) (see services/jobs) and
+called as `await handler(ctx)`. ctx.db is a session owned by that run; a
+handler's return value is stored as the job's result; a long handler can
+publish interim progress there with report_progress.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.job import Job, JobStatus
+
+log = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+MAX_BACKOFF_SECONDS = 3600
+
+_handlers: Dict[str, Callable[["JobContext"], Awaitable[Any]]] = {}
+
+
+def job_handler(kind: str):
+    """Register the coroutine function that runs jobs of this kind"""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> Job:
+    """
+    Add a job to db's transaction; the caller commits. With dedupe_key, a
+    job with that key that is still queued or running is returned instead
+    (the partial unique index settles concurrent enqueues). user_id is who
+    may read the job through the API.
+    """
+    if dedupe_key is not None:
+        existing = _active_job(db, dedupe_key)
+        if existing is not None:
+            return existing
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        status=JobStatus.QUEUED.value,
+        run_at=run_at or datetime.utcnow(),
+        attempts=0,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        dedupe_key=dedupe_key,
+        user_id=user_id,
+    )
+    try:
+        # Savepoint: losing the race to a concurrent enqueue leaves the caller's transaction usable
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        existing = _active_job(db, dedupe_key) if dedupe_key is not None else None
+        if existing is None:
+            raise
+        return existing
+    return job
+
+
+def _active_job(db: Session, dedupe_key: str) -> Optional[Job]:
+    return db.query(Job).filter(
+        Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES)
+    ).first()
+
+
+def submit(kind: str, payload: Optional[Dict[str, Any]] = None, **options: Any) -> int:
+    """enqueue() and commit in a session of its own; returns the job id"""
+    db = SessionLocal()
+    try:
+        job = enqueue(db, kind, payload, **options)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def job_info(job: Job) -> Dict[str, Any]:
+    """Public view of a job (the payload may hold credentials and is left out)"""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "last_error": job.last_error,
+        "result": job.result,
+    }
+
+
+# ============================================
+# LEASES
+# ============================================
+
+def _claimable(now: datetime):
+    return or_(
+        and_(Job.status == JobStatus.QUEUED.value, Job.run_at <= now),
+        and_(
+            Job.status == JobStatus.RUNNING.value,
+            Job.lease_expires_at < now,
+            Job.attempts < Job.max_attempts,
+        ),
+    )
+
+
+def claim_jobs(owner: str, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+    """Lease up to limit due jobs to owner"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        # Lease expired on its last attempt: give up on it
+        db.execute(
+            update(Job)
+            .where(
+                Job.status == JobStatus.RUNNING.value,
+                Job.lease_expires_at < now,
+                Job.attempts >= Job.max_attempts,
+            )
+            .values(status=JobStatus.DEAD.value, lease_owner=None, lease_expires_at=None,
+                    finished_at=now, last_error="Lease expired on the last attempt")
+            .execution_options(synchronize_session=False)
+        )
+        candidates = [
+            row.id for row in db.query(Job.id)
+            .filter(_claimable(now))
+            .order_by(Job.run_at, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ]
+        claimed = []
+        for job_id in candidates:
+            # Re-checked in the UPDATE itself, so two workers can't both win
+            result = db.execute(
+                update(Job)
+                .where(Job.id == job_id, _claimable(now))
+                .values(
+                    status=JobStatus.RUNNING.value,
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    heartbeat_at=now,
+                    attempts=Job.attempts + 1,
+                    started_at=func.coalesce(Job.started_at, now),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(job_id)
+        db.commit()
+        if not claimed:
+            return []
+        rows = db.query(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts).filter(
+            Job.id.in_(claimed)
+        ).order_by(Job.id).all()
+        return [dict(row._mapping) for row in rows]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def renew_leases(owner: str, job_ids: List[int], lease_seconds: int) -> Set[int]:
+    """Extend owner's leases; returns the ids it still holds"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        held = and_(Job.id.in_(job_ids), Job.lease_owner == owner, Job.status == JobStatus.RUNNING.value)
+        db.execute(
+            update(Job).where(held)
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return {row.id for row in db.query(Job.id).filter(held)}
+    finally:
+        db.close()
+
+
+def finish_job(owner: str, job: Dict[str, Any], error: Optional[str] = None,
+               result: Any = None, backoff_seconds: int = 0) -> str:
+    """Record the outcome of a run; returns the job's new status"""
+    now = datetime.utcnow()
+    values: Dict[str, Any] = {"lease_owner": None, "lease_expires_at": None}
+    if error is None:
+        values.update(status=JobStatus.SUCCEEDED.value, finished_at=now, result=result, last_error=None)
+    elif job["attempts"] >= job["max_attempts"]:
+        values.update(status=JobStatus.DEAD.value, finished_at=now, last_error=error)
+    else:
+        delay = min(backoff_seconds * 2 ** (job["attempts"] - 1), MAX_BACKOFF_SECONDS)
+        values.update(status=JobStatus.QUEUED.value, run_at=now + timedelta(seconds=delay), last_error=error)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job).where(Job.id == job["id"], Job.lease_owner == owner).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return values["status"]
+
+
+def report_progress(job_id: int, progress: Dict[str, Any]) -> None:
+    """Store interim progress as a running job's result; the final result replaces it"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job).where(Job.id == job_id, Job.status == JobStatus.RUNNING.value).values(result=progress)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def release_job(owner: str, job_id: int) -> None:
+    """Hand a job back without counting the attempt (shutdown)"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.lease_owner == owner, Job.status == JobStatus.RUNNING.value)
+            .values(status=JobStatus.QUEUED.value, run_at=datetime.utcnow(), lease_owner=None,
+                    lease_expires_at=None, attempts=Job.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# ============================================
+# WORKER
+# ============================================
+
+class JobContext:
+    """What a handler gets: the job and a session of its own"""
+    __slots__ = ("id", "kind", "payload", "attempt", "max_attempts", "db")
+
+    def __init__(self, job: Dict[str, Any], db: Session):
+        self.id = job["id"]
+        self.kind = job["kind"]
+        self.payload = job["payload"] or {}
+        self.attempt = job["attempts"]
+        self.max_attempts = job["max_attempts"]
+        self.db = db
+
+
+class JobWorker:
+    """Claims due jobs and runs up to concurrency of them at once"""
+
+    def __init__(self, concurrency: int, lease_seconds: int, heartbeat_seconds: float,
+                 poll_seconds: float, backoff_seconds: int, name: Optional[str] = None):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.backoff_seconds = backoff_seconds
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Dict[int, asyncio.Task] = {}
+        self._lost: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.claimed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.lost = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self.concurrency <= 0 or self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._poll(), name="job-poller"),
+            asyncio.create_task(self._heartbeat(), name="job-heartbeat"),
+        ]
+        log.info("Job worker %s started (%s slots)", self.name, self.concurrency)
+
+    async def stop(self, grace: float = 0.0) -> None:
+        """Stop claiming, give running jobs grace seconds, then hand the rest back"""
+        if not self.running:
+            return
+        poller, heartbeat = self._tasks
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        if self._running and grace > 0:
+            await asyncio.wait(list(self._running.values()), timeout=grace)
+        pending = list(self._running.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        self._tasks = []
+        log.info("Job worker %s stopped", self.name)
+
+    async def _poll(self) -> None:
+        while True:
+            # Cleared first: a job finishing from here on wakes us up
+            self._wakeup.clear()
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    jobs = await asyncio.to_thread(claim_jobs, self.name, free, self.lease_seconds)
+                except Exception as e:
+                    log.error("Job claim failed: %s", e)
+                    jobs = []
+                for job in jobs:
+                    self.claimed += 1
+                    self._running[job["id"]] = asyncio.create_task(self._execute(job), name=f"job-{job['id']}")
+            if len(self._running) >= self.concurrency:
+                # All slots busy (maybe more due): look again once one frees up
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        db = SessionLocal()
+        error = None
+        result = None
+        try:
+            handler = _handlers.get(job["kind"])
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job['kind']!r}")
+            result = await handler(JobContext(job, db))
+        except asyncio.CancelledError:
+            db.rollback()
+            if job_id in self._lost:
+                log.warning("Job %s (%s) cancelled: lease lost", job_id, job["kind"])
+            else:
+                await asyncio.shield(asyncio.to_thread(release_job, self.name, job_id))
+                log.info("Job %s (%s) handed back on shutdown", job_id, job["kind"])
+            return
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {e}"
+            log.exception("Job %s (%s) failed on attempt %s/%s",
+                          job_id, job["kind"], job["attempts"], job["max_attempts"])
+        finally:
+            db.close()
+            self._running.pop(job_id, None)
+            self._lost.discard(job_id)
+            self._wakeup.set()
+
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        try:
+            await asyncio.to_thread(finish_job, self.name, job, error, result, self.backoff_seconds)
+        except Exception as e:
+            # The lease runs out and the job is retried
+            log.error("Could not record outcome of job %s: %s", job_id, e)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                held = await asyncio.to_thread(renew_leases, self.name, job_ids, self.lease_seconds)
+            except Exception as e:
+                log.error("Job lease renewal failed: %s", e)
+                continue
+            for job_id in job_ids:
+                task = self._running.get(job_id)
+                if job_id not in held and task is not None:
+                    # Expired and taken over elsewhere; stop our copy
+                    self.lost += 1
+                    self._lost.add(job_id)
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "slots": self.concurrency,
+            "running": len(self._running),
+            "claimed": self.claimed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "lost_leases": self.lost,
+        }
+
+
+def build_worker(concurrency: int) -> JobWorker:
+    return JobWorker(
+        concurrency=concurrency,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        heartbeat_seconds=settings.JOB_HEARTBEAT_SECONDS,
+        poll_seconds=settings.JOB_POLL_SECONDS,
+        backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+    )
+
+
+# In-process slots for single-process deployments (0 = jobs only run in app.worker)
+embedded_worker = build_worker(settings.JOB_EMBEDDED_CONCURRENCY)
@@ -0,0 +1,118 @@
+"""
+Background Job Handlers
+
+Everything the job queue runs (see services/job_queue). Imported by the
+worker process (python -m app.worker) and by the web app for embedded
+workers. Delivery is at-least-once, so each handler checks the state it is
+about to change rather than assuming it is the first run.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from deepgram import DeepgramClient
+
+from app.config import settings
+from app.models.appointment import Appointment
+from app.models.call import Call
+from app.services.bulk_service import BulkCampaignService
+from app.services.job_queue import JobContext, enqueue, job_handler, report_progress
+from app.services.recipient_upload import ingest_staged
+
+log = logging.getLogger(__name__)
+
+_deepgram: Optional[DeepgramClient] = None
+
+
+@job_handler("campaign.run")
+async def run_campaign(ctx: JobContext) -> Dict[str, Any]:
+    """Dispatch a campaign's pending recipients; a re-run picks up where the last one stopped"""
+    await BulkCampaignService._process_campaign(ctx.db, ctx.payload["campaign_id"])
+    return {"campaign_id": ctx.payload["campaign_id"]}
+
+
+@job_handler("campaign.import_recipients")
+async def import_recipients(ctx: JobContext) -> Dict[str, Any]:
+    """Ingest a staged CSV upload; a retry returns the recorded report once the upload finished"""
+    campaign_id = ctx.payload["campaign_id"]
+    try:
+        result = await asyncio.to_thread(
+            ingest_staged, ctx.db, ctx.payload["upload_id"],
+            lambda progress: report_progress(ctx.id, progress),
+        )
+    except ValueError as e:
+        # A bad header fails the same way every time; don't retry it
+        return {"campaign_id": campaign_id, "imported": False, "reason": str(e)}
+    return {"campaign_id": campaign_id, "imported": True, **result}
+
+
+@job_handler("provision.inbound")
+async def provision_inbound(ctx: JobContext) -> Dict[str, Any]:
+    """Wire a DID to its Retell agent (each step is an idempotent lookup-or-update)"""
+    from app.routers.provision_inbound import InboundRequest, wire_inbound
+
+    return await asyncio.to_thread(wire_inbound, InboundRequest(**ctx.payload))
+
+
+def _transcribe(audio_url: str) -> str:
+    global _deepgram
+    if _deepgram is None:
+        _deepgram = DeepgramClient(api_key=settings.DEEPGRAM_API_KEY)
+    response = _deepgram.listen.v1.media.transcribe_url(url=audio_url, model="nova-2", smart_format=True)
+    return response.results.channels[0].alternatives[0].transcript
+
+
+@job_handler("call.transcribe")
+async def transcribe_call(ctx: JobContext) -> Dict[str, Any]:
+    """Store the transcript of a call recording on its Call row"""
+    ccid = ctx.payload["call_control_id"]
+    call = ctx.db.query(Call).filter(Call.call_control_id == ccid).first()
+    if call is None:
+        return {"transcribed": False, "reason": "unknown call"}
+    if call.transcription:
+        return {"transcribed": False, "reason": "already transcribed"}
+    transcript = await asyncio.to_thread(_transcribe, ctx.payload["recording_url"])
+    call.transcription = transcript
+    ctx.db.commit()
+    return {"transcribed": True, "characters": len(transcript)}
+
+
+def schedule_reminder(db, appointment: Appointment, minutes_before: int, text: str) -> Optional[int]:
+    """Queue an appointment's reminder SMS (in db's transaction); None if it would be in the past"""
+    remind_at = appointment.starts_at - timedelta(minutes=minutes_before)
+    if remind_at.tzinfo is not None:
+        remind_at = (remind_at - remind_at.utcoffset()).replace(tzinfo=None)
+    if remind_at <= datetime.utcnow():
+        return None
+    starts_at = appointment.starts_at.isoformat()
+    job = enqueue(
+        db, "appointment.reminder",
+        {"appointment_id": appointment.id, "starts_at": starts_at,
+         "minutes_before": minutes_before, "text": text},
+        run_at=remind_at,
+        dedupe_key=f"appointment-reminder:{appointment.id}:{starts_at}",
+    )
+    return job.id
+
+
+@job_handler("appointment.reminder")
+async def send_appointment_reminder(ctx: JobContext) -> Dict[str, Any]:
+    """SMS the customer ahead of their appointment, unless it was cancelled or moved"""
+    from app.api.v1.appointments import _send_sms
+
+    appointment = ctx.db.get(Appointment, ctx.payload["appointment_id"])
+    if appointment is None or not appointment.customer_phone:
+        return {"sent": False, "reason": "no appointment or phone"}
+    if appointment.status in ("cancelled", "completed"):
+        return {"sent": False, "reason": appointment.status}
+    if appointment.starts_at.isoformat() != ctx.payload["starts_at"]:
+        # Rescheduled: remind relative to the new time instead
+        text = f"Reminder: appointment at {appointment.starts_at.strftime('%Y-%m-%d %H:%M %Z')}"
+        job_id = schedule_reminder(ctx.db, appointment, ctx.payload["minutes_before"], text)
+        ctx.db.commit()
+        return {"sent": False, "reason": "rescheduled", "next_job_id": job_id}
+    await asyncio.to_thread(_send_sms, appointment.customer_phone, ctx.payload["text"])
+    return {"sent": True}
@@ -0,0 +1,379 @@
+"""
+Live Call Registry
+
+Which calls are in progress right now, per user, kept from the webhook
+lifecycle events (initiated / answered / hangup) instead of scanning
+calls.status. The calls table stays the history; "active" is answered
+here, so a call whose hangup webhook never arrived can't stay active
+forever.
+
+Backends (LIVE_CALLS_BACKEND):
+    memory - dicts per worker: ccid -> LiveCall and user_id -> {ccid}, so
+             counts are len() (default; fine for a single worker)
+    redis  - one hash of calls plus a set per user (SCARD), shared by every
+             worker, since a call's webhooks may land on different workers
+
+The reaper runs every LIVE_CALLS_REAP_SECONDS. Any call with no event for
+LIVE_CALLS_STALE_SECONDS is checked against Telnyx (GET /calls/{id}); calls
+Telnyx no longer knows as alive - or any call older than
+LIVE_CALLS_MAX_AGE_SECONDS - are removed and their Call row is closed if it
+still shows an active status. On startup with the memory backend, calls
+left active in the database are loaded back in for the reaper to settle.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.call import Call
+from app.services.event_bus import publish_call_event
+from app.services.telnyx_client import get_telnyx_client
+
+log = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency
+    aioredis = None
+
+# Statuses the calls table used to be scanned for
+ACTIVE_STATUSES = ("initiated", "ringing", "answered", "in-progress")
+
+
+class LiveCall:
+    __slots__ = ("call_control_id", "user_id", "phone_number_id", "direction", "from_number",
+                 "to_number", "status", "source", "started_at", "updated_at")
+
+    def __init__(self, call_control_id: str, user_id: int, phone_number_id: Optional[int] = None,
+                 direction: Optional[str] = None, from_number: Optional[str] = None,
+                 to_number: Optional[str] = None, status: str = "initiated", source: str = "telnyx",
+                 started_at: Optional[datetime] = None, updated_at: Optional[float] = None):
+        self.call_control_id = call_control_id
+        self.user_id = user_id
+        self.phone_number_id = phone_number_id
+        self.direction = direction
+        self.from_number = from_number
+        self.to_number = to_number
+        self.status = status
+        # "telnyx" calls can be checked with Call Control; others only age out
+        self.source = source
+        self.started_at = started_at or datetime.utcnow()
+        self.updated_at = updated_at if updated_at is not None else time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["started_at"] = self.started_at.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LiveCall":
+        data = dict(data)
+        data["started_at"] = datetime.fromisoformat(data["started_at"])
+        return cls(**data)
+
+
+# ============================================
+# BACKENDS
+# ============================================
+
+class MemoryLiveCalls:
+    def __init__(self):
+        self._calls: Dict[str, LiveCall] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+
+    async def put(self, call: LiveCall) -> None:
+        old = self._calls.get(call.call_control_id)
+        if old is not None and old.user_id != call.user_id:
+            self._unindex(old)
+        self._calls[call.call_control_id] = call
+        self._by_user.setdefault(call.user_id, set()).add(call.call_control_id)
+
+    async def get(self, ccid: str) -> Optional[LiveCall]:
+        return self._calls.get(ccid)
+
+    async def remove(self, ccid: str) -> Optional[LiveCall]:
+        call = self._calls.pop(ccid, None)
+        if call is not None:
+            self._unindex(call)
+        return call
+
+    def _unindex(self, call: LiveCall) -> None:
+        ccids = self._by_user.get(call.user_id)
+        if ccids is not None:
+            ccids.discard(call.call_control_id)
+            if not ccids:
+                del self._by_user[call.user_id]
+
+    async def count(self, user_id: int) -> int:
+        return len(self._by_user.get(user_id, ()))
+
+    async def for_user(self, user_id: int) -> List[LiveCall]:
+        return [self._calls[c] for c in self._by_user.get(user_id, ())]
+
+    async def all(self) -> List[LiveCall]:
+        return list(self._calls.values())
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisLiveCalls:
+    def __init__(self, url: str, prefix: str = "livecalls:"):
+        if aioredis is None:
+            raise RuntimeError("redis package not installed (pip install redis)")
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._calls_key = prefix + "calls"
+        self._user_prefix = prefix + "user:"
+
+    async def put(self, call: LiveCall) -> None:
+        old = await self.get(call.call_control_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if old is not None and old.user_id != call.user_id:
+                pipe.srem(f"{self._user_prefix}{old.user_id}", call.call_control_id)
+            pipe.hset(self._calls_key, call.call_control_id, json.dumps(call.to_dict()))
+            pipe.sadd(f"{self._user_prefix}{call.user_id}", call.call_control_id)
+            await pipe.execute()
+
+    async def get(self, ccid: str) -> Optional[LiveCall]:
+        raw = await self._redis.hget(self._calls_key, ccid)
+        return LiveCall.from_dict(json.loads(raw)) if raw else None
+
+    async def remove(self, ccid: str) -> Optional[LiveCall]:
+        call = await self.get(ccid)
+        if call is not None:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hdel(self._calls_key, ccid)
+                pipe.srem(f"{self._user_prefix}{call.user_id}", ccid)
+                removed, _ = await pipe.execute()
+            if not removed:
+                return None  # another worker got there first
+        return call
+
+    async def count(self, user_id: int) -> int:
+        return await self._redis.scard(f"{self._user_prefix}{user_id}")
+
+    async def for_user(self, user_id: int) -> List[LiveCall]:
+        ccids = list(await self._redis.smembers(f"{self._user_prefix}{user_id}"))
+        if not ccids:
+            return []
+        return [LiveCall.from_dict(json.loads(raw))
+                for raw in await self._redis.hmget(self._calls_key, ccids) if raw]
+
+    async def all(self) -> List[LiveCall]:
+        calls = []
+        async for _, raw in self._redis.hscan_iter(self._calls_key):
+            calls.append(LiveCall.from_dict(json.loads(raw)))
+        return calls
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def _build_backend():
+    if settings.LIVE_CALLS_BACKEND == "redis":
+        try:
+            return RedisLiveCalls(settings.REDIS_URL)
+        except Exception as e:
+            log.error("Live call registry: Redis unavailable (%s), using memory", e)
+    return MemoryLiveCalls()
+
+
+# ============================================
+# REGISTRY
+# ============================================
+
+class LiveCallRegistry:
+    def __init__(self, backend, reap_seconds: int, stale_seconds: int, max_age_seconds: int):
+        self.backend = backend
+        self.reap_seconds = reap_seconds
+        self.stale_seconds = stale_seconds
+        self.max_age_seconds = max_age_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.errors = 0
+
+    # ---- webhook events ----
+
+    async def started(self, ccid: Optional[str], user_id: Optional[int], **fields: Any) -> None:
+        if not ccid or user_id is None:
+            return
+        try:
+            existing = await self.backend.get(ccid)
+            if existing is not None:
+                # Redelivered / second webhook source for the same call
+                existing.updated_at = time.time()
+                await self.backend.put(existing)
+                return
+            await self.backend.put(LiveCall(ccid, user_id, **fields))
+        except Exception as e:
+            self.errors += 1
+            log.error("Live call registry: start %s failed: %s", ccid, e)
+
+    async def update(self, ccid: Optional[str], status: str) -> None:
+        if not ccid:
+            return
+        try:
+            call = await self.backend.get(ccid)
+            if call is not None:
+                call.status = status
+                call.updated_at = time.time()
+                await self.backend.put(call)
+        except Exception as e:
+            self.errors += 1
+            log.error("Live call registry: update %s failed: %s", ccid, e)
+
+    async def ended(self, ccid: Optional[str]) -> Optional[LiveCall]:
+        if not ccid:
+            return None
+        try:
+            return await self.backend.remove(ccid)
+        except Exception as e:
+            self.errors += 1
+            log.error("Live call registry: end %s failed: %s", ccid, e)
+            return None
+
+    # ---- reads ----
+
+    async def active_count(self, user_id: int) -> int:
+        return await self.backend.count(user_id)
+
+    async def active_calls(self, user_id: int) -> List[LiveCall]:
+        calls = await self.backend.for_user(user_id)
+        return sorted(calls, key=lambda c: c.started_at)
+
+    # ---- reconciliation ----
+
+    async def warm(self) -> int:
+        """Load calls the database still shows as active (memory backend restart)"""
+        since = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+
+        def load():
+            db = SessionLocal()
+            try:
+                return db.query(Call).filter(
+                    Call.status.in_(ACTIVE_STATUSES),
+                    Call.started_at >= since,
+                    Call.call_control_id.isnot(None),
+                ).all()
+            finally:
+                db.close()
+
+        rows = await asyncio.to_thread(load)
+        for row in rows:
+            await self.backend.put(LiveCall(
+                row.call_control_id, row.user_id, phone_number_id=row.phone_number_id,
+                direction=row.direction, from_number=row.from_number, to_number=row.to_number,
+                status=row.status, started_at=row.started_at,
+                updated_at=0,  # unknown: let the reaper check it first thing
+            ))
+        return len(rows)
+
+    async def _is_alive(self, call: LiveCall) -> Optional[bool]:
+        """True/False from Telnyx, None when it can't tell"""
+        client = get_telnyx_client()
+        if call.source != "telnyx" or not client.has_api_key:
+            return None
+        try:
+            r = await client.get_call(call.call_control_id)
+        except Exception as e:
+            log.warning("Live call registry: Telnyx check for %s failed: %s", call.call_control_id, e)
+            return None
+        if r.status_code in (404, 410, 422):
+            return False
+        if r.status_code >= 300:
+            return None
+        return bool(r.json().get("data", {}).get("is_alive", False))
+
+    async def reap(self) -> List[str]:
+        """Remove calls that are over but never got a hangup; returns their ccids"""
+        now = time.time()
+        max_started = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+        gone = []
+        for call in await self.backend.all():
+            if now - call.updated_at < self.stale_seconds:
+                continue
+            alive = await self._is_alive(call)
+            if alive is None:
+                alive = call.started_at > max_started
+            if alive:
+                call.updated_at = now
+                await self.backend.put(call)
+                continue
+            if await self.backend.remove(call.call_control_id) is not None:
+                gone.append(call.call_control_id)
+                publish_call_event(call.user_id, call.call_control_id, "completed", reaped=True)
+        if gone:
+            self.reaped += len(gone)
+            await asyncio.to_thread(close_calls, gone)
+            log.info("Live call registry: reaped %s calls with no hangup", len(gone))
+        return gone
+
+    def start(self) -> None:
+        if self.reap_seconds > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="live-call-reaper")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.backend.close()
+
+    async def _run(self) -> None:
+        if isinstance(self.backend, MemoryLiveCalls):
+            try:
+                loaded = await self.warm()
+                if loaded:
+                    log.info("Live call registry: %s calls still active in the database", loaded)
+            except Exception as e:
+                log.error("Live call registry: warm-up failed: %s", e)
+        while True:
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                log.error("Live call registry: reaper failed: %s", e)
+            await asyncio.sleep(self.reap_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "reaped": self.reaped,
+            "errors": self.errors,
+        }
+
+
+def close_calls(ccids: Iterable[str]) -> int:
+    """Mark Call rows still showing an active status as completed (missed hangup)"""
+    ccids = list(ccids)
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        closed = 0
+        for call in db.query(Call).filter(
+            Call.call_control_id.in_(ccids), Call.status.in_(ACTIVE_STATUSES)
+        ):
+            # The real end time is unknown; leave duration empty rather than guess
+            call.status = "completed"
+            call.ended_at = now
+            closed += 1
+        db.commit()
+        return closed
+    finally:
+        db.close()
+
+
+live_calls = LiveCallRegistry(
+    _build_backend(),
+    reap_seconds=settings.LIVE_CALLS_REAP_SECONDS,
+    stale_seconds=settings.LIVE_CALLS_STALE_SECONDS,
+    max_age_seconds=settings.LIVE_CALLS_MAX_AGE_SECONDS,
+)
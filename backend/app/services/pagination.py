@@ -0,0 +1,104 @@
+"""
+Keyset Pagination
+
+List endpoints page with an opaque cursor instead of OFFSET: the cursor is
+the sort key of the last row returned (e.g. (started_at, id)), and the next
+page is "rows after that key", which the database answers from an index
+however deep the page is. OFFSET N has to walk and throw away N rows.
+
+    rows, next_cursor = paginate(query, [(Call.started_at, True), (Call.id, True)],
+                                 limit=limit, cursor=cursor, offset=offset)
+
+Keys must be NOT NULL columns (a NULL key is neither before nor after any
+cursor, so its row would be skipped) and end in a unique column (id) so the
+order is total. offset is still honoured when no cursor is given, and those pages
+return a next_cursor too, so old clients can switch over at any page.
+Cursors are base64url JSON; they only say where to resume, every query is
+still filtered by the caller's own conditions.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Date, DateTime, and_, or_, text
+from sqlalchemy.orm import Query, Session
+
+MAX_PAGE_SIZE = 1000
+
+# (column, descending)
+SortKey = Tuple[Any, bool]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("wrong number of keys")
+        decoded = []
+        for (column, _), value in zip(keys, values):
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """Rows strictly after values in (k1, k2, ...) order: k1 > v1 OR (k1 = v1 AND k2 > v2) ..."""
+    clauses = []
+    for i, (column, desc) in enumerate(keys):
+        beyond = column < values[i] if desc else column > values[i]
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, beyond) if equal else beyond)
+    return or_(*clauses)
+
+
+def paginate(
+    query: Query,
+    keys: Sequence[SortKey],
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[list, Optional[str]]:
+    """(rows, next_cursor); next_cursor is None on the last page"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys)))
+    query = query.order_by(*(column.desc() if desc else column.asc() for column, desc in keys))
+    if offset and not cursor:
+        query = query.offset(offset)
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column, _ in keys])
+
+
+def estimated_row_count(db: Session, model) -> int:
+    """Planner's row estimate on PostgreSQL (no scan); COUNT(*) elsewhere"""
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": model.__tablename__},
+        ).scalar()
+        # -1 / 0 = never analyzed
+        if estimate and estimate > 0:
+            return int(estimate)
+    return db.query(model).count()
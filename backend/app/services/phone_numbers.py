@@ -0,0 +1,187 @@
+"""
+Phone Number Normalization (E.164)
+
+The one place that turns user/carrier supplied phone numbers into E.164.
+Every ingestion point (webhooks, config lookups, trusted contacts, campaign
+CSV uploads) goes through here so the same number always compares equal.
+
+Two paths:
+    normalize_e164(raw)       - scalar, LRU-cached; for webhooks where the
+                                same few DIDs/callers repeat constantly
+    normalize_batch(values)   - bulk; dedupes repeated values, skips the LRU
+                                lock and returns per-row rejects with a reason
+
+Numbers without a country code are assumed to be in
+settings.PHONE_DEFAULT_COUNTRY_CODE (NANP "1" by default).
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+# Reject reasons
+EMPTY = "empty"
+TOO_SHORT = "too_short"
+TOO_LONG = "too_long"
+INVALID = "invalid"
+INVALID_AREA_CODE = "invalid_area_code"
+DUPLICATE = "duplicate"
+
+_NON_DIGITS = re.compile(r"\D")
+_EXTENSION = re.compile(r"\s*(?:ext\.?|extension|x|#)\s*\d{1,6}\s*$", re.IGNORECASE)
+
+
+def _classify(text: str, country_code: str) -> Tuple[Optional[str], Optional[str]]:
+    """(e164, None) for a valid number, (None, reason) otherwise"""
+    text = text.strip()
+    if text[:4].lower() == "tel:":
+        text = text[4:].strip()
+    if not text:
+        return None, EMPTY
+    text = _EXTENSION.sub("", text)
+    digits = _NON_DIGITS.sub("", text)
+    if not digits:
+        return None, INVALID
+
+    if text[0] == "+":
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif country_code == "1":
+        if digits.startswith("011"):
+            digits = digits[3:]
+        elif len(digits) == 10:
+            digits = "1" + digits
+    elif digits[0] == "0":
+        # National trunk prefix
+        digits = country_code + digits[1:]
+    elif not digits.startswith(country_code):
+        digits = country_code + digits
+
+    if len(digits) < 8:
+        return None, TOO_SHORT
+    if len(digits) > 15:
+        return None, TOO_LONG
+    if digits[0] == "0":
+        return None, INVALID
+    if digits[0] == "1":
+        # NANP: exactly 10 digits after the 1, area code starts 2-9
+        if len(digits) != 11:
+            return None, TOO_SHORT if len(digits) < 11 else TOO_LONG
+        if digits[1] in "01":
+            return None, INVALID_AREA_CODE
+    return "+" + digits, None
+
+
+@lru_cache(maxsize=settings.PHONE_NORMALIZE_CACHE_SIZE)
+def _classify_cached(text: str) -> Tuple[Optional[str], Optional[str]]:
+    return _classify(text, settings.PHONE_DEFAULT_COUNTRY_CODE)
+
+
+def validate_e164(raw: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Normalize one number: (e164, None) or (None, reject_reason)"""
+    if raw is None:
+        return None, EMPTY
+    return _classify_cached(raw if isinstance(raw, str) else str(raw))
+
+
+def normalize_e164(raw: Any) -> Optional[str]:
+    """Normalize one number to E.164, or None if it is not a valid number"""
+    return validate_e164(raw)[0]
+
+
+def normalize_or_raw(raw: Any) -> str:
+    """E.164 when possible, otherwise the stripped input (for logging/lookup keys)"""
+    text = "" if raw is None else str(raw).strip()
+    return normalize_e164(text) or text
+
+
+def phone_from_field(field: Any) -> str:
+    """Telnyx sends from/to either as "+1..." or {"phone_number": "+1...", ...}"""
+    if isinstance(field, dict):
+        field = field.get("phone_number", "")
+    return normalize_or_raw(field)
+
+
+def normalize_cache_stats() -> Dict[str, int]:
+    info = _classify_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+
+# ============================================
+# BATCH
+# ============================================
+
+class PhoneReject:
+    """One rejected input row"""
+    __slots__ = ("index", "value", "reason")
+
+    def __init__(self, index: int, value: Any, reason: str):
+        self.index = index
+        self.value = value
+        self.reason = reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"row": self.index, "value": self.value, "reason": self.reason}
+
+
+class NormalizedBatch:
+    """numbers[i] is the E.164 form of values[i], or None if row i was rejected"""
+    __slots__ = ("numbers", "rejects")
+
+    def __init__(self, numbers: List[Optional[str]], rejects: List[PhoneReject]):
+        self.numbers = numbers
+        self.rejects = rejects
+
+    @property
+    def valid_count(self) -> int:
+        return len(self.numbers) - len(self.rejects)
+
+    def reject_summary(self) -> Dict[str, int]:
+        summary: Dict[str, int] = {}
+        for reject in self.rejects:
+            summary[reject.reason] = summary.get(reject.reason, 0) + 1
+        return summary
+
+
+def normalize_batch(
+    values: Iterable[Any],
+    dedupe: bool = False,
+    country_code: Optional[str] = None,
+    start_index: int = 0,
+) -> NormalizedBatch:
+    """
+    Normalize many numbers at once.
+
+    Each distinct input string is parsed once (campaign lists repeat a lot)
+    using a batch-local memo instead of the shared LRU, so a large upload
+    neither contends on nor evicts the webhook cache. With dedupe=True the
+    second and later occurrences of a number are rejected as "duplicate".
+    """
+    cc = country_code or settings.PHONE_DEFAULT_COUNTRY_CODE
+    memo: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    seen = set()
+    numbers: List[Optional[str]] = []
+    rejects: List[PhoneReject] = []
+    classify = _classify
+    append = numbers.append
+
+    for index, raw in enumerate(values, start_index):
+        text = raw if isinstance(raw, str) else ("" if raw is None else str(raw))
+        result = memo.get(text)
+        if result is None:
+            result = memo[text] = classify(text, cc)
+        number, reason = result
+        if number is not None and dedupe:
+            if number in seen:
+                number, reason = None, DUPLICATE
+            else:
+                seen.add(number)
+        if number is None:
+            rejects.append(PhoneReject(index, raw, reason))
+        append(number)
+
+    return NormalizedBatch(numbers, rejects)
@@ -0,0 +1,193 @@
+"""
+Campaign Recipient Loader
+
+Bulk-inserts campaign recipients without building ORM objects: rows go in
+batches of RECIPIENT_LOAD_BATCH_SIZE, each batch one transaction. On
+PostgreSQL a batch is COPY'd into a temp staging table and moved over with
+one INSERT ... SELECT; elsewhere it is a multi-row INSERT.
+
+The unique index on (campaign_id, phone_number) is what dedupes: numbers
+already in the campaign are skipped by ON CONFLICT DO NOTHING, so two
+uploads racing on the same campaign cannot add a number twice. Each batch
+bumps bulk_campaigns.total_recipients by the rows it actually inserted, in
+SQL and in the same transaction, so the counter matches the table.
+
+Callers get counts back (inserted / duplicates), never the rows.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.bulk_campaign import BulkCampaign, CampaignRecipient, RecipientStatus
+
+log = logging.getLogger("rootcall")
+
+RECIPIENT_COLUMNS = (
+    "campaign_id", "phone_number", "name", "email", "custom_data",
+    "status", "attempts", "voicemail_detected", "cost", "created_at",
+)
+
+# SQLite caps bound parameters per statement (999 on older builds)
+_SQLITE_MAX_PARAMS = 999
+
+
+def _recipient_row(campaign_id: int, data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    return {
+        "campaign_id": campaign_id,
+        "phone_number": data["phone_number"],
+        "name": data.get("name"),
+        "email": data.get("email"),
+        "custom_data": data.get("custom_data") or None,
+        "status": RecipientStatus.PENDING,
+        "attempts": 0,
+        "voicemail_detected": False,
+        "cost": 0.0,
+        "created_at": now,
+    }
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """COPY into a staging table, then INSERT ... ON CONFLICT DO NOTHING (psycopg2)"""
+    table = CampaignRecipient.__tablename__
+    columns = ", ".join(RECIPIENT_COLUMNS)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([
+            row["campaign_id"],
+            row["phone_number"],
+            # Empty unquoted field = NULL in COPY ... CSV
+            "" if row["name"] is None else row["name"],
+            "" if row["email"] is None else row["email"],
+            "" if row["custom_data"] is None else json.dumps(row["custom_data"]),
+            # SQLEnum stores member names
+            row["status"].name,
+            row["attempts"],
+            "t" if row["voicemail_detected"] else "f",
+            row["cost"],
+            row["created_at"].isoformat(),
+        ])
+    buf.seek(0)
+
+    conn = db.connection()
+    conn.exec_driver_sql(
+        f"CREATE TEMP TABLE IF NOT EXISTS {table}_load ON COMMIT DROP AS "
+        f"SELECT {columns} FROM {table} WITH NO DATA"
+    )
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table}_load ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
+    result = conn.exec_driver_sql(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_load "
+        "ON CONFLICT (campaign_id, phone_number) DO NOTHING"
+    )
+    return result.rowcount
+
+
+def _insert_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Multi-row INSERTs skipping numbers the campaign already has"""
+    table = CampaignRecipient.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect not in ("postgresql", "sqlite"):
+        # No native upsert: drop the numbers that exist, insert the rest
+        existing = {
+            number for (number,) in db.execute(
+                select(table.c.phone_number).where(
+                    table.c.campaign_id == rows[0]["campaign_id"],
+                    table.c.phone_number.in_([row["phone_number"] for row in rows]),
+                )
+            )
+        }
+        rows = [row for row in rows if row["phone_number"] not in existing]
+        if rows:
+            db.execute(insert(table), rows)
+        return len(rows)
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+        per_statement = len(rows)
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+        per_statement = _SQLITE_MAX_PARAMS // len(RECIPIENT_COLUMNS)
+
+    inserted = 0
+    for start in range(0, len(rows), per_statement):
+        stmt = upsert(table).values(rows[start:start + per_statement]).on_conflict_do_nothing(
+            index_elements=[table.c.campaign_id, table.c.phone_number]
+        )
+        inserted += db.execute(stmt).rowcount
+    return inserted
+
+
+def load_batch(db: Session, campaign_id: int, recipients: List[Dict[str, Any]], use_copy: bool = False) -> int:
+    """
+    Insert one batch and add it to total_recipients in a single transaction.
+    Returns the number of rows inserted (numbers already present are skipped).
+    """
+    now = datetime.utcnow()
+    rows: Dict[str, Dict[str, Any]] = {}
+    for data in recipients:
+        # First occurrence of a number within the batch wins, as it does across batches
+        rows.setdefault(data["phone_number"], _recipient_row(campaign_id, data, now))
+    if not rows:
+        return 0
+
+    try:
+        if use_copy:
+            inserted = _copy_rows(db, list(rows.values()))
+        else:
+            inserted = _insert_rows(db, list(rows.values()))
+        if inserted:
+            db.execute(
+                update(BulkCampaign)
+                .where(BulkCampaign.id == campaign_id)
+                .values(total_recipients=func.coalesce(BulkCampaign.total_recipients, 0) + inserted)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return inserted
+
+
+def load_recipients(
+    db: Session,
+    campaign_id: int,
+    recipients: Iterable[Dict[str, Any]],
+    batch_size: int = settings.RECIPIENT_LOAD_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Load recipient dicts (phone_number already E.164; name, email,
+    custom_data optional) into a campaign, batch_size rows per transaction.
+    recipients may be a generator; it is consumed one batch at a time.
+    """
+    use_copy = settings.DATABASE_URL.startswith(("postgresql", "postgres"))
+    submitted = 0
+    inserted = 0
+    batch: List[Dict[str, Any]] = []
+    for data in recipients:
+        batch.append(data)
+        if len(batch) >= batch_size:
+            submitted += len(batch)
+            inserted += load_batch(db, campaign_id, batch, use_copy)
+            batch = []
+    if batch:
+        submitted += len(batch)
+        inserted += load_batch(db, campaign_id, batch, use_copy)
+
+    if submitted:
+        log.info("[RECIPIENTS] Campaign %s: %s inserted, %s duplicates", campaign_id, inserted, submitted - inserted)
+    return {"submitted": submitted, "inserted": inserted, "duplicates": submitted - inserted}
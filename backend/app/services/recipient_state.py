@@ -0,0 +1,231 @@
+"""
+Campaign Recipient State - write-behind
+
+A campaign run used to commit two or three times per recipient (in
+progress, the Call row, the outcome) on one session shared by all of its
+concurrent sends, and bumped success_count/failed_count in Python, which
+loses increments when sends overlap.
+
+Instead, the run's recipients are detached from its session and every
+transition is handed to a RecipientStateWriter:
+
+    save(recipient)   - remembers the recipient's current state columns;
+                        later saves of the same recipient overwrite earlier
+                        ones, so in progress -> completed is one row update
+    add_call(...)     - queues the Call row for an outbound call; its id is
+                        written to the recipient's call_id on flush
+    count(...)        - adds to the campaign's success/failed deltas
+
+One task flushes all of it in a single transaction every
+RECIPIENT_STATE_FLUSH_MS milliseconds (sooner once RECIPIENT_STATE_BATCH_SIZE
+recipients are waiting): Call rows as one multi-row INSERT ... RETURNING,
+recipients as one UPDATE ... FROM (VALUES ...) on PostgreSQL (an executemany
+UPDATE elsewhere), and the counters as one atomic
+UPDATE bulk_campaigns SET success_count = success_count + n. A failed flush
+is merged back and retried on the next tick. stop() flushes what is left.
+
+The Call row of a voice send reaches the table up to one flush interval
+after the call is placed, which has to stay well below ring time so the
+call.answered webhook finds it. A worker that dies mid-run loses at most
+one interval of transitions; those recipients are still pending and are
+dialed again by the retried run.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, cast, column, func, insert, update, values
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.bulk_campaign import BulkCampaign, CampaignRecipient
+from app.models.call import Call
+
+log = logging.getLogger("rootcall")
+
+# Columns a dispatch changes; None means "leave as is" (nothing is ever cleared)
+STATE_COLUMNS = (
+    "status", "attempts", "last_attempt_at", "completed_at",
+    "error_message", "call_id", "message_id", "message_status",
+)
+
+_recipients = CampaignRecipient.__table__
+
+# Executemany form for databases without UPDATE ... FROM (VALUES ...)
+_STATE_UPDATE = (
+    update(_recipients)
+    .where(_recipients.c.id == bindparam("rid"))
+    .values({
+        col: func.coalesce(bindparam(f"v_{col}", type_=_recipients.c[col].type), _recipients.c[col])
+        for col in STATE_COLUMNS
+    })
+    .execution_options(synchronize_session=False)
+)
+
+
+def _update_from_values(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """One UPDATE ... FROM (VALUES ...) for the whole batch (PostgreSQL)"""
+    v = values(
+        column("id", _recipients.c.id.type),
+        *(column(col, _recipients.c[col].type) for col in STATE_COLUMNS),
+        name="v",
+    ).data([(row["rid"], *(row[f"v_{col}"] for col in STATE_COLUMNS)) for row in rows])
+    db.execute(
+        update(_recipients)
+        .where(_recipients.c.id == v.c.id)
+        .values({
+            # NULLs in VALUES come back untyped; cast so COALESCE sees the column's type
+            col: func.coalesce(cast(v.c[col], _recipients.c[col].type), _recipients.c[col])
+            for col in STATE_COLUMNS
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+def write_state_batch(
+    campaign_id: int,
+    states: Dict[int, Dict[str, Any]],
+    calls: List[Tuple[int, Dict[str, Any]]],
+    success: int,
+    failed: int,
+    use_values: bool = False,
+) -> None:
+    """Write one flush in a single transaction (blocking)"""
+    db = SessionLocal()
+    try:
+        call_ids: Dict[int, int] = {}
+        if calls:
+            inserted = db.execute(
+                insert(Call).returning(Call.id, sort_by_parameter_order=True),
+                [row for _, row in calls],
+            ).scalars().all()
+            call_ids = {recipient_id: call_id for (recipient_id, _), call_id in zip(calls, inserted)}
+
+        rows = []
+        # Ascending ids: concurrent writers lock rows in the same order
+        for recipient_id in sorted(set(states) | set(call_ids)):
+            state = states.get(recipient_id, {})
+            row = {"rid": recipient_id, **{f"v_{col}": state.get(col) for col in STATE_COLUMNS}}
+            if recipient_id in call_ids:
+                row["v_call_id"] = call_ids[recipient_id]
+            rows.append(row)
+        if rows:
+            if use_values:
+                _update_from_values(db, rows)
+            else:
+                db.connection().execute(_STATE_UPDATE, rows)
+
+        if success or failed:
+            db.execute(
+                update(BulkCampaign)
+                .where(BulkCampaign.id == campaign_id)
+                .values(
+                    success_count=func.coalesce(BulkCampaign.success_count, 0) + success,
+                    failed_count=func.coalesce(BulkCampaign.failed_count, 0) + failed,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class RecipientStateWriter:
+    """Buffered recipient transitions, Call rows and counter deltas for one campaign run"""
+
+    def __init__(self, campaign_id: int, batch_size: int, flush_ms: int):
+        self.campaign_id = campaign_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.use_values = settings.DATABASE_URL.startswith(("postgresql", "postgres"))
+        self._states: Dict[int, Dict[str, Any]] = {}
+        self._calls: List[Tuple[int, Dict[str, Any]]] = []
+        self._success = 0
+        self._failed = 0
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.written = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"recipient-state-{self.campaign_id}")
+
+    async def stop(self) -> None:
+        """Flush everything still buffered, then stop; raises if the last flush fails"""
+        self._stopping = True
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._pending():
+            await self._flush(raise_errors=True)
+
+    def save(self, recipient: CampaignRecipient) -> None:
+        self._states[recipient.id] = {col: getattr(recipient, col) for col in STATE_COLUMNS}
+        if len(self._states) >= self.batch_size:
+            self._full.set()
+
+    def add_call(self, recipient_id: int, row: Dict[str, Any]) -> None:
+        self._calls.append((recipient_id, row))
+
+    def count(self, success: int = 0, failed: int = 0) -> None:
+        self._success += success
+        self._failed += failed
+
+    def _pending(self) -> bool:
+        return bool(self._states or self._calls or self._success or self._failed)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            if self._pending():
+                await self._flush()
+
+    async def _flush(self, raise_errors: bool = False) -> None:
+        states, calls, success, failed = self._states, self._calls, self._success, self._failed
+        self._states, self._calls, self._success, self._failed = {}, [], 0, 0
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(
+                write_state_batch, self.campaign_id, states, calls, success, failed, self.use_values
+            )
+        except Exception as e:
+            self.failed_flushes += 1
+            log.error("[RECIPIENT STATE] Campaign %s: failed to write %s recipients: %s",
+                      self.campaign_id, len(states), e)
+            # Merge back; anything saved since is newer and wins
+            states.update(self._states)
+            self._states = states
+            self._calls = calls + self._calls
+            self._success += success
+            self._failed += failed
+            if raise_errors:
+                raise
+            return
+        self.flushes += 1
+        self.written += len(states)
+        log.debug("[RECIPIENT STATE] Campaign %s: %s recipients, %s calls in %.1f ms",
+                  self.campaign_id, len(states), len(calls), (time.monotonic() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "campaign_id": self.campaign_id,
+            "pending": len(self._states),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "written": self.written,
+        }
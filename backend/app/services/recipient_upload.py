@@ -0,0 +1,280 @@
+"""
+Streaming Recipient Uploads
+
+CSV lead lists are ingested without ever holding the file in memory:
+
+    read      - a text wrapper over the (spooled) upload file decodes it a
+                buffer at a time; csv rows come off it one by one
+    validate  - rows are collected RECIPIENT_LOAD_BATCH_SIZE at a time and
+                their numbers normalized in one normalize_batch call
+    load      - each chunk goes straight to recipient_loader.load_batch
+                (one transaction, duplicates skipped by the unique index)
+
+Memory is one chunk plus the first RECIPIENT_UPLOAD_MAX_REJECTS rejected
+rows; every reject is still counted per reason. Row numbers in the report
+are 1-based data rows (the header is not counted).
+
+Columns: phone_number (required), name, email; any other non-empty column
+goes into custom_data.
+
+Large uploads can run as a campaign.import_recipients job instead. The
+upload is staged in the database (recipient_upload_chunks, STAGE_CHUNK_BYTES
+per row) in the same transaction that queues the job, so a worker on
+another machine can read it; the job streams it back a chunk at a time and
+stores progress as the job's result (GET /api/v1/jobs/{id}). Finishing
+records the report on the recipient_uploads row and drops the chunks in one
+transaction. A job retried after that returns the recorded report; one
+retried mid-import reads the file from the start, and rows already loaded
+come back as duplicates.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.recipient_upload import RecipientUpload, RecipientUploadChunk, UploadStatus
+from app.services.job_queue import enqueue
+from app.services.phone_numbers import normalize_batch
+from app.services.recipient_loader import load_batch
+
+log = logging.getLogger("rootcall")
+
+BASE_COLUMNS = ("phone_number", "name", "email")
+
+# Bytes per recipient_upload_chunks row when staging an upload for a background import
+STAGE_CHUNK_BYTES = 1024 * 1024
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class UploadReport:
+    """Running totals for one upload, plus the first max_rejects rejected rows"""
+
+    def __init__(self, max_rejects: int):
+        self.max_rejects = max_rejects
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.reject_summary: Dict[str, int] = {}
+        self.rejected_rows: List[Dict[str, Any]] = []
+
+    def reject(self, row: int, value: Any, reason: str) -> None:
+        self.rejected += 1
+        self.reject_summary[reason] = self.reject_summary.get(reason, 0) + 1
+        if len(self.rejected_rows) < self.max_rejects:
+            self.rejected_rows.append({"row": row, "value": value, "reason": reason})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "reject_summary": self.reject_summary,
+            "rejected_rows": self.rejected_rows,
+        }
+
+
+def _recipient(row: Dict[Optional[str], Any], phone_number: str) -> Dict[str, Any]:
+    recipient = {
+        "phone_number": phone_number,
+        "name": (row.get("name") or "").strip() or None,
+        "email": (row.get("email") or "").strip() or None,
+    }
+    custom_data = {}
+    for key, value in row.items():
+        # key None holds the extra fields of a row longer than the header
+        if key is None or key in BASE_COLUMNS or not isinstance(value, str):
+            continue
+        value = value.strip()
+        if value:
+            custom_data[key] = value
+    if custom_data:
+        recipient["custom_data"] = custom_data
+    return recipient
+
+
+def _load_chunk(
+    db: Session,
+    campaign_id: int,
+    chunk: List[Tuple[int, Dict[Optional[str], Any]]],
+    report: UploadReport,
+    use_copy: bool,
+) -> None:
+    batch = normalize_batch(row.get("phone_number") for _, row in chunk)
+    for reject in batch.rejects:
+        report.reject(chunk[reject.index][0], reject.value, reject.reason)
+
+    recipients = [
+        _recipient(row, phone_number)
+        for (_, row), phone_number in zip(chunk, batch.numbers)
+        if phone_number is not None
+    ]
+    if recipients:
+        inserted = load_batch(db, campaign_id, recipients, use_copy)
+        report.inserted += inserted
+        report.duplicates += len(recipients) - inserted
+
+
+def ingest_csv(
+    db: Session,
+    campaign_id: int,
+    stream: BinaryIO,
+    batch_size: int = settings.RECIPIENT_LOAD_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a CSV (binary file object, UTF-8 with or without BOM) into a
+    campaign, batch_size rows per transaction. progress(report) is called
+    after every chunk. Raises ValueError if there is no phone_number column.
+    """
+    report = UploadReport(settings.RECIPIENT_UPLOAD_MAX_REJECTS)
+    use_copy = settings.DATABASE_URL.startswith(("postgresql", "postgres"))
+
+    # Undecodable bytes become U+FFFD; such rows fail normalization instead of the whole upload
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        reader = csv.DictReader(text)
+        if reader.fieldnames is None:
+            raise ValueError("CSV is empty")
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        if "phone_number" not in reader.fieldnames:
+            raise ValueError("CSV needs a phone_number column")
+
+        chunk: List[Tuple[int, Dict[Optional[str], Any]]] = []
+        for row in reader:
+            # Spreadsheet exports pad the end of the sheet with ",,,," rows
+            if not any(isinstance(v, str) and v.strip() for v in row.values()):
+                continue
+            report.rows += 1
+            chunk.append((report.rows, row))
+            if len(chunk) >= batch_size:
+                _load_chunk(db, campaign_id, chunk, report, use_copy)
+                chunk = []
+                if progress is not None:
+                    progress(report.to_dict())
+        if chunk:
+            _load_chunk(db, campaign_id, chunk, report, use_copy)
+    finally:
+        # Leave the upload's own file open for whoever owns it
+        text.detach()
+
+    log.info(
+        "[RECIPIENTS] Campaign %s upload: %s rows, %s inserted, %s duplicates, %s rejected",
+        campaign_id, report.rows, report.inserted, report.duplicates, report.rejected,
+    )
+    result = report.to_dict()
+    if progress is not None:
+        progress(result)
+    return result
+
+
+# ============================================
+# BACKGROUND IMPORTS
+# ============================================
+
+class _StagedStream(io.RawIOBase):
+    """A staged upload read back one chunk (one query) at a time"""
+
+    def __init__(self, db: Session, upload_id: int):
+        self.db = db
+        self.upload_id = upload_id
+        self.seq = 0
+        self.buf = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self.buf:
+            data = self.db.execute(
+                select(RecipientUploadChunk.data).where(
+                    RecipientUploadChunk.upload_id == self.upload_id,
+                    RecipientUploadChunk.seq == self.seq,
+                )
+            ).scalar()
+            if data is None:
+                return 0
+            self.buf = memoryview(data)
+            self.seq += 1
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+
+def stage_upload(db: Session, campaign_id: int, stream: BinaryIO, user_id: Optional[int] = None) -> int:
+    """Stage an upload in the database and queue its import, in one transaction; returns the job id"""
+    try:
+        upload = RecipientUpload(campaign_id=campaign_id)
+        db.add(upload)
+        db.flush()
+        size = 0
+        seq = 0
+        while True:
+            data = stream.read(STAGE_CHUNK_BYTES)
+            if not data:
+                break
+            # Core insert: chunks never pile up in the session
+            db.execute(insert(RecipientUploadChunk), {"upload_id": upload.id, "seq": seq, "data": data})
+            size += len(data)
+            seq += 1
+        upload.size_bytes = size
+        job = enqueue(
+            db, "campaign.import_recipients",
+            {"campaign_id": campaign_id, "upload_id": upload.id}, user_id=user_id,
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return job.id
+
+
+def _finish_upload(db: Session, upload_id: int, status: UploadStatus, result: Dict[str, Any]) -> None:
+    db.execute(
+        update(RecipientUpload)
+        .where(RecipientUpload.id == upload_id)
+        .values(status=status.value, result=result, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(RecipientUploadChunk).where(RecipientUploadChunk.upload_id == upload_id))
+    db.commit()
+
+
+def ingest_staged(
+    db: Session,
+    upload_id: int,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Ingest a staged upload and record the outcome. An upload that already
+    finished returns its recorded report; LookupError if there is no such
+    upload, ValueError (again, on retries) for a CSV without a phone_number column.
+    """
+    upload = db.query(RecipientUpload).filter(RecipientUpload.id == upload_id).first()
+    if upload is None:
+        raise LookupError(f"Staged upload {upload_id} not found")
+    if upload.status == UploadStatus.IMPORTED.value:
+        return upload.result
+    if upload.status == UploadStatus.REJECTED.value:
+        raise ValueError(upload.result["error"])
+
+    campaign_id = upload.campaign_id
+    stream = io.BufferedReader(_StagedStream(db, upload_id), STAGE_CHUNK_BYTES)
+    try:
+        result = ingest_csv(db, campaign_id, stream, progress=progress)
+    except ValueError as e:
+        db.rollback()
+        _finish_upload(db, upload_id, UploadStatus.REJECTED, {"error": str(e)})
+        raise
+    _finish_upload(db, upload_id, UploadStatus.IMPORTED, result)
+    return result
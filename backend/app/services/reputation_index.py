@@ -0,0 +1,475 @@
+"""
+Global Caller Reputation Index
+
+A cross-tenant spam score per caller number, built from imported
+blocklists plus every line's RootCallCallLog outcomes (rejected vs.
+trusted/medical/family transfers), so a number on a blocklist or turned
+away across clients is already known when it rings the next line.
+
+spam_blocked rows are not counted: the scorer caused them (often because
+of this very index), so counting them would only feed its own verdicts
+back in. Rejections are also learned by the scorer's in-process
+reputation, so their share of the score is capped at REJECTED_SCORE_CAP;
+together with that reputation's ceiling they stay below the default block
+threshold, and a caller is blocked for rejections only with another
+signal (CNAM, velocity, a blocklist) on top.
+
+On-disk format (native byte order, one file, memory-mapped read-only):
+
+    header   magic "RCRI", version, bloom hash count, entry count,
+             bloom size in bytes, RootCallCallLog watermark, build time
+    bloom    bit array sized REPUTATION_BLOOM_BITS_PER_KEY per entry
+    entries  sorted uint64 array, each (e164 digits << 8) | score
+
+Lookups hit the Bloom filter first (almost every legitimate caller stops
+there) and binary-search the array otherwise. Every worker maps the same
+file, so there is one page-cache copy per host.
+
+Rebuilds are incremental: per-number outcome counters, the last
+RootCallCallLog id and the ids missing below it are kept in a sidecar
+"<path>.state" file, so each run only aggregates new log rows. Ids are
+handed out before their rows commit, so a row can appear below the
+watermark after a scan; the last REPUTATION_RESCAN_WINDOW ids are scanned
+row by row and the ones not found are checked again next run, until they
+fall out of the window (rolled back). New files are written next to the
+old ones and swapped in with os.replace(); readers notice the new inode
+and remap.
+
+Run by the scheduler in the app lifespan (one worker per host wins the
+lock), or by hand:
+
+    python -m app.services.reputation_index rebuild [--full]
+    python -m app.services.reputation_index lookup +18135550101
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import glob
+import itertools
+import logging
+import mmap
+import os
+import struct
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import settings
+
+log = logging.getLogger("rootcall")
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+MAGIC = b"RCRI"
+STATE_MAGIC = b"RCRS"
+VERSION = 2
+# magic, version, hash count, entry count, bloom bytes, watermark, built_at
+HEADER = struct.Struct("=4sHHQQQd")
+# magic, version, record count, watermark, missing id count (the ids follow the records)
+STATE_HEADER = struct.Struct("=4sHQQQ")
+STATE_RECORD = struct.Struct("=QII")
+
+SCORE_BITS = 8
+SCORE_MASK = (1 << SCORE_BITS) - 1
+MASK64 = (1 << 64) - 1
+
+# RootCallCallLog.action -> counter slot
+REJECTED, GOOD = 0, 1
+ACTION_SLOTS = {
+    "rejected": REJECTED,
+    "trusted_forwarded": GOOD,
+    "medical_transferred": GOOD,
+    "family_transferred": GOOD,
+}
+
+
+def number_key(e164: Optional[str]) -> int:
+    """E.164 string -> integer key (0 if unusable)"""
+    if not e164:
+        return 0
+    digits = e164[1:] if e164[0] == "+" else e164
+    return int(digits) if digits.isdigit() else 0
+
+
+# With the scorer's own "rejected" reputation (60 at most) this stays below 70
+REJECTED_SCORE_CAP = 20
+
+
+def outcome_score(rejected: int, good: int) -> int:
+    """Cross-tenant score from outcome counts; good outcomes pull it down hard"""
+    return max(0, min(REJECTED_SCORE_CAP, 10 * rejected) - 30 * good)
+
+
+def _mix64(x: int) -> int:
+    # splitmix64 finalizer
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def _bloom_positions(key: int, k: int, m: int) -> Iterable[int]:
+    h1 = _mix64(key)
+    h2 = _mix64(h1) | 1
+    for i in range(k):
+        yield (h1 + i * h2) % m
+
+
+# ============================================
+# READER
+# ============================================
+
+class ReputationIndex:
+    """Read-only view of the index file; remaps itself when the file is replaced"""
+
+    def __init__(self, path: str, reload_check_seconds: float = 5.0):
+        self.path = path
+        self.reload_check_seconds = reload_check_seconds
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._mm: Optional[mmap.mmap] = None
+        self._bloom: Optional[memoryview] = None
+        self._keys: Optional[memoryview] = None
+        self._k = 0
+        self._m = 0
+        self.count = 0
+        self.watermark = 0
+        self.built_at = 0.0
+        self.lookups = 0
+        self.bloom_rejects = 0
+        self.hits = 0
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_check_seconds
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file_id = (st.st_ino, st.st_mtime_ns)
+        if file_id != self._file_id:
+            self._open(file_id)
+
+    def _open(self, file_id: Tuple[int, int]) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            log.error("[REPUTATION] Cannot map %s: %s", self.path, e)
+            return
+
+        magic, version, k, count, bloom_bytes, watermark, built_at = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or len(mm) != HEADER.size + bloom_bytes + count * 8:
+            log.error("[REPUTATION] %s is not a valid index, ignoring", self.path)
+            mm.close()
+            return
+
+        data = memoryview(mm)
+        bloom = data[HEADER.size:HEADER.size + bloom_bytes]
+        keys = data[HEADER.size + bloom_bytes:].cast("Q")
+
+        self.close()
+        self._mm, self._bloom, self._keys = mm, bloom, keys
+        self._k, self._m = k, bloom_bytes * 8
+        self.count, self.watermark, self.built_at = count, watermark, built_at
+        self._file_id = file_id
+        log.info("[REPUTATION] Loaded index with %s numbers (watermark %s)", count, watermark)
+
+    def close(self) -> None:
+        # Views must be released before the mmap can close
+        for view in (self._keys, self._bloom):
+            if view is not None:
+                view.release()
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = self._bloom = self._keys = None
+        self.count = 0
+        self._file_id = None
+
+    def lookup(self, e164: str) -> int:
+        """Global spam score 0-100 for a caller (0 = unknown)"""
+        self._maybe_reload()
+        key = number_key(e164)
+        if not key or self._keys is None or not self.count:
+            return 0
+        self.lookups += 1
+
+        bloom = self._bloom
+        for pos in _bloom_positions(key, self._k, self._m):
+            if not bloom[pos >> 3] & (1 << (pos & 7)):
+                self.bloom_rejects += 1
+                return 0
+
+        keys = self._keys
+        lo = key << SCORE_BITS
+        i = bisect.bisect_left(keys, lo)
+        if i < self.count and keys[i] >> SCORE_BITS == key:
+            self.hits += 1
+            return keys[i] & SCORE_MASK
+        return 0
+
+    def stats(self) -> Dict[str, object]:
+        self._maybe_reload()
+        return {
+            "path": self.path,
+            "loaded": self._keys is not None,
+            "numbers": self.count,
+            "watermark": self.watermark,
+            "built_at": self.built_at,
+            "lookups": self.lookups,
+            "bloom_rejects": self.bloom_rejects,
+            "hits": self.hits,
+        }
+
+
+# ============================================
+# BUILDER
+# ============================================
+
+def _load_state(path: str) -> Tuple[Dict[int, List[int]], int, Set[int]]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {}, 0, set()
+    magic, version = struct.unpack_from("=4sH", data, 0) if len(data) >= STATE_HEADER.size else (b"", 0)
+    if magic != STATE_MAGIC or version != VERSION:
+        # Older layouts counted different outcomes; start over from the full log
+        log.warning("[REPUTATION] Ignoring unreadable state file %s", path)
+        return {}, 0, set()
+    _, _, count, watermark, missing = STATE_HEADER.unpack_from(data, 0)
+    records_end = STATE_HEADER.size + count * STATE_RECORD.size
+    counters = {
+        key: [rejected, good]
+        for key, rejected, good in STATE_RECORD.iter_unpack(data[STATE_HEADER.size:records_end])
+    }
+    gaps = set(array("Q", data[records_end:records_end + missing * 8]))
+    return counters, watermark, gaps
+
+
+def _atomic_write(path: str, chunks: Iterable[bytes]) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _write_state(path: str, counters: Dict[int, List[int]], watermark: int, gaps: Set[int]) -> None:
+    def chunks():
+        yield STATE_HEADER.pack(STATE_MAGIC, VERSION, len(counters), watermark, len(gaps))
+        pack = STATE_RECORD.pack
+        yield b"".join(pack(key, *c) for key, c in counters.items())
+        yield array("Q", sorted(gaps)).tobytes()
+    _atomic_write(path, chunks())
+
+
+def _load_blocklists(directory: str) -> Dict[int, int]:
+    """number -> score from every *.csv / *.txt in directory ("number[,score]" per line)"""
+    from app.services.phone_numbers import normalize_batch
+
+    blocked: Dict[int, int] = {}
+    if not directory or not os.path.isdir(directory):
+        return blocked
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv")) + glob.glob(os.path.join(directory, "*.txt"))):
+        rows = []
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                number, _, score = line.partition(",")
+                rows.append((number, score.strip()))
+        batch = normalize_batch(number for number, _ in rows)
+        for e164, (_, score) in zip(batch.numbers, rows):
+            if e164:
+                key = number_key(e164)
+                value = int(score) if score.isdigit() else 100
+                blocked[key] = max(blocked.get(key, 0), min(value, 100))
+        if batch.rejects:
+            log.warning("[REPUTATION] %s: skipped %s invalid numbers", path, len(batch.rejects))
+    return blocked
+
+
+def build_index(path: Optional[str] = None, full: bool = False, db=None) -> Dict[str, object]:
+    """Fold new RootCallCallLog rows and the blocklists into a fresh index file"""
+    from sqlalchemy import and_, func, or_
+    from app.database import SessionLocal
+    from app.models.rootcall_call_log import RootCallCallLog
+    from app.services.phone_numbers import normalize_e164
+
+    path = path or settings.REPUTATION_INDEX_PATH
+    state_path = f"{path}.state"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    started = time.monotonic()
+
+    counters, watermark, gaps = ({}, 0, set()) if full else _load_state(state_path)
+    window = settings.REPUTATION_RESCAN_WINDOW
+
+    should_close_db = db is None
+    db = db or SessionLocal()
+    try:
+        high_water = db.query(func.max(RootCallCallLog.id)).scalar() or 0
+        new_rows = 0
+
+        def add(from_number: str, action: str, count: int) -> None:
+            nonlocal new_rows
+            key = number_key(normalize_e164(from_number))
+            if not key:
+                return
+            counts = counters.setdefault(key, [0, 0])
+            counts[ACTION_SLOTS[action]] += count
+            new_rows += count
+
+        # Below the window anything still missing was rolled back; aggregate it in SQL
+        floor = max(watermark, high_water - window)
+        if floor > watermark:
+            rows = db.query(
+                RootCallCallLog.from_number,
+                RootCallCallLog.action,
+                func.count(RootCallCallLog.id),
+            ).filter(
+                RootCallCallLog.id > watermark,
+                RootCallCallLog.id <= floor,
+                RootCallCallLog.action.in_(list(ACTION_SLOTS)),
+            ).group_by(RootCallCallLog.from_number, RootCallCallLog.action)
+            for from_number, action, count in rows:
+                add(from_number, action, count)
+
+        # The window row by row (every action, to see which ids exist), plus ids missing last run
+        recent = and_(RootCallCallLog.id > floor, RootCallCallLog.id <= high_water)
+        seen: Set[int] = set()
+        rows = db.query(RootCallCallLog.id, RootCallCallLog.from_number, RootCallCallLog.action).filter(
+            or_(recent, RootCallCallLog.id.in_(sorted(gaps))) if gaps else recent
+        )
+        for log_id, from_number, action in rows:
+            seen.add(log_id)
+            if action in ACTION_SLOTS:
+                add(from_number, action, 1)
+
+        gaps = {
+            log_id for log_id in itertools.chain(gaps, range(floor + 1, high_water + 1))
+            if log_id > high_water - window and log_id not in seen
+        }
+        watermark = max(watermark, high_water)
+    finally:
+        if should_close_db:
+            db.close()
+
+    scores: Dict[int, int] = {}
+    for key, (rejected, good) in counters.items():
+        score = outcome_score(rejected, good)
+        if score:
+            scores[key] = score
+    for key, score in _load_blocklists(settings.REPUTATION_BLOCKLIST_DIR).items():
+        scores[key] = max(scores.get(key, 0), score)
+
+    entries = array("Q", sorted((key << SCORE_BITS) | score for key, score in scores.items()))
+
+    k = max(1, round(settings.REPUTATION_BLOOM_BITS_PER_KEY * 0.693))
+    bloom_bytes = max(64, (len(entries) * settings.REPUTATION_BLOOM_BITS_PER_KEY + 63) // 64 * 8)
+    m = bloom_bytes * 8
+    bloom = bytearray(bloom_bytes)
+    for key in scores:
+        for pos in _bloom_positions(key, k, m):
+            bloom[pos >> 3] |= 1 << (pos & 7)
+
+    # State first: if we die before the index swap the next run simply rebuilds it
+    _write_state(state_path, counters, watermark, gaps)
+    _atomic_write(path, (
+        HEADER.pack(MAGIC, VERSION, k, len(entries), bloom_bytes, watermark, time.time()),
+        bytes(bloom),
+        entries.tobytes(),
+    ))
+
+    result = {
+        "numbers": len(entries),
+        "tracked": len(counters),
+        "new_log_rows": new_rows,
+        "watermark": watermark,
+        "missing_ids": len(gaps),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    log.info("[REPUTATION] Rebuilt index: %s", result)
+    return result
+
+
+# ============================================
+# SCHEDULER
+# ============================================
+
+class ReputationRebuilder:
+    """Periodic incremental rebuild; a file lock keeps it to one worker per host"""
+
+    def __init__(self, path: str, interval: int):
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="reputation-index-rebuild")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _rebuild_locked(self) -> Optional[Dict[str, object]]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None  # another worker is rebuilding
+            try:
+                return build_index(self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._rebuild_locked)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("[REPUTATION] Rebuild failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+reputation_index = ReputationIndex(settings.REPUTATION_INDEX_PATH)
+reputation_rebuilder = ReputationRebuilder(
+    settings.REPUTATION_INDEX_PATH,
+    settings.REPUTATION_REBUILD_INTERVAL_SECONDS,
+)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="RootCall global reputation index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="fold new call logs and blocklists into the index")
+    rebuild.add_argument("--full", action="store_true", help="ignore saved state and rebuild from all logs")
+    lookup = sub.add_parser("lookup", help="print the global score for a number")
+    lookup.add_argument("number")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        print(build_index(full=args.full))
+    else:
+        from app.services.phone_numbers import normalize_e164
+        print(reputation_index.lookup(normalize_e164(args.number) or args.number))
@@ -0,0 +1,288 @@
+"""
+Tagged Response Cache
+
+Short-lived cache for the JSON that portal and dashboard pages poll every
+few seconds (stats, recent calls, config, subscription, campaign stats).
+
+Every entry carries entity tags - user:{id}, phone:{id}, campaign:{id} -
+and writes drop exactly the entries tagged with what they touched:
+
+    ORM commits   - PhoneNumber, RootCallConfig, Subscription, BulkCampaign
+                    and CampaignRecipient changes are collected in
+                    after_flush and invalidated after_commit
+    call log      - call_log.write_log_batch (Core INSERTs) invalidates
+                    the phones it wrote for
+
+RESPONSE_CACHE_TTL_SECONDS bounds staleness for anything else (and for
+writes made by other processes). With RESPONSE_CACHE_INVALIDATION_BACKEND=redis
+invalidations are also published to the other workers.
+
+Responses carry a strong ETag over the body; a poll whose If-None-Match
+still matches gets a bodyless 304, whether or not the entry was cached.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.bulk_campaign import BulkCampaign, CampaignRecipient
+from app.models.phone_number import PhoneNumber
+from app.models.rootcall_config import RootCallConfig
+from app.models.subscription import Subscription
+from app.services.config_cache import INVALIDATE_ALL, RedisInvalidationBus
+
+log = logging.getLogger(__name__)
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def phone_tag(phone_number_id: int) -> str:
+    return f"phone:{phone_number_id}"
+
+
+def campaign_tag(campaign_id: int) -> str:
+    return f"campaign:{campaign_id}"
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in (etag, "*"):
+            return True
+    return False
+
+
+class _Entry:
+    __slots__ = ("expires", "etag", "body", "tags")
+
+    def __init__(self, expires: float, etag: str, body: bytes, tags: Tuple[str, ...]):
+        self.expires = expires
+        self.etag = etag
+        self.body = body
+        self.tags = tags
+
+
+class ResponseCache:
+    """key -> (ETag, JSON body), indexed by tag; thread-safe"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        # tag -> sequence number of its last invalidation, so a response built
+        # while its data was being changed is not stored
+        self._invalidated_at: Dict[str, int] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._bus: Optional[RedisInvalidationBus] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def version(self) -> int:
+        return self._seq
+
+    def set(self, key: str, body: bytes, tags: Iterable[str], since: int, ttl: Optional[float] = None) -> _Entry:
+        """Store body unless one of its tags was invalidated after since (see version())"""
+        tags = tuple(sorted(set(tags)))
+        entry = _Entry(time.monotonic() + (self.ttl if ttl is None else ttl), compute_etag(body), body, tags)
+        with self._lock:
+            if any(self._invalidated_at.get(tag, 0) > since for tag in tags):
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tag: str, publish: bool = True) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._seq += 1
+            if tag == INVALIDATE_ALL:
+                self._entries.clear()
+                self._by_tag.clear()
+                # Anything built before now is suspect
+                self._invalidated_at = {t: self._seq for t in self._invalidated_at}
+            else:
+                self._invalidated_at[tag] = self._seq
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+        if publish and self._bus is not None:
+            self._bus.publish(tag)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in set(tags):
+            self.invalidate(tag)
+
+    def clear(self, publish: bool = True) -> None:
+        self.invalidate(INVALIDATE_ALL, publish=publish)
+
+    def attach_bus(self, bus: Optional[RedisInvalidationBus]) -> None:
+        self._bus = bus
+
+    def detach_bus(self) -> Optional[RedisInvalidationBus]:
+        bus, self._bus = self._bus, None
+        return bus
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "tags": len(self._by_tag),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "pubsub": self._bus is not None,
+        }
+
+
+response_cache = ResponseCache(
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+)
+
+
+def cached_json(
+    request: Request,
+    build: Callable[[], Tuple[Any, Iterable[str]]],
+    viewer_id: int,
+    ttl: Optional[float] = None,
+) -> Response:
+    """
+    Serve the JSON for this request (viewer + path + query string) from the
+    cache, or build() -> (payload, tags) and cache it. Answers 304 when the
+    client's If-None-Match still matches. viewer_id is the authenticated
+    user the route already authorized; entries are never shared between
+    viewers, so only call this from authenticated routes.
+    """
+    key = f"{viewer_id}:{request.url.path}"
+    if request.url.query:
+        key += "?" + request.url.query
+    enabled = (response_cache.ttl if ttl is None else ttl) > 0
+    entry = response_cache.get(key) if enabled else None
+    if entry is None:
+        since = response_cache.version()
+        payload, tags = build()
+        body = json.dumps(
+            jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        if enabled:
+            entry = response_cache.set(key, body, tags, since, ttl)
+        else:
+            entry = _Entry(0, compute_etag(body), body, ())
+
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# ============================================
+# WRITE PATHS
+# ============================================
+
+def _tags_for(obj) -> Iterable[str]:
+    if isinstance(obj, PhoneNumber):
+        yield phone_tag(obj.id)
+        if obj.user_id is not None:
+            yield user_tag(obj.user_id)
+    elif isinstance(obj, RootCallConfig):
+        if obj.phone_number_id is not None:
+            yield phone_tag(obj.phone_number_id)
+        if obj.user_id is not None:
+            yield user_tag(obj.user_id)
+    elif isinstance(obj, Subscription):
+        yield user_tag(obj.user_id)
+    elif isinstance(obj, BulkCampaign):
+        yield campaign_tag(obj.id)
+        yield user_tag(obj.user_id)
+    elif isinstance(obj, CampaignRecipient):
+        yield campaign_tag(obj.campaign_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_cache_tags(session, flush_context):
+    tags: Set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags.update(_tags_for(obj))
+    if tags:
+        session.info.setdefault("response_cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cache_tags(session):
+    tags = session.info.pop("response_cache_tags", None)
+    if tags:
+        response_cache.invalidate_tags(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_tags(session):
+    session.info.pop("response_cache_tags", None)
+
+
+async def start_response_cache() -> None:
+    if settings.RESPONSE_CACHE_INVALIDATION_BACKEND != "redis":
+        return
+    try:
+        bus = RedisInvalidationBus(settings.REDIS_URL, settings.RESPONSE_CACHE_INVALIDATION_CHANNEL)
+    except Exception as e:
+        log.error("Response cache Redis pub/sub unavailable (%s), local invalidation only", e)
+        return
+    response_cache.attach_bus(bus)
+    bus.start(response_cache)
+
+
+async def stop_response_cache() -> None:
+    bus = response_cache.detach_bus()
+    if bus is not None:
+        await bus.stop()
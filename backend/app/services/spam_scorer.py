@@ -0,0 +1,209 @@
+"""
+Spam Scoring Engine
+
+Scores an inbound call 0-100 from four signals:
+
+    CNAM       - all caller-id-name patterns are compiled once into a single
+                 regex alternation (one pass over the string, no per-call
+                 list building or lowercasing loops); the strongest match wins
+    reputation - per-caller score kept in memory and nudged towards 100 or 0
+                 every time a screening outcome is recorded for that number
+    global     - cross-tenant score from the memory-mapped reputation index
+                 (see reputation_index)
+    velocity   - calls/DIDs dialed by this number in the last few minutes
+                 (see caller_velocity)
+
+They are combined as a noisy-OR, so any one alone can push a call over
+SPAM_BLOCK_THRESHOLD. Scoring is pure in-memory work (a few microseconds).
+Reputation is per worker process and bounded by SPAM_REPUTATION_MAX_ENTRIES
+(least recently seen callers are forgotten first).
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.reputation_index import reputation_index
+from app.services.caller_velocity import caller_velocity
+
+# (pattern, weight) - weight is the spam score a CNAM match alone implies
+CNAM_PATTERNS: List[Tuple[str, int]] = [
+    # Carrier spam labels and the legacy keyword list - block on their own
+    (r"spam", 95),
+    (r"scam", 95),
+    (r"fraud", 95),
+    (r"robo\s*call", 95),
+    (r"tele\s*market(?:er|ing)", 90),
+    (r"(?:potential|suspected|likely)\s+(?:spam|scam|fraud)", 95),
+    # Common robocall/scam caller names
+    (r"\birs\b|internal\s+revenue", 80),
+    (r"social\s+security|ssa\s+admin", 80),
+    (r"medicare\s+(?:benefits|enrollment|services)", 75),
+    (r"car\s+warranty|auto\s+warranty|vehicle\s+service", 80),
+    (r"debt\s+(?:relief|collect)", 65),
+    (r"\b(?:sweepstakes|prize|lottery|you\s+(?:won|win))\b", 80),
+    (r"\bsurvey", 45),
+    (r"toll\s*free", 40),
+    # Anonymous callers - weak on their own
+    (r"\b(?:unknown|unavailable|anonymous|private|restricted|withheld|no\s+caller\s+id)\b", 30),
+    (r"wireless\s+caller|out\s+of\s+area", 20),
+]
+
+# Outcome -> reputation target (100 = spam, 0 = legitimate)
+# spam_blocked is not learned from: the scorer caused it, and a blocked caller never
+# gets the chance to produce a good outcome that would bring the score back down
+OUTCOME_TARGETS: Dict[str, int] = {
+    # Pressed "all other calls" and got turned away; alone it never reaches the threshold
+    "rejected": 60,
+    "medical_transferred": 0,
+    "family_transferred": 0,
+    "trusted_forwarded": 0,
+}
+
+# How far one outcome moves the reputation towards its target
+REPUTATION_LEARNING_RATE = 0.35
+
+
+class SpamVerdict:
+    """Result of scoring one call"""
+    __slots__ = ("score", "cnam_score", "reputation_score", "global_score", "velocity_score", "matches", "threshold")
+
+    def __init__(self, score: int, cnam_score: int, reputation_score: int, global_score: int,
+                 velocity_score: int, matches: List[str], threshold: int):
+        self.score = score
+        self.cnam_score = cnam_score
+        self.reputation_score = reputation_score
+        self.global_score = global_score
+        self.velocity_score = velocity_score
+        self.matches = matches
+        self.threshold = threshold
+
+    @property
+    def is_spam(self) -> bool:
+        return self.score >= self.threshold
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "score": self.score,
+            "is_spam": self.is_spam,
+            "cnam_score": self.cnam_score,
+            "reputation_score": self.reputation_score,
+            "global_score": self.global_score,
+            "velocity_score": self.velocity_score,
+            "matches": self.matches,
+        }
+
+
+class CnamMatcher:
+    """All CNAM patterns in one compiled alternation, one named group per pattern"""
+
+    def __init__(self, patterns: List[Tuple[str, int]]):
+        self.weights: Dict[str, int] = {}
+        parts = []
+        for i, (pattern, weight) in enumerate(patterns):
+            group = f"p{i}"
+            self.weights[group] = weight
+            parts.append(f"(?P<{group}>{pattern})")
+        self._regex = re.compile("|".join(parts), re.IGNORECASE)
+
+    def score(self, cnam: Optional[str]) -> Tuple[int, List[str]]:
+        if not cnam:
+            return 0, []
+        best = 0
+        matches = []
+        for match in self._regex.finditer(cnam):
+            group = match.lastgroup
+            matches.append(match.group(group))
+            best = max(best, self.weights[group])
+        return best, matches
+
+
+class CallerReputation:
+    """Bounded LRU of caller -> (score 0-100, observations)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, caller: str) -> Tuple[float, int]:
+        entry = self._entries.get(caller)
+        if entry is None:
+            return 0.0, 0
+        return entry[0], int(entry[1])
+
+    def record(self, caller: str, outcome: str) -> Optional[float]:
+        target = OUTCOME_TARGETS.get(outcome)
+        if target is None or not caller:
+            return None
+        with self._lock:
+            entry = self._entries.get(caller)
+            if entry is None:
+                # First observation sets the score outright
+                entry = self._entries[caller] = [float(target), 1]
+            else:
+                entry[0] += REPUTATION_LEARNING_RATE * (target - entry[0])
+                entry[1] += 1
+                self._entries.move_to_end(caller)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry[0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SpamScorer:
+    def __init__(self, threshold: int, max_reputation_entries: int, global_index=None, velocity=None):
+        self.threshold = threshold
+        self.matcher = CnamMatcher(CNAM_PATTERNS)
+        self.reputation = CallerReputation(max_reputation_entries)
+        self.global_index = global_index
+        self.velocity = velocity
+        self.scored = 0
+        self.flagged = 0
+
+    def reputation_score(self, caller: str) -> int:
+        score, observations = self.reputation.get(caller)
+        if not observations:
+            return 0
+        # One bad outcome is not proof; full weight from the third observation on
+        confidence = min(observations, 3) / 3
+        return int(round(score * confidence))
+
+    def score(self, caller: str, cnam: Optional[str] = None) -> SpamVerdict:
+        cnam_score, matches = self.matcher.score(cnam)
+        reputation_score = self.reputation_score(caller)
+        global_score = self.global_index.lookup(caller) if self.global_index is not None else 0
+        velocity_score = self.velocity.score(caller) if self.velocity is not None else 0
+        clean = 100.0
+        for signal in (cnam_score, reputation_score, global_score, velocity_score):
+            clean *= (100 - signal) / 100
+        verdict = SpamVerdict(int(round(100 - clean)), cnam_score, reputation_score, global_score,
+                              velocity_score, matches, self.threshold)
+        self.scored += 1
+        if verdict.is_spam:
+            self.flagged += 1
+        return verdict
+
+    def record_outcome(self, caller: str, outcome: str) -> None:
+        self.reputation.record(caller, outcome)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threshold": self.threshold,
+            "scored": self.scored,
+            "flagged": self.flagged,
+            "tracked_callers": len(self.reputation),
+        }
+
+
+spam_scorer = SpamScorer(
+    threshold=settings.SPAM_BLOCK_THRESHOLD,
+    max_reputation_entries=settings.SPAM_REPUTATION_MAX_ENTRIES,
+    global_index=reputation_index,
+    velocity=caller_velocity,
+)
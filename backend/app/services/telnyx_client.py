@@ -0,0 +1,191 @@
+"""
+Shared Telnyx Call Control client
+
+One pooled httpx.AsyncClient for the whole app lifetime, so call-control
+actions during a live call reuse warm keep-alive (HTTP/2 when available)
+connections instead of paying a TCP+TLS handshake per action.
+
+Created/closed from the FastAPI lifespan in app/main.py.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class TelnyxCallControl:
+    """Pooled async client with typed Call Control / messaging actions"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: float = 10.0,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: float = 30.0,
+    ):
+        self.api_key = (api_key or settings.TELNYX_API_KEY or "").strip()
+        self.base_url = (base_url or settings.TELNYX_BASE_URL).rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.TELNYX_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or settings.TELNYX_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def has_api_key(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Underlying pooled client (created lazily if lifespan did not start it)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=HTTP2_AVAILABLE,
+            )
+        return self._client
+
+    async def start(self) -> None:
+        _ = self.client
+        log.info("Telnyx client started (http2=%s, max_connections=%s)",
+                 HTTP2_AVAILABLE, self.limits.max_connections)
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    # ------------------------------------------------------------------
+    # Low-level
+    # ------------------------------------------------------------------
+
+    async def post(self, path: str, json: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """POST to a path relative to the Telnyx v2 base URL (absolute URLs also accepted)"""
+        if path.startswith(self.base_url):
+            path = path[len(self.base_url):]
+        return await self.client.post(path, json=json if json is not None else {})
+
+    async def get(self, path: str) -> httpx.Response:
+        """GET a path relative to the Telnyx v2 base URL"""
+        if path.startswith(self.base_url):
+            path = path[len(self.base_url):]
+        return await self.client.get(path)
+
+    async def call_action(self, ccid: str, action: str, payload: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        return await self.post(f"/calls/{ccid}/actions/{action}", payload)
+
+    async def get_call(self, ccid: str) -> httpx.Response:
+        """Call status; data.is_alive is false (or 404) once the call is over"""
+        return await self.get(f"/calls/{ccid}")
+
+    # ------------------------------------------------------------------
+    # Call Control actions
+    # ------------------------------------------------------------------
+
+    async def answer(self, ccid: str) -> httpx.Response:
+        return await self.call_action(ccid, "answer")
+
+    async def hangup(self, ccid: str) -> httpx.Response:
+        return await self.call_action(ccid, "hangup")
+
+    async def speak(self, ccid: str, text: str, voice: str = "female", language: str = "en-US") -> httpx.Response:
+        return await self.call_action(ccid, "speak", {
+            "payload": text,
+            "voice": voice,
+            "language": language,
+        })
+
+    async def gather_using_speak(
+        self,
+        ccid: str,
+        text: str,
+        valid_digits: str = "1234567890*#",
+        timeout_millis: int = 10000,
+        minimum_digits: int = 1,
+        maximum_digits: int = 1,
+        voice: str = "female",
+        language: str = "en-US",
+    ) -> httpx.Response:
+        return await self.call_action(ccid, "gather_using_speak", {
+            "payload": text,
+            "voice": voice,
+            "language": language,
+            "valid_digits": valid_digits,
+            "timeout_millis": timeout_millis,
+            "maximum_digits": maximum_digits,
+            "minimum_digits": minimum_digits,
+        })
+
+    async def transfer(self, ccid: str, to: str) -> httpx.Response:
+        return await self.call_action(ccid, "transfer", {"to": to})
+
+    async def record_start(
+        self,
+        ccid: str,
+        format: str = "mp3",
+        channels: str = "single",
+        max_length: Optional[int] = None,
+        play_beep: bool = True,
+    ) -> httpx.Response:
+        payload: Dict[str, Any] = {"format": format, "channels": channels, "play_beep": play_beep}
+        if max_length is not None:
+            payload["max_length"] = max_length
+        return await self.call_action(ccid, "record_start", payload)
+
+    async def record_stop(self, ccid: str) -> httpx.Response:
+        return await self.call_action(ccid, "record_stop")
+
+    # ------------------------------------------------------------------
+    # Messaging
+    # ------------------------------------------------------------------
+
+    async def send_message(self, from_number: str, to_number: str, text: str) -> httpx.Response:
+        return await self.post("/messages", {"from": from_number, "to": to_number, "text": text})
+
+
+# App-lifetime instance
+_client: Optional[TelnyxCallControl] = None
+
+
+def get_telnyx_client() -> TelnyxCallControl:
+    """Return the shared client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = TelnyxCallControl()
+    return _client
+
+
+async def start_telnyx_client() -> TelnyxCallControl:
+    client = get_telnyx_client()
+    await client.start()
+    return client
+
+
+async def close_telnyx_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,267 @@
+"""
+Trusted Contacts Index
+
+The TrustedContact table (unique on rootcall_config_id + phone_number) is the
+source of truth for who gets forwarded straight to the client. Numbers are
+normalized to E.164 on every write, so "+1 (754) 331-4009", "754-331-4009"
+and "+17543314009" are the same contact.
+
+At read time the whole list for a config is loaded once into a frozenset
+that lives inside the cached routing config (see config_cache), so the
+screening check is a single O(1) membership test. Every write goes through
+this module, which commits, mirrors the list into the legacy
+RootCallConfig.trusted_contacts JSON column and invalidates the cached
+config for the DID.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.rootcall_config import RootCallConfig, TrustedContact
+from app.services.phone_numbers import normalize_batch, normalize_e164
+
+log = logging.getLogger("rootcall")
+
+# Rows per INSERT statement for bulk imports
+IMPORT_BATCH_SIZE = 500
+
+# ============================================
+# READ PATH
+# ============================================
+
+def load_trusted_set(db: Session, config: RootCallConfig) -> FrozenSet[str]:
+    """All active trusted numbers for a config (table rows + any legacy JSON entries)"""
+    rows = db.query(TrustedContact.phone_number).filter(
+        TrustedContact.rootcall_config_id == config.id,
+        TrustedContact.is_active == True
+    ).all()
+    numbers = {number for (number,) in rows}
+    for legacy in config.trusted_contacts or []:
+        normalized = normalize_e164(legacy)
+        if normalized:
+            numbers.add(normalized)
+    return frozenset(numbers)
+
+
+def trusted_set_from_list(numbers: Iterable[Any]) -> FrozenSet[str]:
+    """Frozenset of normalized numbers from a plain list (hardcoded configs)"""
+    return frozenset(n for n in (normalize_e164(x) for x in numbers or ()) if n)
+
+
+def list_trusted_contacts(db: Session, config: RootCallConfig) -> List[Dict[str, Any]]:
+    rows = db.query(TrustedContact).filter(
+        TrustedContact.rootcall_config_id == config.id,
+        TrustedContact.is_active == True
+    ).order_by(TrustedContact.name, TrustedContact.phone_number).all()
+    return [
+        {
+            "phone_number": row.phone_number,
+            "name": row.name if row.name != row.phone_number else "",
+            "relationship_type": row.relationship_type,
+        }
+        for row in rows
+    ]
+
+
+# ============================================
+# WRITE PATH
+# ============================================
+
+def _sync_config(db: Session, config: RootCallConfig) -> None:
+    """Commit, mirror into the legacy JSON column and drop the cached config"""
+    from app.services.client_config import invalidate_client_config
+
+    rows = db.query(TrustedContact.phone_number, TrustedContact.is_active).filter(
+        TrustedContact.rootcall_config_id == config.id
+    ).order_by(TrustedContact.id).all()
+    known = {number for number, _ in rows}
+    active = [number for number, is_active in rows if is_active]
+
+    # Entries written straight into the JSON column by older code become rows
+    promoted = []
+    for legacy in config.trusted_contacts or []:
+        normalized = normalize_e164(legacy)
+        if normalized and normalized not in known:
+            known.add(normalized)
+            promoted.append({
+                "rootcall_config_id": config.id,
+                "phone_number": normalized,
+                "name": normalized,
+                "is_active": True,
+                "total_calls": 0,
+            })
+            active.append(normalized)
+    if promoted:
+        db.execute(insert(TrustedContact), promoted)
+
+    # Reassign so SQLAlchemy sees the JSON column change
+    config.trusted_contacts = active
+    db.commit()
+    if config.phone_number is not None:
+        invalidate_client_config(config.phone_number.phone_number)
+
+
+def add_trusted_contacts(
+    db: Session,
+    config: RootCallConfig,
+    contacts: Iterable[Tuple[Any, Optional[str]]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Add (phone_number, name) pairs to a config in batched multi-row INSERTs.
+
+    Returns counts plus the raw values that could not be normalized.
+    Existing numbers are skipped (re-activated if they had been removed).
+    """
+    existing = {
+        row.phone_number: row
+        for row in db.query(TrustedContact).filter(
+            TrustedContact.rootcall_config_id == config.id
+        ).all()
+    }
+
+    contacts = list(contacts)
+    batch = normalize_batch(raw_number for raw_number, _ in contacts)
+
+    pending: Dict[str, Dict[str, Any]] = {}
+    duplicates = 0
+    reactivated = 0
+
+    for normalized, (_, name) in zip(batch.numbers, contacts):
+        if normalized is None:
+            continue
+        row = existing.get(normalized)
+        if row is not None:
+            if row.is_active:
+                duplicates += 1
+            else:
+                row.is_active = True
+                if name:
+                    row.name = name
+                reactivated += 1
+            continue
+        if normalized in pending:
+            duplicates += 1
+            continue
+        pending[normalized] = {
+            "rootcall_config_id": config.id,
+            "phone_number": normalized,
+            "name": (name or "").strip() or normalized,
+            "is_active": True,
+            "total_calls": 0,
+        }
+
+    try:
+        values = list(pending.values())
+        for start in range(0, len(values), batch_size):
+            db.execute(insert(TrustedContact), values[start:start + batch_size])
+        if values or reactivated:
+            _sync_config(db, config)
+    except Exception:
+        db.rollback()
+        raise
+
+    added = len(pending) + reactivated
+    if added:
+        log.info(f"[TRUSTED] Added {added} trusted contacts to config {config.id}")
+    return {
+        "added": added,
+        "duplicates": duplicates,
+        "rejected": len(batch.rejects),
+        "rejects": [r.to_dict() for r in batch.rejects[:100]],
+    }
+
+
+def add_trusted_contact(db: Session, config: RootCallConfig, phone_number: Any, name: Optional[str] = None) -> bool:
+    """Add one contact; False if it was invalid or already trusted"""
+    return add_trusted_contacts(db, config, [(phone_number, name)])["added"] == 1
+
+
+def remove_trusted_contact(db: Session, config: RootCallConfig, phone_number: Any) -> bool:
+    """Remove a contact; False if it was not on the list"""
+    normalized = normalize_e164(phone_number)
+    if not normalized:
+        return False
+    row = db.query(TrustedContact).filter(
+        TrustedContact.rootcall_config_id == config.id,
+        TrustedContact.phone_number == normalized
+    ).first()
+    legacy = config.trusted_contacts or []
+    remaining = [n for n in legacy if normalize_e164(n) != normalized]
+    if row is None and len(remaining) == len(legacy):
+        return False
+    try:
+        if row is not None:
+            db.delete(row)
+        # Drop it from the JSON mirror too, or _sync_config would promote it back
+        config.trusted_contacts = remaining
+        db.flush()
+        _sync_config(db, config)
+    except Exception:
+        db.rollback()
+        raise
+    return True
+
+
+# ============================================
+# IMPORT PARSERS
+# ============================================
+
+_PHONE_COLUMNS = ("phone_number", "phone", "number", "mobile", "cell", "telephone")
+_NAME_COLUMNS = ("name", "full_name", "contact", "display_name")
+
+
+def parse_contacts_csv(text: str) -> List[Tuple[str, Optional[str]]]:
+    """(number, name) pairs from a CSV with a header row (phone_number/phone/..., name)"""
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {(f or "").strip().lower(): f for f in reader.fieldnames or []}
+    phone_col = next((fields[c] for c in _PHONE_COLUMNS if c in fields), None)
+    name_col = next((fields[c] for c in _NAME_COLUMNS if c in fields), None)
+    if phone_col is None:
+        raise ValueError("CSV needs a phone_number (or phone) column")
+
+    contacts = []
+    for row in reader:
+        number = (row.get(phone_col) or "").strip()
+        if number:
+            name = (row.get(name_col) or "").strip() if name_col else None
+            contacts.append((number, name or None))
+    return contacts
+
+
+def parse_vcard(text: str) -> List[Tuple[str, Optional[str]]]:
+    """(number, name) pairs from a .vcf export - one pair per TEL line"""
+    contacts = []
+    name: Optional[str] = None
+    numbers: List[str] = []
+    # Undo RFC 6350 line folding
+    unfolded = re.sub(r"\r?\n[ \t]", "", text)
+    for line in unfolded.splitlines():
+        key, _, value = line.partition(":")
+        prop = key.split(";", 1)[0].strip().upper()
+        # Grouped properties look like "item1.TEL"
+        prop = prop.rsplit(".", 1)[-1]
+        if prop == "BEGIN":
+            name, numbers = None, []
+        elif prop == "FN":
+            name = value.strip() or None
+        elif prop == "TEL":
+            numbers.append(value.strip().replace("tel:", ""))
+        elif prop == "END":
+            contacts.extend((number, name) for number in numbers if number)
+            name, numbers = None, []
+    return contacts
+
+
+def parse_contacts_file(filename: str, content: bytes) -> List[Tuple[str, Optional[str]]]:
+    text = content.decode("utf-8-sig", errors="replace")
+    if (filename or "").lower().endswith((".vcf", ".vcard")) or text.lstrip().upper().startswith("BEGIN:VCARD"):
+        return parse_vcard(text)
+    return parse_contacts_csv(text)
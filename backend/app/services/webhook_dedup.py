@@ -0,0 +1,217 @@
+"""
+Webhook De-duplication
+
+Telnyx and Retell redeliver webhooks (timeouts, 5xx, network blips). Every
+webhook route depends on one of the dedupe_* dependencies below, which
+claim the event id in a TTL store *before* any DB or API work happens. A
+redelivered event is answered with 200 {"status": "duplicate"} and never
+reaches the handler.
+
+Backends:
+    memory - in-process LRU with TTL (default, per worker)
+    redis  - SET NX EX, shared by all workers (WEBHOOK_DEDUP_BACKEND=redis)
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency
+    aioredis = None
+
+
+class DuplicateWebhookEvent(Exception):
+    """Raised by the dedupe dependencies for an already-seen event"""
+
+    def __init__(self, key: str):
+        super().__init__(key)
+        self.key = key
+
+
+# ============================================
+# BACKENDS
+# ============================================
+
+class MemoryDedupBackend:
+    """In-process LRU of event keys with per-entry expiry - O(1) claim/release"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    async def claim(self, key: str, ttl: int) -> bool:
+        now = time.monotonic()
+        expires_at = self._entries.get(key)
+        if expires_at is not None and expires_at > now:
+            self._entries.move_to_end(key)
+            return False
+        self._entries[key] = now + ttl
+        self._entries.move_to_end(key)
+        # Evict least-recently-seen entries (expired ones first by construction)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return True
+
+    async def release(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisDedupBackend:
+    """Shared store: one SET NX EX round-trip per event"""
+
+    def __init__(self, url: str, prefix: str = "webhook:seen:"):
+        if aioredis is None:
+            raise RuntimeError("redis package not installed (pip install redis)")
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    async def claim(self, key: str, ttl: int) -> bool:
+        return bool(await self._redis.set(self.prefix + key, "1", nx=True, ex=ttl))
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self.prefix + key)
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+# ============================================
+# STORE
+# ============================================
+
+class WebhookDedupStore:
+    """Claims event keys; fails open if the backend is unavailable"""
+
+    def __init__(self, backend: Any, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.accepted = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    async def claim(self, key: str) -> bool:
+        try:
+            ok = await self.backend.claim(key, self.ttl)
+        except Exception as e:
+            # Processing an event twice beats dropping it
+            self.errors += 1
+            log.error("[DEDUP] Backend error for %s: %s", key, e)
+            return True
+        if ok:
+            self.accepted += 1
+        else:
+            self.duplicates += 1
+        return ok
+
+    async def release(self, key: str) -> None:
+        try:
+            await self.backend.release(key)
+        except Exception as e:
+            self.errors += 1
+            log.error("[DEDUP] Release failed for %s: %s", key, e)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
+
+
+def _build_store() -> WebhookDedupStore:
+    backend: Any
+    if settings.WEBHOOK_DEDUP_BACKEND == "redis":
+        try:
+            backend = RedisDedupBackend(settings.REDIS_URL)
+        except Exception as e:
+            log.error("[DEDUP] Redis backend unavailable (%s), using memory", e)
+            backend = MemoryDedupBackend(settings.WEBHOOK_DEDUP_MAX_ENTRIES)
+    else:
+        backend = MemoryDedupBackend(settings.WEBHOOK_DEDUP_MAX_ENTRIES)
+    return WebhookDedupStore(backend, settings.WEBHOOK_DEDUP_TTL_SECONDS)
+
+
+webhook_dedup = _build_store()
+
+
+# ============================================
+# EVENT KEYS
+# ============================================
+
+def telnyx_event_key(body: Dict[str, Any]) -> Optional[str]:
+    """Telnyx puts a unique event id in data.id (stable across redeliveries)"""
+    data = body.get("data") or {}
+    event_id = data.get("id")
+    return f"telnyx:{event_id}" if event_id else None
+
+
+def retell_event_key(body: Dict[str, Any]) -> Optional[str]:
+    """Retell has no event id; each event type fires once per call"""
+    event = body.get("event")
+    call_id = body.get("call_id") or (body.get("call") or {}).get("call_id")
+    return f"retell:{event}:{call_id}" if event and call_id else None
+
+
+# ============================================
+# FASTAPI DEPENDENCIES
+# ============================================
+
+def _dedupe_dependency(key_fn):
+    async def dependency(request: Request):
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+        key = key_fn(body) if isinstance(body, dict) else None
+
+        if key and not await webhook_dedup.claim(key):
+            log.info("[DEDUP] Duplicate webhook %s ignored", key)
+            raise DuplicateWebhookEvent(key)
+
+        request.state.webhook_event_key = key
+        try:
+            yield key
+        except Exception:
+            # Handler failed - let the provider's redelivery through
+            if key:
+                await webhook_dedup.release(key)
+            raise
+
+    return dependency
+
+
+dedupe_telnyx_event = _dedupe_dependency(telnyx_event_key)
+dedupe_retell_event = _dedupe_dependency(retell_event_key)
+
+
+async def release_webhook_event(request: Request) -> None:
+    """Forget the claimed event so a redelivery is processed (e.g. we returned 503)"""
+    key = getattr(request.state, "webhook_event_key", None)
+    if key:
+        await webhook_dedup.release(key)
+
+
+async def duplicate_webhook_handler(request: Request, exc: DuplicateWebhookEvent):
+    return JSONResponse(status_code=200, content={"status": "duplicate", "event": exc.key})
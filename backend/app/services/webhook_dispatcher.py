@@ -0,0 +1,146 @@
+"""
+Webhook Dispatcher - acknowledge fast, process in the background
+
+Webhook routes validate the event, enqueue it here and return 200 right
+away. Work is sharded by call_control_id: every event for one call lands
+on the same bounded queue and is handled by a single worker coroutine, so
+events for a call stay strictly ordered while different calls run in
+parallel on other shards.
+
+Started/stopped from the FastAPI lifespan in app/main.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class _Shard:
+    __slots__ = ("index", "queue", "task", "processed", "failed", "last_lag_ms", "max_lag_ms", "total_lag_ms")
+
+    def __init__(self, index: int, maxsize: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.total_lag_ms = 0.0
+
+
+class WebhookDispatcher:
+    """Sharded, bounded, per-key ordered background dispatcher"""
+
+    def __init__(self, name: str = "webhooks", shards: Optional[int] = None, queue_maxsize: Optional[int] = None):
+        self.name = name
+        self.shard_count = shards or settings.WEBHOOK_DISPATCH_SHARDS
+        self.queue_maxsize = queue_maxsize or settings.WEBHOOK_QUEUE_MAXSIZE
+        self._shards: List[_Shard] = []
+        self.enqueued = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._shards) and all(s.task and not s.task.done() for s in self._shards)
+
+    def start(self) -> None:
+        """Create shard queues and worker tasks (idempotent, needs a running loop)"""
+        if self.running:
+            return
+        self._shards = [_Shard(i, self.queue_maxsize) for i in range(self.shard_count)]
+        for shard in self._shards:
+            shard.task = asyncio.create_task(self._worker(shard), name=f"{self.name}-shard-{shard.index}")
+        log.info("[DISPATCH] %s started with %s shards (queue max %s)",
+                 self.name, self.shard_count, self.queue_maxsize)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let queued events finish (up to drain_timeout), then stop workers"""
+        if not self._shards:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(s.queue.join() for s in self._shards)),
+                timeout=drain_timeout,
+            )
+        except asyncio.TimeoutError:
+            log.warning("[DISPATCH] %s drain timed out with %s events pending", self.name, self.depth())
+        for shard in self._shards:
+            if shard.task:
+                shard.task.cancel()
+        await asyncio.gather(*(s.task for s in self._shards if s.task), return_exceptions=True)
+        self._shards = []
+
+    def shard_for(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.shard_count
+
+    def submit(self, key: str, handler: Handler, *args: Any, **kwargs: Any) -> bool:
+        """
+        Enqueue handler(*args, **kwargs) on the shard owning key.
+
+        Returns False when that shard's queue is full; callers should answer
+        with a retryable status so the provider redelivers later.
+        """
+        self.start()
+        shard = self._shards[self.shard_for(key)]
+        try:
+            shard.queue.put_nowait((time.monotonic(), key, handler, args, kwargs))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            log.warning("[DISPATCH] %s shard %s full, rejecting event for %s", self.name, shard.index, key)
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, shard: _Shard) -> None:
+        while True:
+            enqueued_at, key, handler, args, kwargs = await shard.queue.get()
+            lag_ms = (time.monotonic() - enqueued_at) * 1000
+            shard.last_lag_ms = lag_ms
+            shard.max_lag_ms = max(shard.max_lag_ms, lag_ms)
+            shard.total_lag_ms += lag_ms
+            try:
+                await handler(*args, **kwargs)
+                shard.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                shard.failed += 1
+                log.exception("[DISPATCH] %s handler failed for %s: %s", self.name, key, e)
+            finally:
+                shard.queue.task_done()
+
+    def depth(self) -> int:
+        return sum(s.queue.qsize() for s in self._shards)
+
+    def stats(self) -> Dict[str, Any]:
+        processed = sum(s.processed for s in self._shards)
+        total_lag = sum(s.total_lag_ms for s in self._shards)
+        return {
+            "name": self.name,
+            "running": self.running,
+            "shards": self.shard_count,
+            "queue_maxsize": self.queue_maxsize,
+            "queue_depth": self.depth(),
+            "max_shard_depth": max((s.queue.qsize() for s in self._shards), default=0),
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "processed": processed,
+            "failed": sum(s.failed for s in self._shards),
+            "lag_ms_avg": round(total_lag / processed, 2) if processed else 0.0,
+            "lag_ms_max": round(max((s.max_lag_ms for s in self._shards), default=0.0), 2),
+            "lag_ms_last": round(max((s.last_lag_ms for s in self._shards), default=0.0), 2),
+        }
+
+
+# App-lifetime instance used by the Telnyx screening webhook
+screen_dispatcher = WebhookDispatcher(name="rootcall-screen")
@@ -0,0 +1,94 @@
+"""
+Job Worker
+
+Runs the durable job queue (services/job_queue) outside the web app:
+
+    python -m app.worker [--processes N] [--concurrency M]
+
+starts N worker processes (JOB_WORKER_PROCESSES), each running up to M jobs
+at once (JOB_WORKER_CONCURRENCY) with database connections of its own.
+SIGTERM / SIGINT stop claiming, give running jobs JOB_SHUTDOWN_GRACE_SECONDS
+to finish and hand the rest back to the queue. A worker that dies without
+that loses its leases, and other workers pick its jobs up when they expire.
+
+Campaign progress goes out on the dashboard event bus; set
+DASHBOARD_PUBSUB_BACKEND=redis so it reaches the SSE streams the web app
+serves.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+from app.config import settings
+
+log = logging.getLogger("app.worker")
+
+
+async def serve(concurrency: int) -> None:
+    import app.services.jobs  # noqa: F401  (registers the handlers)
+    from app.services.campaign_progress import campaign_progress
+    from app.services.event_bus import event_bus
+    from app.services.job_queue import build_worker
+
+    if settings.DASHBOARD_PUBSUB_BACKEND != "redis":
+        log.warning("DASHBOARD_PUBSUB_BACKEND is not redis: campaign progress from this worker "
+                    "won't reach the web app's SSE streams")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    worker = build_worker(concurrency)
+    await event_bus.start()
+    campaign_progress.start()
+    worker.start()
+    try:
+        await stopping.wait()
+    finally:
+        await worker.stop(grace=settings.JOB_SHUTDOWN_GRACE_SECONDS)
+        await campaign_progress.stop()
+        await event_bus.close()
+        log.info("Worker stats: %s", worker.stats())
+
+
+def _run_process(concurrency: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(serve(concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                        help="jobs per process")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.concurrency)
+        return
+
+    # Fresh interpreters: nothing (engine pool, event loop) is shared with the parent
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_run_process, args=(args.concurrency,), name=f"job-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: graceful stop in the child
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Archive file format round trip"""
+from datetime import datetime
+
+from app.services.call_archive import TABLES, decode_rows, encode_rows
+
+
+def test_rows_round_trip():
+    table = TABLES["rootcall_call_logs"]
+    columns = ["id", "phone_number_id", "from_number", "action", "timestamp"]
+    rows = [
+        (1, 7, "+18135550101", "spam_blocked", datetime(2026, 1, 5, 9, 30)),
+        (2, None, "+18135550102", "screened", datetime(2026, 1, 31, 23, 59, 59)),
+    ]
+    extension, blob = encode_rows(columns, rows)
+    assert extension in ("parquet", "json.gz")
+    assert decode_rows(table, extension, blob) == [dict(zip(columns, row)) for row in rows]
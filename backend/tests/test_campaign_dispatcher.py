@@ -0,0 +1,57 @@
+"""Token bucket pacing for campaign dispatch"""
+import pytest
+
+from app.services.campaign_dispatcher import Throttle, TokenBucket, build_throttle
+
+
+def bucket(per_period, period, burst=1):
+    b = TokenBucket(per_period, period, burst)
+    b.updated = 0.0
+    return b
+
+
+def test_starts_full_and_spaces_sends_evenly():
+    b = bucket(60, 60)
+    assert b.delay(0.0) == 0.0
+    b.take(0.0)
+    assert b.delay(0.0) == pytest.approx(1.0)
+    assert b.delay(0.25) == pytest.approx(0.75)
+    assert b.delay(1.0) == 0.0
+
+
+def test_capacity_is_burst_capped_by_rate_and_at_least_one():
+    assert bucket(10, 60, burst=5).capacity == 5
+    assert bucket(2, 60, burst=5).capacity == 2
+    assert bucket(10, 60, burst=0).capacity == 1
+
+
+def test_refill_stops_at_capacity():
+    b = bucket(60, 60, burst=3)
+    for _ in range(3):
+        b.take(0.0)
+    assert b.delay(0.0) == pytest.approx(1.0)
+    assert b.delay(3600.0) == 0.0
+    assert b.tokens == 3
+
+
+def test_time_going_backwards_does_not_refill():
+    b = bucket(60, 60)
+    b.take(10.0)
+    assert b.delay(5.0) == pytest.approx(1.0)
+
+
+def test_throttle_waits_for_the_strictest_bucket():
+    # 10/minute and 100/hour: one send every 36 seconds
+    throttle = build_throttle(10, 100, burst=1)
+    for b in throttle.buckets:
+        b.updated = 0.0
+    assert throttle.delay(0.0) == 0.0
+    throttle.take(0.0)
+    assert throttle.delay(0.0) == pytest.approx(36.0)
+    assert throttle.delay(36.0) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_no_limits_is_no_throttle():
+    assert build_throttle(0, 0, burst=1) is None
+    assert isinstance(build_throttle(5, 0, burst=1), Throttle)
+    assert len(build_throttle(5, 0, burst=1).buckets) == 1
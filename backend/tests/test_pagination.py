@@ -0,0 +1,75 @@
+"""Keyset pagination: cursor encoding and walking pages by (key, id)"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine
+from sqlalchemy.orm import Session
+
+from app.services.pagination import _after, decode_cursor, encode_cursor, paginate
+
+metadata = MetaData()
+events = Table(
+    "events", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("at", DateTime, nullable=False),
+)
+KEYS_DESC = [(events.c.at, True), (events.c.id, True)]
+KEYS_ASC = [(events.c.at, False), (events.c.id, False)]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        # Ties on "at" so pages have to fall back to id
+        conn.execute(events.insert(), [
+            {"id": i, "at": start + timedelta(minutes=i // 3)} for i in range(1, 11)
+        ])
+    with Session(engine) as session:
+        yield session
+
+
+def test_cursor_round_trip():
+    at = datetime(2026, 3, 4, 5, 6, 7, 890000)
+    cursor = encode_cursor([at, 42])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, KEYS_DESC) == [at, 42]
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor([1]), encode_cursor(["yesterday", 1]), "e30"])
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, KEYS_DESC)
+    assert exc.value.status_code == 400
+
+
+def test_after_is_strictly_after_the_key(db):
+    at = datetime(2026, 1, 1, 0, 1)  # ids 3, 4, 5
+    ids = [row.id for row in db.query(events).filter(_after(KEYS_DESC, [at, 4])).order_by(events.c.id)]
+    assert ids == [1, 2, 3]
+    ids = [row.id for row in db.query(events).filter(_after(KEYS_ASC, [at, 4])).order_by(events.c.id)]
+    assert ids == [5, 6, 7, 8, 9, 10]
+
+
+@pytest.mark.parametrize("keys", [KEYS_DESC, KEYS_ASC])
+def test_pages_cover_every_row_once(db, keys):
+    expected = [row.id for row in db.query(events).order_by(
+        *(column.desc() if desc else column.asc() for column, desc in keys)
+    )]
+    seen, cursor = [], None
+    while True:
+        rows, cursor = paginate(db.query(events), keys, limit=3, cursor=cursor)
+        seen += [row.id for row in rows]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_offset_page_returns_a_cursor(db):
+    rows, cursor = paginate(db.query(events), KEYS_DESC, limit=3, offset=3)
+    assert [row.id for row in rows] == [7, 6, 5]
+    rows, _ = paginate(db.query(events), KEYS_DESC, limit=3, cursor=cursor)
+    assert [row.id for row in rows] == [4, 3, 2]
@@ -0,0 +1,29 @@
+"""Upload report bookkeeping"""
+from app.services.recipient_upload import UploadReport
+
+
+def test_rejects_are_counted_past_the_sample_cap():
+    report = UploadReport(max_rejects=2)
+    report.reject(1, "555", "too_short")
+    report.reject(2, "abc", "invalid")
+    report.reject(3, "123", "too_short")
+    assert report.rejected == 3
+    assert report.reject_summary == {"too_short": 2, "invalid": 1}
+    assert report.rejected_rows == [
+        {"row": 1, "value": "555", "reason": "too_short"},
+        {"row": 2, "value": "abc", "reason": "invalid"},
+    ]
+
+
+def test_to_dict():
+    report = UploadReport(max_rejects=10)
+    report.rows, report.inserted, report.duplicates = 5, 3, 1
+    report.reject(4, "", "empty")
+    assert report.to_dict() == {
+        "rows": 5,
+        "inserted": 3,
+        "duplicates": 1,
+        "rejected": 1,
+        "reject_summary": {"empty": 1},
+        "rejected_rows": [{"row": 4, "value": "", "reason": "empty"}],
+    }